@@ -26,6 +26,7 @@ import pyqtgraph as pg
 
 import time
 from Data.HelperModule import SignalFrequencyLimiter
+from Data.CalibrationDiagnostics import CalibrationDiagnostics, ring_positions_from_cake
 
 import numpy as np
 
@@ -41,6 +42,7 @@ class CalibrationController(object):
         self.img_data = img_data
         self.mask_data = mask_data
         self.calibration_data = calibration_data
+        self.calibration_diagnostics = CalibrationDiagnostics()
 
         self.img_data.subscribe(self.plot_image)
         self.view.set_start_values(self.calibration_data.start_values)
@@ -326,6 +328,7 @@ class CalibrationController(object):
 
 
         self.clear_peaks_btn_click()
+        self.calibration_diagnostics.reset()
         self.load_calibrant(wavelength_from='pyFAI')  #load right calibration file
 
         # get options
@@ -346,10 +349,14 @@ class CalibrationController(object):
         self.calibration_data.search_peaks_on_ring(1, delta_tth, intensity_min_factor, intensity_max, mask)
         if len(self.calibration_data.points):
             self.calibration_data.refine()
+            self.update_residuals()
             self.plot_points()
         else:
             print 'Did not find any Points with the specified parameters for the first two rings!'
 
+        # all requested rings are searched, once the geometry has converged the refinement is only repeated after
+        # the last ring
+        needs_refinement = False
         for i in xrange(num_rings - 2):
             points = self.calibration_data.search_peaks_on_ring(i + 2, delta_tth, intensity_min_factor,
                                                                 intensity_max, mask)
@@ -357,9 +364,17 @@ class CalibrationController(object):
                 self.plot_points(points)
                 QtGui.QApplication.processEvents()
                 QtGui.QApplication.processEvents()
-                self.calibration_data.refine()
+                if self.calibration_diagnostics.has_converged():
+                    needs_refinement = True
+                else:
+                    self.calibration_data.refine()
+                    self.update_residuals()
+                    needs_refinement = False
             else:
                 print 'Did not find enough points with the specified parameters!'
+        if needs_refinement:
+            self.calibration_data.refine()
+            self.update_residuals()
         self.calibration_data.integrate()
         self.update_all()
 
@@ -411,6 +426,11 @@ class CalibrationController(object):
         self.view.spectrum_view.plot_vertical_lines(np.array(self.calibration_data.calibrant.get_2th()) /
                                                     np.pi * 180)
         self.view.spectrum_view.view_box.autoRange()
+        self.update_residuals(store_history=False)
+        self.view.residual_view.plot_cake_residuals(
+            ring_positions_from_cake(self.calibration_data.cake_img, self.calibration_data.cake_tth,
+                                     self.calibration_data.cake_azi,
+                                     np.array(self.calibration_data.calibrant.get_2th()) / np.pi * 180))
         if self.view.tab_widget.currentIndex() == 0:
             self.view.tab_widget.setCurrentIndex(1)
 
@@ -420,6 +440,13 @@ class CalibrationController(object):
         self.update_calibration_parameter()
         self.load_calibrant('pyFAI')
 
+    def update_residuals(self, store_history=True):
+        """
+        Calculates the residuals of the calibration points for the current geometry and plots them.
+        """
+        statistics = self.calibration_diagnostics.update(self.calibration_data, store_history)
+        self.view.residual_view.plot_residuals(self.calibration_diagnostics.residuals, statistics)
+
     def update_calibration_parameter(self):
         """
         Reads the calibration parameter from the calibration_data object and displays them in the GUI.
@@ -25,6 +25,7 @@ from Data.MaskData import MaskData
 from Data.CalibrationData import CalibrationData
 from Data.SpectrumData import SpectrumData
 from Data.PhaseData import PhaseData
+from Data.SeriesData import SeriesData
 import pyqtgraph as pg
 # # Switch to using white background and black foreground
 pg.setConfigOption('useOpenGL', False)
@@ -37,6 +38,7 @@ from Controller.IntegrationOverlayController import IntegrationOverlayController
 from Controller.IntegrationImageController import IntegrationImageController
 from Controller.IntegrationSpectrumController import IntegrationSpectrumController
 from Controller.IntegrationPhaseController import IntegrationPhaseController
+from Controller.IntegrationSeriesController import IntegrationSeriesController
 
 
 class IntegrationController(object):
@@ -45,7 +47,7 @@ class IntegrationController(object):
     """
 
     def __init__(self, working_dir, view=None, img_data=None, mask_data=None, calibration_data=None, spectrum_data=None,
-                 phase_data=None):
+                 phase_data=None, series_data=None):
         self.working_dir = working_dir
         if view == None:
             self.view = IntegrationView()
@@ -77,6 +79,11 @@ class IntegrationController(object):
         else:
             self.phase_data = phase_data
 
+        if series_data == None:
+            self.series_data = SeriesData()
+        else:
+            self.series_data = series_data
+
         self.create_sub_controller()
 
         self.view.setWindowState(self.view.windowState() & ~QtCore.Qt.WindowMinimized | QtCore.Qt.WindowActive)
@@ -90,13 +97,16 @@ class IntegrationController(object):
         """
         self.spectrum_controller = IntegrationSpectrumController(self.working_dir, self.view, self.img_data,
                                                                  self.mask_data,
-                                                                 self.calibration_data, self.spectrum_data)
+                                                                 self.calibration_data, self.spectrum_data,
+                                                                 self.series_data)
         self.image_controller = IntegrationImageController(self.working_dir, self.view, self.img_data,
-                                                           self.mask_data, self.calibration_data)
+                                                           self.mask_data, self.calibration_data, self.series_data)
         self.overlay_controller = IntegrationOverlayController(self.working_dir, self.view, self.spectrum_data)
 
         self.phase_controller = IntegrationPhaseController(self.working_dir, self.view, self.calibration_data,
-                                                           self.spectrum_data, self.phase_data)
+                                                           self.spectrum_data, self.phase_data, self.series_data)
+        self.series_controller = IntegrationSeriesController(self.working_dir, self.view, self.img_data,
+                                                             self.series_data)
 
 
 if __name__ == "__main__":
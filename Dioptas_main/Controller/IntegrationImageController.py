@@ -20,6 +20,7 @@ import os
 from PyQt4 import QtGui, QtCore
 import numpy as np
 from PIL import Image
+from Data.SpectrumStore import SpectrumStore
 
 
 class IntegrationImageController(object):
@@ -29,12 +30,13 @@ class IntegrationImageController(object):
     """
 
     def __init__(self, working_dir, view, img_data, mask_data,
-                 calibration_data):
+                 calibration_data, series_data=None):
         self.working_dir = working_dir
         self.view = view
         self.img_data = img_data
         self.mask_data = mask_data
         self.calibration_data = calibration_data
+        self.series_data = series_data
         self._auto_scale = True
         self.img_mode = 'Image'
         self.use_mask = False
@@ -180,6 +182,8 @@ class IntegrationImageController(object):
                                                         self.view)
                 progress_dialog.setWindowModality(QtCore.Qt.WindowModal)
                 progress_dialog.show()
+                store = None
+                failed_filenames = []
                 for ind in xrange(len(filenames)):
                     filename = str(filenames[ind])
                     base_filename = os.path.basename(filename)
@@ -187,47 +191,90 @@ class IntegrationImageController(object):
                     progress_dialog.setLabelText("Integrating: " + base_filename)
                     QtGui.QApplication.processEvents()
                     self.img_data.turn_off_notification()
-                    self.img_data.load(filename)
-                    self.integrate_spectrum(
-                        os.path.join(working_directory, os.path.splitext(base_filename)[0] + '.chi'))
+                    try:
+                        self.img_data.load(filename)
+                        if self.view.spec_store_cb.isChecked():
+                            if store is None:
+                                store_directory = os.path.join(working_directory,
+                                                               os.path.splitext(base_filename)[0] + '_spectra')
+                                store = self.integrate_spectrum_into_store(filename, store_directory)
+                            else:
+                                self.integrate_spectrum_into_store(filename, store)
+                        else:
+                            self.integrate_spectrum(
+                                os.path.join(working_directory, os.path.splitext(base_filename)[0] + '.chi'))
+                    except (IOError, ValueError) as e:
+                        # one bad frame should not abort the batch
+                        print 'Could not integrate {}: {}'.format(base_filename, e)
+                        failed_filenames.append(base_filename)
                     if progress_dialog.wasCanceled():
                         break
                 self.img_data.turn_on_notification()
                 self.img_data.notify()
                 progress_dialog.close()
+                if failed_filenames:
+                    QtGui.QMessageBox.critical(self.view, 'Error', 'The following files could not be integrated:\n' +
+                                               '\n'.join(failed_filenames[:20]) +
+                                               ('\n...' if len(failed_filenames) > 20 else ''))
 
     def integrate_spectrum(self, filename):
-        if self.view.img_mask_btn.isChecked():
-            self.mask_data.set_dimension(self.img_data.img_data.shape)
-            mask = self.mask_data.get_mask()
-        else:
-            mask = None
+        unit = self.get_integration_unit()
+        if unit is None:
+            return
+        x, y = self.calibration_data.integrate_1d(filename=filename, mask=self.get_integration_mask(), unit=unit)
+        self.add_spectrum_to_series(x, y, unit)
 
-        if self.view.img_roi_btn.isChecked():
-            roi_mask = self.view.img_view.roi.getRoiMask(self.img_data.img_data.shape)
+    def integrate_spectrum_into_store(self, img_filename, store):
+        """
+        Integrates the current image and appends the spectrum to a SpectrumStore. Completely masked images are stored
+        as a row of NaN.
+        :param store: SpectrumStore or the directory of a new store, which is created with the x axis of this spectrum
+        :return: the SpectrumStore
+        """
+        unit = self.get_integration_unit()
+        if unit is None:
+            return store
+        mask = self.get_integration_mask()
+        if mask is not None and np.all(mask):
+            if not isinstance(store, SpectrumStore):
+                raise ValueError('the image is completely masked, the store can not be created')
+            store.append(np.nan * np.ones(len(store.x)), img_filename)
+            return store
+        x, y = self.calibration_data.integrate_1d(mask=mask, unit=unit, remove_empty=False)
+        if not isinstance(store, SpectrumStore):
+            store = SpectrumStore.create(store, x, unit, self.calibration_data.geometry.makeHeaders())
+        store.append(y, img_filename)
+        self.add_spectrum_to_series(x, y, unit)
+        return store
+
+    def add_spectrum_to_series(self, x, y, unit):
+        if self.series_data is not None:
+            self.series_data.add_frame(self.img_data.filename, x, y, unit, self.calibration_data.geometry.wavelength)
+
+    def get_integration_mask(self):
+        use_mask = self.view.img_mask_btn.isChecked()
+        use_roi = self.view.img_roi_btn.isChecked()
+        if not use_mask and not use_roi:
+            return None
+        img_shape = self.img_data.img_data.shape
+        self.mask_data.set_dimension(img_shape, self.img_data.img_transformations)
+        if use_roi:
+            self.mask_data.set_roi(self.view.img_view.roi.getIndexLimits(img_shape))
         else:
-            roi_mask = None
-
-        if roi_mask is None and mask is None:
-            mask = None
-        elif roi_mask is None and mask is not None:
-            mask = mask
-        elif roi_mask is not None and mask is None:
-            mask = roi_mask
-        elif roi_mask is not None and mask is not None:
-            mask = np.logical_or(mask, roi_mask)
+            self.mask_data.set_roi(None)
+        return self.mask_data.get_integration_mask(use_mask)
 
+    def get_integration_unit(self):
         if self.view.spec_tth_btn.isChecked():
-            integration_unit = '2th_deg'
+            return '2th_deg'
         elif self.view.spec_q_btn.isChecked():
-            integration_unit = 'q_A^-1'
+            return 'q_A^-1'
         elif self.view.spec_d_btn.isChecked():
-            integration_unit = 'd_A'
+            return 'd_A'
         else:
             # in case something weird happened
             print 'No correct integration unit selected'
-            return
-        self.calibration_data.integrate_1d(filename=filename, mask=mask, unit=integration_unit)
+            return None
 
     def change_mask_mode(self):
         self.use_mask = not self.use_mask
@@ -269,18 +316,13 @@ class IntegrationImageController(object):
         self.view.img_directory_txt.setText(os.path.dirname(self.img_data.filename))
         if self.img_mode == 'Cake' and \
                 self.calibration_data.is_calibrated:
-            if self.use_mask:
-                mask = self.mask_data.get_mask()
-            else:
-                mask = np.zeros(self.img_data.img_data.shape)
-
             if self.roi_active:
-                roi_mask = np.ones(self.img_data.img_data.shape)
-                x1, x2, y1, y2 = self.view.img_view.roi.getIndexLimits(self.img_data.img_data.shape)
-                roi_mask[x1:x2, y1:y2] = 0
+                self.mask_data.set_roi(self.view.img_view.roi.getIndexLimits(self.img_data.img_data.shape))
             else:
-                roi_mask = np.zeros(self.img_data.img_data.shape)
-            mask = np.logical_or(mask, roi_mask)
+                self.mask_data.set_roi(None)
+            mask = self.mask_data.get_integration_mask(self.use_mask)
+            if mask is None:
+                mask = np.zeros(self.img_data.img_data.shape, dtype=bool)
             self.calibration_data.integrate_2d(mask)
             self.plot_cake()
             self.view.img_view.plot_mask(
@@ -22,6 +22,7 @@ import os
 from PyQt4 import QtGui, QtCore
 import numpy as np
 from Data.HelperModule import get_base_name
+from Data.SpectrumStore import is_spectrum_store
 
 
 class IntegrationOverlayController(object):
@@ -49,6 +50,11 @@ class IntegrationOverlayController(object):
 
         self.view.overlay_set_as_bkg_btn.clicked.connect(self.overlay_set_as_bkg_btn_clicked)
 
+        self.connect_click_function(self.view.overlay_stack_load_btn, self.load_overlay_stack)
+        self.connect_click_function(self.view.overlay_stack_clear_btn, self.clear_overlay_stack)
+        self.view.overlay_stack_mode_cb.currentIndexChanged.connect(self.update_overlay_stack)
+        self.view.overlay_stack_spacing_sb.valueChanged.connect(self.update_overlay_stack)
+
         # creating the quickactions signals
 
         self.connect_click_function(self.view.qa_img_set_as_overlay_btn, self.set_as_overlay)
@@ -96,8 +102,43 @@ class IntegrationOverlayController(object):
                               '#%02x%02x%02x' % (color[0], color[1], color[2]))
 
     def clear_overlays(self):
-        while self.view.overlay_tw.rowCount() > 0:
-            self.del_overlay()
+        self.spectrum_data.clear_overlays()
+        self.view.clear_overlays()
+        self.view.spectrum_view.clear_overlays()
+
+    def load_overlay_stack(self, filenames=None):
+        """
+        Loads a spectrum series into the overlay stack. Selecting a file of a spectrum store loads the whole store.
+        """
+        if filenames is None:
+            filenames = QtGui.QFileDialog.getOpenFileNames(self.view, "Load Overlay Series.",
+                                                           self.working_dir['overlay'])
+        filenames = [str(filename) for filename in filenames]
+        if not len(filenames):
+            return
+        try:
+            if len(filenames) == 1 and is_spectrum_store(os.path.dirname(filenames[0])):
+                self.spectrum_data.load_overlay_stack_from_store(os.path.dirname(filenames[0]))
+            else:
+                self.spectrum_data.load_overlay_stack(filenames)
+        except (IOError, ValueError) as e:
+            QtGui.QMessageBox.critical(self.view, 'ERROR', 'Could not load the overlay series:\n' + str(e))
+        self.working_dir['overlay'] = os.path.dirname(filenames[0])
+        self.update_overlay_stack()
+
+    def clear_overlay_stack(self):
+        self.spectrum_data.overlay_stack.clear()
+        self.update_overlay_stack()
+
+    def update_overlay_stack(self):
+        overlay_stack = self.spectrum_data.overlay_stack
+        if str(self.view.overlay_stack_mode_cb.currentText()) == 'waterfall':
+            x, y = overlay_stack.get_waterfall(self.view.overlay_stack_spacing_sb.value())
+            self.view.spectrum_view.set_overlay_stack(x, y, 'waterfall')
+        else:
+            x, image = overlay_stack.get_image()
+            self.view.spectrum_view.set_overlay_stack(x, image, 'heat map')
+        self.view.overlay_stack_lbl.setText('%d spectra' % len(overlay_stack) if len(overlay_stack) else '')
 
     def update_overlay_scale_step(self):
         value = np.float(self.view.overlay_scale_step_txt.text())
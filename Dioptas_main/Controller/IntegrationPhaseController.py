@@ -26,14 +26,19 @@ from copy import copy
 import pyqtgraph as pg
 
 
+# units of the series data and the corresponding phase line units
+SERIES_UNITS = {'2th_deg': 'tth', 'q_A^-1': 'q', 'd_A': 'd'}
+
+
 class IntegrationPhaseController(object):
     def __init__(self, working_dir, view, calibration_data,
-                 spectrum_data, phase_data):
+                 spectrum_data, phase_data, series_data=None):
         self.working_dir = working_dir
         self.view = view
         self.calibration_data = calibration_data
         self.spectrum_data = spectrum_data
         self.phase_data = phase_data
+        self.series_data = series_data
         self.phase_lw_items = []
         self.create_signals()
 
@@ -41,6 +46,8 @@ class IntegrationPhaseController(object):
         self.connect_click_function(self.view.phase_add_btn, self.add_phase)
         self.connect_click_function(self.view.phase_del_btn, self.del_phase)
         self.connect_click_function(self.view.phase_clear_btn, self.clear_phases)
+        self.connect_click_function(self.view.phase_fit_btn, self.fit_phase)
+        self.connect_click_function(self.view.phase_fit_series_btn, self.fit_phase_series)
 
         self.view.phase_pressure_step_txt.editingFinished.connect(self.update_phase_pressure_step)
         self.view.phase_temperature_step_txt.editingFinished.connect(self.update_phase_pressure_step)
@@ -299,12 +306,65 @@ class IntegrationPhaseController(object):
         (within range of spectrum and/or overlays
         :param axis_range: list/tuple of x_range and y_range -- ((x_min, x_max), (y_min, y_max)
         """
+        if axis_range is None:
+            axis_range = self.view.spectrum_view.spectrum_plot.viewRange()
         self.view.spectrum_view.view_box.blockSignals(True)
+        positions, intensities, baseline = \
+            self.phase_data.rescale_reflections_all(
+                self.spectrum_data.spectrum,
+                axis_range[0], axis_range[1],
+                self.calibration_data.geometry.wavelength * 1e10,
+                self.get_unit())
         for ind in xrange(len(self.phase_data.phases)):
-            self.update_intensity(ind, axis_range)
+            self.view.spectrum_view.update_phase_intensities(
+                ind, positions[ind], intensities[ind], baseline)
         self.view.spectrum_view.view_box.blockSignals(False)
         self.view.spectrum_view.update_phase_line_visibilities()
 
+    def fit_phase(self):
+        """
+        Fits the pressure (or temperature) of the selected phase to the current spectrum.
+        """
+        cur_ind = self.view.get_selected_phase_row()
+        if cur_ind < 0:
+            return
+        fit_temperature = self.view.phase_fit_temperature_cb.isChecked()
+        x, y = self.spectrum_data.spectrum.data
+        result = self.phase_data.fit_pressure(cur_ind, x, y, self.calibration_data.geometry.wavelength * 1e10,
+                                              self.get_unit(), fit_temperature)
+        if result is None:
+            self.view.phase_fit_lbl.setText('No peaks found next to the phase lines.')
+            return
+        value, error, num_peaks = result
+        if fit_temperature:
+            self.view.set_phase_tw_temperature(cur_ind, round(value))
+            self.view.phase_fit_lbl.setText('T = %.0f +- %.0f K (%d peaks)' % (value, error, num_peaks))
+        else:
+            self.view.set_phase_tw_pressure(cur_ind, round(value, 2))
+            self.view.phase_fit_lbl.setText('P = %.2f +- %.2f GPa (%d peaks)' % (value, error, num_peaks))
+        self.phase_selection_changed(cur_ind, 0, cur_ind, 0)
+        self.update_intensity(cur_ind)
+
+    def fit_phase_series(self):
+        """
+        Fits the pressure of the selected phase to all spectra of the series and shows it over the frame index.
+        """
+        cur_ind = self.view.get_selected_phase_row()
+        if cur_ind < 0 or self.series_data is None or len(self.series_data) == 0:
+            return
+        unit = SERIES_UNITS.get(self.series_data.unit)
+        if unit is None:
+            QtGui.QMessageBox.critical(self.view, 'Error', 'The unit of the series is not supported for fitting.')
+            return
+        QtGui.QApplication.setOverrideCursor(QtCore.Qt.WaitCursor)
+        pressures, errors = self.phase_data.fit_pressure_series(cur_ind, self.series_data.x,
+                                                                self.series_data.intensities,
+                                                                self.calibration_data.geometry.wavelength * 1e10,
+                                                                unit)
+        QtGui.QApplication.restoreOverrideCursor()
+        self.view.series_view.plot_pressures(pressures)
+        self.view.phase_fit_lbl.setText('Fitted %d of %d frames' % (np.sum(np.isfinite(pressures)), len(pressures)))
+
     def get_unit(self):
         """
         returns the unit currently selected in the GUI
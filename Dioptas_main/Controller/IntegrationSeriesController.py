@@ -0,0 +1,117 @@
+# -*- coding: utf8 -*-
+# Dioptas - GUI program for fast processing of 2D X-ray data
+# Copyright (C) 2014  Clemens Prescher (clemens.prescher@gmail.com)
+# GSECARS, University of Chicago
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+__author__ = 'Clemens Prescher'
+
+from PyQt4 import QtCore
+
+# maximum size of the image shown in the series view, larger series are averaged down to it
+MAX_DISPLAY_FRAMES = 2000
+MAX_DISPLAY_BINS = 2000
+# minimum time between two redraws while frames are added
+UPDATE_INTERVAL = 200
+
+UNIT_LABELS = {'2th_deg': (u'2θ', u'°'), 'q_A^-1': ('Q', 'A<sup>-1</sup>'), 'd_A': ('d', 'A')}
+
+
+class IntegrationSeriesController(object):
+    """
+    Shows all spectra integrated during a session or batch integration in the series tab. The series data is filled by
+    the spectrum and image controller, this controller only takes care of the display and navigation.
+    """
+
+    def __init__(self, working_dir, view, img_data, series_data):
+        self.working_dir = working_dir
+        self.view = view
+        self.img_data = img_data
+        self.series_data = series_data
+        self.series_view = view.series_view
+
+        self.update_timer = QtCore.QTimer(self.view)
+        self.update_timer.setSingleShot(True)
+        self.update_timer.setInterval(UPDATE_INTERVAL)
+        self._auto_levels = True
+
+        self.create_subscriptions()
+        self.create_signals()
+
+    def create_subscriptions(self):
+        self.series_data.subscribe(self.series_changed)
+
+    def create_signals(self):
+        self.view.connect(self.update_timer, QtCore.SIGNAL('timeout()'), self.update_series_plot)
+        self.view.connect(self.view.series_clear_btn, QtCore.SIGNAL('clicked()'), self.clear_series)
+        self.series_view.frame_clicked.connect(self.load_frame)
+        self.series_view.x_cursor_moved.connect(self.update_trace)
+        self.series_view.frame_range_changed.connect(self.frame_range_changed)
+
+    def series_changed(self):
+        # frames can arrive much faster than the view can be redrawn, the redraw is therefore delayed
+        if not self.update_timer.isActive():
+            self.update_timer.start()
+
+    def frame_range_changed(self, frame_start, frame_end):
+        if len(self.series_data) > MAX_DISPLAY_FRAMES:
+            self.series_changed()
+
+    def update_series_plot(self):
+        num_frames = len(self.series_data)
+        self.series_view.set_num_frames(num_frames)
+        self.view.series_lbl.setText('%d frames' % num_frames if num_frames else '')
+        if num_frames == 0:
+            self.series_view.plot_image(self.series_data.intensities, 0, 1, 0, 0)
+            self.series_view.plot_trace([])
+            self._auto_levels = True
+            return
+
+        # when zoomed in only the visible frames are shown, with a correspondingly finer resolution
+        frame_range = self.series_view.get_frame_range()
+        if frame_range is None or num_frames <= MAX_DISPLAY_FRAMES:
+            frame_start, frame_end = 0, num_frames
+        else:
+            frame_start = min(max(int(frame_range[0]), 0), num_frames - 1)
+            frame_end = min(max(int(frame_range[1]) + 1, frame_start + 1), num_frames)
+        image, frame_step, bin_step = self.series_data.get_image(MAX_DISPLAY_FRAMES, MAX_DISPLAY_BINS,
+                                                                  frame_start, frame_end)
+        x = self.series_data.get_display_x()
+        x_step = (x[-1] - x[0]) / float(max(len(x) - 1, 1))
+        x_min = x[0] - 0.5 * x_step
+        self.series_view.plot_image(image, x_min, x_min + image.shape[1] * bin_step * x_step,
+                                    frame_start, frame_start + image.shape[0] * frame_step, self._auto_levels)
+        if self._auto_levels:
+            # first frames of a new series
+            self.series_view.set_x_cursor(x[len(x) // 2])
+            self._auto_levels = False
+        self.series_view.set_unit_label(*UNIT_LABELS.get(self.series_data.unit, ('', '')))
+
+        self.update_trace(self.series_view.get_x_cursor())
+        current_ind = self.series_data.get_frame_index(self.img_data.filename)
+        if current_ind >= 0:
+            self.series_view.set_frame_cursor(current_ind)
+
+    def update_trace(self, x_value):
+        if len(self.series_data):
+            self.series_view.plot_trace(self.series_data.get_trace(x_value))
+
+    def load_frame(self, ind):
+        self.series_view.set_frame_cursor(ind)
+        self.img_data.load(self.series_data.filenames[ind])
+
+    def clear_series(self):
+        self.series_data.clear()
+        self.series_view.clear_pressures()
+        self.series_data.notify()
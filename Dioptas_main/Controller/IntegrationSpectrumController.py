@@ -22,17 +22,20 @@ from PyQt4 import QtGui, QtCore
 import pyFAI
 import numpy as np
 import time
+from Data.BackgroundEstimator import BackgroundEstimator
+from Data.SpectrumData import convert_x_value
 
 
 class IntegrationSpectrumController(object):
     def __init__(self, working_dir, view, img_data,
-                 mask_data, calibration_data, spectrum_data):
+                 mask_data, calibration_data, spectrum_data, series_data=None):
         self.working_dir = working_dir
         self.view = view
         self.img_data = img_data
         self.mask_data = mask_data
         self.calibration_data = calibration_data
         self.spectrum_data = spectrum_data
+        self.series_data = series_data
 
         self.create_subscriptions()
         self.integration_unit = '2th_deg'
@@ -72,6 +75,11 @@ class IntegrationSpectrumController(object):
                           QtCore.SIGNAL('editingFinished()'),
                           self.spec_directory_txt_changed)
 
+        self.view.auto_bkg_gb.toggled.connect(self.auto_bkg_changed)
+        self.view.auto_bkg_method_cb.currentIndexChanged.connect(self.auto_bkg_changed)
+        self.view.auto_bkg_width_sb.valueChanged.connect(self.auto_bkg_changed)
+        self.view.auto_bkg_order_sb.valueChanged.connect(self.auto_bkg_changed)
+
         self.connect_click_function(self.view.qa_img_save_spectrum_btn, self.save_spectrum)
         self.connect_click_function(self.view.qa_spectrum_save_spectrum_btn, self.save_spectrum)
         self.view.keyPressEvent = self.key_press_event
@@ -101,26 +109,19 @@ class IntegrationSpectrumController(object):
                     'No File saved or selected')
                 filename = None
 
-            if self.view.img_mask_btn.isChecked():
-                self.mask_data.set_dimension(self.img_data.img_data.shape)
-                mask = self.mask_data.get_mask()
+            use_mask = self.view.img_mask_btn.isChecked()
+            use_roi = self.view.img_roi_btn.isChecked()
+            if use_mask or use_roi:
+                img_shape = self.img_data.img_data.shape
+                self.mask_data.set_dimension(img_shape, self.img_data.img_transformations)
+                if use_roi:
+                    self.mask_data.set_roi(self.view.img_view.roi.getIndexLimits(img_shape))
+                else:
+                    self.mask_data.set_roi(None)
+                mask = self.mask_data.get_integration_mask(use_mask)
             else:
                 mask = None
 
-            if self.view.img_roi_btn.isChecked():
-                roi_mask = self.view.img_view.roi.getRoiMask(self.img_data.img_data.shape)
-            else:
-                roi_mask = None
-
-            if roi_mask is None and mask is None:
-                mask = None
-            elif roi_mask is None and mask is not None:
-                mask = mask
-            elif roi_mask is not None and mask is None:
-                mask = roi_mask
-            elif roi_mask is not None and mask is not None:
-                mask = np.logical_or(mask, roi_mask)
-
             tth, I = self.calibration_data.integrate_1d(
                 filename=filename, mask=mask, unit=self.integration_unit)
             if filename is not None:
@@ -128,8 +129,20 @@ class IntegrationSpectrumController(object):
             else:
                 spectrum_name = self.img_data.filename
             self.spectrum_data.set_spectrum(tth, I, spectrum_name)
+            if self.series_data is not None and self.img_data.filename != '':
+                self.series_data.add_frame(self.img_data.filename, tth, I, self.integration_unit,
+                                           self.calibration_data.geometry.wavelength)
         self.view.img_view.roi.blockSignals(False)
 
+    def auto_bkg_changed(self):
+        if self.view.auto_bkg_gb.isChecked():
+            estimator = BackgroundEstimator(str(self.view.auto_bkg_method_cb.currentText()),
+                                            width=self.view.auto_bkg_width_sb.value(),
+                                            order=self.view.auto_bkg_order_sb.value())
+        else:
+            estimator = None
+        self.spectrum_data.set_auto_background(estimator)
+
     def plot_spectra(self):
         x, y = self.spectrum_data.spectrum.data
         self.view.spectrum_view.plot_data(
@@ -309,28 +322,7 @@ class IntegrationSpectrumController(object):
         self.view.spectrum_view.set_pos_line(new_line_pos)
 
     def convert_x_value(self, value, previous_unit, new_unit):
-        wavelength = self.calibration_data.geometry.wavelength
-        if previous_unit == '2th_deg':
-            tth = value
-        elif previous_unit == 'q_A^-1':
-            tth = np.arcsin(
-                value * 1e10 * wavelength / (4 * np.pi)) * 360 / np.pi
-        elif previous_unit == 'd_A':
-            tth = 2 * np.arcsin(wavelength / (2 * value * 1e-10)) * 180 / np.pi
-        else:
-            tth = 0
-
-        if new_unit == '2th_deg':
-            res = tth
-        elif new_unit == 'q_A^-1':
-            res = 4 * np.pi * \
-                  np.sin(tth / 360 * np.pi) / \
-                  wavelength / 1e10
-        elif new_unit == 'd_A':
-            res = wavelength / (2 * np.sin(tth / 360 * np.pi)) * 1e10
-        else:
-            res = 0
-        return res
+        return convert_x_value(value, previous_unit, new_unit, self.calibration_data.geometry.wavelength)
 
     def spectrum_left_click(self, x, y):
         self.set_line_position(x)
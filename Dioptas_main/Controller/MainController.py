@@ -90,6 +90,8 @@ class MainController(object):
         self.spectrum_data.subscribe(self.set_title)
 
     def tab_changed(self, ind):
+        if ind == 1 or ind == 2:
+            self.update_mask_geometry()
         if ind == 2:
             self.integration_controller.image_controller.plot_mask()
             self.integration_controller.view.calibration_lbl.setText(self.calibration_data.calibration_name)
@@ -107,6 +109,19 @@ class MainController(object):
             except TypeError:
                 pass
 
+    def update_mask_geometry(self):
+        """
+        Passes the pixel arrays of the current calibration to the mask data, which re-rasterizes its 2theta/Q range
+        masks if the calibration changed.
+        """
+        if not self.calibration_data.is_calibrated:
+            return
+        shape = self.img_data.img_data.shape
+        if shape != self.mask_data.get_mask().shape:
+            return
+        geometry = self.calibration_data.geometry
+        self.mask_data.set_geometry(geometry.twoThetaArray(shape), geometry.chiArray(shape), geometry.wavelength)
+
     def set_title(self):
         img_filename = os.path.basename(self.img_data.filename)
         spec_filename = os.path.basename(self.spectrum_data.spectrum_filename)
@@ -31,10 +31,15 @@ import pyqtgraph as pg
 from PyQt4 import QtGui, QtCore
 from Views.MaskView import MaskView
 from Data.ImgData import ImgData
-from Data.MaskData import MaskData
+from Data.MaskData import MaskData, read_mask_file, convert_mask_orientation, RANGES_LAYER
+from Data.DetectorStatistics import get_image_file_list, calculate_image_series_statistics, \
+    calculate_detector_masks
 
 import numpy as np
 
+# detector masks covering a larger part of the detector are only applied after a confirmation
+MAX_DETECTOR_MASK_FRACTION = 0.2
+
 
 class MaskController(object):
     def __init__(self, working_dir, view=None, imgData=None, maskData=None):
@@ -55,6 +60,7 @@ class MaskController(object):
             self.mask_data = maskData
 
         self.view.img_view.mouse_left_clicked.connect(self.process_click)
+        self.img_data.subscribe(self.update_mask_orientation)
 
         self.state = None
         self.clicks = 0
@@ -86,6 +92,12 @@ class MaskController(object):
         self.connect_click_function(self.view.below_thresh_btn, self.below_thresh_btn_click)
         self.connect_click_function(self.view.above_thresh_btn, self.above_thresh_btn_click)
         self.connect_click_function(self.view.cosmic_btn, self.cosmic_btn_click)
+        self.connect_click_function(self.view.range_mask_btn, self.range_mask_btn_click)
+        self.connect_click_function(self.view.range_clear_btn, self.range_clear_btn_click)
+        self.connect_click_function(self.view.load_layer_btn, self.load_layer_btn_click)
+        self.connect_click_function(self.view.remove_layer_btn, self.remove_layer_btn_click)
+        self.connect_click_function(self.view.detector_mask_btn, self.detector_mask_btn_click)
+        self.view.layer_list.itemChanged.connect(self.layer_item_changed)
         self.connect_click_function(self.view.invert_mask_btn, self.invert_mask_btn_click)
         self.connect_click_function(self.view.clear_mask_btn, self.clear_mask_btn_click)
         self.connect_click_function(self.view.save_mask_btn, self.save_mask_btn_click)
@@ -168,11 +180,17 @@ class MaskController(object):
 
     def undo_btn_click(self):
         self.mask_data.undo()
-        self.view.img_view.plot_mask(self.mask_data.get_img())
+        self.plot_mask()
 
     def redo_btn_click(self):
         self.mask_data.redo()
-        self.view.img_view.plot_mask(self.mask_data.get_img())
+        self.plot_mask()
+
+    def update_mask_orientation(self):
+        """
+        Rotates/flips the mask together with the image.
+        """
+        self.mask_data.set_transformations(self.img_data.img_transformations)
 
     def plot_image(self):
         self.view.img_view.plot_image(self.img_data.get_img_data(), False)
@@ -249,24 +267,43 @@ class MaskController(object):
     def below_thresh_btn_click(self):
         thresh = np.float64(self.view.below_thresh_txt.text())
         self.mask_data.mask_below_threshold(self.img_data.get_img_data(), thresh)
-        self.view.img_view.plot_mask(self.mask_data.get_img())
+        self.plot_mask()
 
     def above_thresh_btn_click(self):
         thresh = np.float64(self.view.above_thresh_txt.text())
         self.mask_data.mask_above_threshold(self.img_data.get_img_data(), thresh)
-        self.view.img_view.plot_mask(self.mask_data.get_img())
+        self.plot_mask()
 
     def invert_mask_btn_click(self):
         self.mask_data.invert_mask()
-        self.view.img_view.plot_mask(self.mask_data.get_img())
+        self.plot_mask()
 
     def clear_mask_btn_click(self):
         self.mask_data.clear_mask()
-        self.view.img_view.plot_mask(self.mask_data.get_img())
+        self.plot_mask()
 
     def cosmic_btn_click(self):
         self.mask_data.remove_cosmic(self.img_data.get_img_data())
-        self.view.img_view.plot_mask(self.mask_data.get_img())
+        self.plot_mask()
+
+    def range_mask_btn_click(self):
+        if not self.mask_data.has_geometry():
+            QtGui.QMessageBox.critical(self.view, 'Error', 'Masking of 2theta or Q ranges needs a calibration of the '
+                                                           'current image.')
+            return
+        try:
+            unit, range_min, range_max, chi_min, chi_max = self.view.get_range_mask_parameter()
+        except ValueError:
+            return
+        if unit == 'q_A^-1':
+            self.mask_data.mask_q_range(range_min, range_max, chi_min, chi_max)
+        else:
+            self.mask_data.mask_tth_range(range_min, range_max, chi_min, chi_max)
+        self.plot_mask()
+
+    def range_clear_btn_click(self):
+        self.mask_data.clear_geometric_masks()
+        self.plot_mask()
 
     def save_mask_btn_click(self, filename=None):
         if filename is None:
@@ -275,7 +312,14 @@ class MaskController(object):
 
         if filename is not '':
             self.working_dir['mask'] = os.path.dirname(filename)
-            np.savetxt(filename, self.mask_data.get_mask(), fmt="%d")
+            self.mask_data.save_mask(filename, self.img_data.img_transformations)
+
+    def read_mask(self, filename):
+        """
+        Reads a mask file and converts it into the orientation of the current image.
+        """
+        mask, transformations = read_mask_file(filename)
+        return convert_mask_orientation(mask, transformations, self.img_data.img_transformations)
 
     def load_mask_btn_click(self, filename=None):
         if filename is None:
@@ -284,9 +328,9 @@ class MaskController(object):
 
         if filename is not '':
             self.working_dir['mask'] = os.path.dirname(filename)
-            mask_data = np.loadtxt(filename)
+            mask_data = self.read_mask(filename)
             if self.img_data.get_img_data().shape == mask_data.shape:
-                self.mask_data.set_mask(np.loadtxt(filename))
+                self.mask_data.set_mask(mask_data)
                 self.plot_mask()
             else:
                 QtGui.QMessageBox.critical(self.view, 'Error', 'Image data and mask data in selected file do not have '
@@ -299,9 +343,9 @@ class MaskController(object):
 
         if filename is not '':
             self.working_dir['mask'] = os.path.dirname(filename)
-            mask_data = np.loadtxt(filename)
+            mask_data = self.read_mask(filename)
             if self.mask_data.get_mask().shape == mask_data.shape:
-                self.mask_data.add_mask(np.loadtxt(filename))
+                self.mask_data.add_mask(mask_data)
                 self.plot_mask()
             else:
                 QtGui.QMessageBox.critical(self.view, 'Error', 'Image data and mask data in selected file do not have '
@@ -309,6 +353,92 @@ class MaskController(object):
 
     def plot_mask(self):
         self.view.img_view.plot_mask(self.mask_data.get_mask())
+        self.update_layer_list()
+
+    def update_layer_list(self):
+        names = self.mask_data.get_layer_names()
+        self.view.set_layers(names, [self.mask_data.get_layer_visibility(name) for name in names])
+
+    def layer_item_changed(self, item):
+        self.mask_data.set_layer_visibility(str(item.text()), item.checkState() == QtCore.Qt.Checked)
+        self.view.img_view.plot_mask(self.mask_data.get_mask())
+
+    def load_layer_btn_click(self, filename=None):
+        if filename is None:
+            filename = str(QtGui.QFileDialog.getOpenFileName(self.view, caption="Load mask layer",
+                                                             directory=self.working_dir['mask'], filter='*.mask'))
+
+        if filename is not '':
+            self.working_dir['mask'] = os.path.dirname(filename)
+            mask_data = self.read_mask(filename)
+            if self.mask_data.get_mask().shape == mask_data.shape:
+                name = os.path.splitext(os.path.basename(filename))[0]
+                self.mask_data.set_layer(name, mask_data)
+                self.plot_mask()
+            else:
+                QtGui.QMessageBox.critical(self.view, 'Error', 'Image data and mask data in selected file do not have '
+                                                               'the same shape. Layer could not be loaded.')
+
+    def remove_layer_btn_click(self):
+        item = self.view.layer_list.currentItem()
+        if item is None:
+            return
+        name = str(item.text())
+        if name == RANGES_LAYER:
+            self.mask_data.clear_geometric_masks()
+        else:
+            self.mask_data.remove_layer(name)
+        self.plot_mask()
+
+    def detector_mask_btn_click(self, directory=None):
+        if directory is None:
+            directory = str(QtGui.QFileDialog.getExistingDirectory(self.view, caption="Select image series folder",
+                                                                   directory=self.working_dir['image']))
+
+        if directory is not '':
+            filenames = get_image_file_list(directory)
+            if len(filenames) < 2:
+                QtGui.QMessageBox.critical(self.view, 'Error', 'At least two images are needed to create a detector '
+                                                               'mask.')
+                return
+            progress_dialog = QtGui.QProgressDialog("Calculating the statistics of the image series.", "Abort", 0,
+                                                    len(filenames), self.view)
+            progress_dialog.setWindowModality(QtCore.Qt.WindowModal)
+            progress_dialog.show()
+
+            def update_progress(num_processed, num_files):
+                progress_dialog.setValue(num_processed)
+                QtGui.QApplication.processEvents()
+                return not progress_dialog.wasCanceled()
+
+            try:
+                statistics = calculate_image_series_statistics(filenames, callback=update_progress)
+            except ValueError:
+                progress_dialog.close()
+                QtGui.QMessageBox.critical(self.view, 'Error', 'The images in the selected folder do not all have '
+                                                               'the same shape.')
+                return
+            progress_dialog.close()
+            if statistics is None:
+                return
+            detector_masks = calculate_detector_masks(statistics)
+            masked_fraction = np.mean(detector_masks['dead'] | detector_masks['hot'] | detector_masks['gaps'])
+            if masked_fraction > MAX_DETECTOR_MASK_FRACTION:
+                answer = QtGui.QMessageBox.question(self.view, 'Warning',
+                                                    '{:.0f}% of the detector would be masked, the images in the '
+                                                    'selected folder may not be suited for a detector mask. Apply '
+                                                    'the mask anyway?'.format(masked_fraction * 100),
+                                                    QtGui.QMessageBox.Yes | QtGui.QMessageBox.No)
+                if answer != QtGui.QMessageBox.Yes:
+                    return
+            for key, mask in detector_masks.iteritems():
+                detector_masks[key] = convert_mask_orientation(mask, [], self.img_data.img_transformations)
+            if self.mask_data.get_mask().shape != detector_masks['dead'].shape:
+                QtGui.QMessageBox.critical(self.view, 'Error', 'Image data and the images in the selected folder do '
+                                                               'not have the same shape.')
+                return
+            self.mask_data.set_detector_masks(detector_masks)
+            self.plot_mask()
 
     def key_press_event(self, ev):
         if self.state == "point":
@@ -0,0 +1,112 @@
+# -*- coding: utf8 -*-
+# Dioptas - GUI program for fast processing of 2D X-ray data
+# Copyright (C) 2014  Clemens Prescher (clemens.prescher@gmail.com)
+# GSECARS, University of Chicago
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__author__ = 'Clemens Prescher'
+
+from collections import OrderedDict
+import numpy as np
+from numpy.polynomial import chebyshev
+
+BACKGROUND_METHODS = ('snip', 'chebyshev')
+BASIS_CACHE_SIZE = 20
+
+_basis_cache = OrderedDict()
+
+
+class BackgroundEstimator(object):
+    """
+    Estimates the smooth background of spectra without a separate background measurement.
+        'snip'      - statistics-sensitive non-linear iterative peak-clipping, width is the largest peak width in
+                      points
+        'chebyshev' - Chebyshev polynomial of the given order which is iteratively fitted to the spectrum, points
+                      above the fit are clipped to it after every iteration
+    Both methods work on single spectra (npt) or on stacks of spectra with a common x axis (N, npt) at once.
+    """
+
+    def __init__(self, method='snip', width=50, order=6, iterations=50):
+        if method not in BACKGROUND_METHODS:
+            raise ValueError, "unknown background method '%s'" % method
+        self.method = method
+        self.width = width
+        self.order = order
+        self.iterations = iterations
+
+    def get_parameters(self):
+        return self.method, self.width, self.order, self.iterations
+
+    def estimate(self, x, y):
+        """
+        :param x: x values (npt)
+        :param y: intensities (npt) or (N, npt)
+        :return: background with the shape of y
+        """
+        if self.method == 'snip':
+            return snip(y, self.width)
+        return chebyshev_background(x, y, self.order, self.iterations)
+
+
+def snip(y, width):
+    """
+    SNIP background of a spectrum or a stack of spectra (along the last axis). The intensities are compressed with
+    the log-log-sqrt operator before clipping, every clipping window is applied to all spectra at once.
+    """
+    y = np.array(y, dtype=np.float64, ndmin=1)
+    width = int(min(width, (y.shape[-1] - 1) // 2))
+    offset = np.min(y, axis=-1)[..., None]
+    v = np.log(np.log(np.sqrt(y - offset + 1) + 1) + 1)
+
+    for p in xrange(1, width + 1):
+        center = v[..., p:-p]
+        np.minimum(center, 0.5 * (v[..., :-2 * p] + v[..., 2 * p:]), out=center)
+
+    return (np.exp(np.exp(v) - 1) - 1) ** 2 - 1 + offset
+
+
+def chebyshev_background(x, y, order, iterations):
+    """
+    Iteratively fitted Chebyshev polynomial background of a spectrum or a stack of spectra (along the last axis).
+    The least squares projection onto the polynomial basis is precomputed for the x axis, every iteration is a single
+    matrix product for the whole stack.
+    """
+    y = np.array(y, dtype=np.float64, ndmin=1)
+    basis, projection = get_chebyshev_basis(x, order)
+    fit = y
+    for _ in xrange(iterations):
+        fit = np.dot(np.dot(y, projection.T), basis.T)
+        np.minimum(y, fit, out=y)
+    return fit
+
+
+def get_chebyshev_basis(x, order):
+    """
+    Returns the Chebyshev basis matrix (npt, order + 1) on x scaled to [-1, 1] and its pseudo-inverse. Both are
+    cached for the last used x axes.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    # axes with the same length and end points can still differ in between (e.g. resampled spectra)
+    key = (x.tostring(), order)
+    if key in _basis_cache:
+        return _basis_cache[key]
+    if len(x) == 0 or x.max() == x.min():
+        raise ValueError, "the x axis of the spectrum needs at least two different values"
+    x_scaled = 2 * (x - x.min()) / (x.max() - x.min()) - 1
+    basis = chebyshev.chebvander(x_scaled, order)
+    _basis_cache[key] = basis, np.linalg.pinv(basis)
+    if len(_basis_cache) > BASIS_CACHE_SIZE:
+        _basis_cache.popitem(last=False)
+    return _basis_cache[key]
@@ -46,12 +46,15 @@ class CalibrationData(object):
         self.use_mask = False
         self.calibration_name = 'None'
         self.polarization_factor = 0.95
+        self.subpixel_method = 'centroid'
+        self.subpixel_window_size = 5
         self._calibrants_working_dir = os.path.dirname(Calibrants.__file__)
 
     def find_peaks_automatic(self, x, y, peak_ind):
         massif = Massif(self.img_data.img_data)
         cur_peak_points = massif.find_peaks([x, y])
         if len(cur_peak_points):
+            cur_peak_points = self.refine_peak_positions(cur_peak_points)
             self.points.append(np.array(cur_peak_points))
             self.points_index.append(peak_ind)
         return np.array(cur_peak_points)
@@ -65,10 +68,21 @@ class CalibrationData(object):
                                 top_ind:(top_ind + search_size)].max())
         x_ind = x_ind[0] + left_ind
         y_ind = y_ind[0] + top_ind
+        x_ind, y_ind = self.refine_peak_positions([[x_ind, y_ind]])[0]
         self.points.append(np.array([x_ind, y_ind]))
         self.points_index.append(peak_ind)
         return np.array([np.array((x_ind, y_ind))])
 
+    def refine_peak_positions(self, points):
+        """
+        Refines integer peak positions to sub-pixel accuracy using the method set in subpixel_method ('centroid',
+        'gaussian' or None for no refinement).
+        """
+        if self.subpixel_method is None:
+            return np.array(points)
+        return refine_peak_positions(self.img_data.img_data, points, self.subpixel_window_size,
+                                     self.subpixel_method)
+
     def clear_peaks(self):
         self.points = []
         self.points_index = []
@@ -132,6 +146,7 @@ class CalibrationData(object):
 
         # Store the result
         if len(res):
+            res = self.refine_peak_positions(res)
             self.points.append(np.array(res))
             self.points_index.append(peak_index)
 
@@ -166,7 +181,11 @@ class CalibrationData(object):
         self.integrate_1d()
         self.integrate_2d()
 
-    def integrate_1d(self, num_points=1400, mask=None, polarization_factor=None, filename=None, unit='2th_deg'):
+    def integrate_1d(self, num_points=1400, mask=None, polarization_factor=None, filename=None, unit='2th_deg',
+                     remove_empty=True):
+        """
+        :param remove_empty: removes points without intensity, set it to False if all spectra need the same x axis
+        """
         if np.sum(mask) == self.img_data.img_data.shape[0] * self.img_data.img_data.shape[1]:
             #do not perform integration if the image is completelye masked...
             return self.tth, self.int
@@ -184,7 +203,7 @@ class CalibrationData(object):
             self.tth, self.int = self.geometry.integrate1d(self.img_data.img_data, num_points, method='lut', unit=unit,
                                                            mask=mask, polarization_factor=polarization_factor,
                                                            filename=filename)
-        if self.int.max() > 0:
+        if remove_empty and self.int.max() > 0:
             ind = np.where(self.int > 0)
             self.tth = self.tth[ind]
             self.int = self.int[ind]
@@ -242,3 +261,66 @@ class CalibrationData(object):
     def save(self, filename):
         self.geometry.save(filename)
         self.calibration_name = get_base_name(filename)
+
+
+def refine_peak_positions(img, points, window_size=5, method='centroid'):
+    """
+    Refines peak positions to sub-pixel accuracy. All windows are cut out of the image at once into a
+    (N, window_size, window_size) array, so that the refinement of many points is done in a few vectorized steps.
+
+    :param img: 2d image array
+    :param points: (N, 2) array like of peak positions (first and second image axis)
+    :param window_size: edge length of the quadratic window around every peak (odd number)
+    :param method: 'centroid' for an intensity weighted centroid or 'gaussian' for a 2D gaussian fit; if the gaussian
+                   fit fails for a peak the centroid is used for this peak
+    :return: (N, 2) array of refined positions
+    """
+    points = np.array(points, dtype=np.float64).reshape(-1, 2)
+    if len(points) == 0:
+        return points
+    half = int(window_size) // 2
+    window_size = 2 * half + 1
+
+    padded_img = np.pad(np.asarray(img, dtype=np.float64), half, mode='edge')
+    center = np.round(points).astype(int)
+    center[:, 0] = np.clip(center[:, 0], 0, img.shape[0] - 1)
+    center[:, 1] = np.clip(center[:, 1], 0, img.shape[1] - 1)
+
+    offset = np.arange(-half, half + 1)
+    offset_x, offset_y = np.meshgrid(offset, offset, indexing='ij')
+    windows = padded_img[center[:, 0, None, None] + half + offset_x,
+                         center[:, 1, None, None] + half + offset_y]
+    windows = windows - windows.min(axis=(1, 2))[:, None, None]
+
+    weight_sum = windows.sum(axis=(1, 2))
+    valid = weight_sum > 0
+    weight_sum[~valid] = 1
+    shift_x = (windows * offset_x).sum(axis=(1, 2)) / weight_sum
+    shift_y = (windows * offset_y).sum(axis=(1, 2)) / weight_sum
+    shift_x[~valid] = 0
+    shift_y[~valid] = 0
+
+    if method == 'gaussian':
+        # ln(I) = a + b*x + c*y + d*x^2 + e*y^2 solved as weighted linear least squares with the weights I^2
+        # for all windows simultaneously
+        design = np.column_stack((np.ones(window_size ** 2), offset_x.ravel(), offset_y.ravel(),
+                                  offset_x.ravel() ** 2, offset_y.ravel() ** 2))
+        intensities = windows.reshape(len(windows), -1)
+        positive = intensities > 0
+        log_intensities = np.log(np.where(positive, intensities, 1))
+        weights = np.where(positive, intensities ** 2, 0)
+        normal_matrix = np.einsum('ij,ni,ik->njk', design, weights, design)
+        normal_vector = np.einsum('ij,ni,ni->nj', design, weights, log_intensities)
+        solvable = (positive.sum(axis=1) >= 5) & (np.abs(np.linalg.det(normal_matrix)) > 1e-12)
+        if np.any(solvable):
+            coefficients = np.linalg.solve(normal_matrix[solvable], normal_vector[solvable][..., None])[..., 0]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                gauss_x = -coefficients[:, 1] / (2 * coefficients[:, 3])
+                gauss_y = -coefficients[:, 2] / (2 * coefficients[:, 4])
+            good = (coefficients[:, 3] < 0) & (coefficients[:, 4] < 0) & \
+                   (np.abs(gauss_x) <= half) & (np.abs(gauss_y) <= half)
+            solvable_ind = np.where(solvable)[0][good]
+            shift_x[solvable_ind] = gauss_x[good]
+            shift_y[solvable_ind] = gauss_y[good]
+
+    return np.column_stack((center[:, 0] + shift_x, center[:, 1] + shift_y))
@@ -0,0 +1,171 @@
+# -*- coding: utf8 -*-
+# Dioptas - GUI program for fast processing of 2D X-ray data
+# Copyright (C) 2014  Clemens Prescher (clemens.prescher@gmail.com)
+# GSECARS, University of Chicago
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__author__ = 'Clemens Prescher'
+
+import numpy as np
+
+
+class CalibrationDiagnostics(object):
+    """
+    Calculates the 2theta residuals of the calibration points as function of the azimuth for every calibrant ring.
+    The azimuth array is only recalculated if the geometry changes, the 2theta values are evaluated for the found
+    points only, therefore update() is cheap enough to be called after every refinement step.
+    """
+
+    def __init__(self):
+        self._chi_array = None
+        self._chi_key = None
+        self.residuals = {}
+        self.statistics = {}
+        self.rms_history = []
+
+    def reset(self):
+        self.residuals = {}
+        self.statistics = {}
+        self.rms_history = []
+
+    def get_chi_array(self, geometry, shape):
+        """
+        Returns the azimuth array (radians) of the detector, the array is cached until the geometry or the image shape
+        changes.
+        """
+        key = (geometry.dist, geometry.poni1, geometry.poni2, geometry.rot1, geometry.rot2, geometry.rot3,
+               geometry.pixel1, geometry.pixel2, tuple(shape))
+        if key != self._chi_key:
+            self._chi_array = geometry.chiArray(shape)
+            self._chi_key = key
+        return self._chi_array
+
+    def update(self, calibration_data, store_history=True):
+        """
+        Calculates the residuals for all points of the calibration_data object with its current geometry.
+        :param store_history: whether the rms residual is added to the history used by has_converged()
+        :return: statistics dictionary (see calculate_statistics)
+        """
+        points = calibration_data.get_point_array()
+        if len(points) == 0:
+            self.residuals = {}
+            self.statistics = {}
+            return self.statistics
+
+        geometry = calibration_data.geometry
+        shape = calibration_data.img_data.img_data.shape
+        chi_array = self.get_chi_array(geometry, shape)
+
+        d1 = points[:, 0]
+        d2 = points[:, 1]
+        ring_ind = points[:, 2].astype(int)
+
+        tth = geometry.tth(d1, d2)
+        tth_calibrant = np.array(calibration_data.calibrant.get_2th(), dtype=np.float64)
+        residual = tth - tth_calibrant[ring_ind]
+
+        pixel_ind_1 = np.clip(np.round(d1).astype(int), 0, shape[0] - 1)
+        pixel_ind_2 = np.clip(np.round(d2).astype(int), 0, shape[1] - 1)
+        chi = chi_array[pixel_ind_1, pixel_ind_2]
+
+        self.residuals = split_by_ring(ring_ind, np.rad2deg(chi), np.rad2deg(residual))
+        self.statistics = calculate_statistics(self.residuals)
+        if store_history:
+            self.rms_history.append(self.statistics['rms'])
+        return self.statistics
+
+    def has_converged(self, tolerance=0.01, min_iterations=3):
+        """
+        Checks whether the overall rms residual changed less than the relative tolerance during the last
+        min_iterations updates.
+        """
+        if len(self.rms_history) < min_iterations:
+            return False
+        last_rms = np.array(self.rms_history[-min_iterations:])
+        if last_rms[-1] == 0:
+            return True
+        return np.max(np.abs(np.diff(last_rms))) / last_rms[-1] < tolerance
+
+
+def split_by_ring(ring_ind, chi, residual):
+    """
+    Splits chi and residual arrays into a dictionary with the ring index as key and (chi, residual) tuples
+    sorted by chi as values.
+    """
+    order = np.lexsort((chi, ring_ind))
+    ring_ind = ring_ind[order]
+    chi = chi[order]
+    residual = residual[order]
+    rings, start_ind = np.unique(ring_ind, return_index=True)
+    end_ind = np.append(start_ind[1:], len(ring_ind))
+    result = {}
+    for ring, start, end in zip(rings, start_ind, end_ind):
+        result[int(ring)] = (chi[start:end], residual[start:end])
+    return result
+
+
+def calculate_statistics(residuals):
+    """
+    Summary statistics of per ring residuals.
+    :param residuals: dictionary as created by split_by_ring
+    :return: dictionary with 'rings' (per ring dictionaries with num_points, mean, std and rms), 'rms', 'max' and
+             'num_points' for all points
+    """
+    rings = {}
+    all_residuals = []
+    for ring, (chi, residual) in residuals.iteritems():
+        rings[ring] = {'num_points': len(residual),
+                       'mean': np.mean(residual),
+                       'std': np.std(residual),
+                       'rms': np.sqrt(np.mean(residual ** 2))}
+        all_residuals.append(residual)
+    if len(all_residuals):
+        all_residuals = np.concatenate(all_residuals)
+        rms = np.sqrt(np.mean(all_residuals ** 2))
+        max_residual = np.max(np.abs(all_residuals))
+    else:
+        rms = 0
+        max_residual = 0
+    return {'rings': rings, 'rms': rms, 'max': max_residual, 'num_points': len(all_residuals)}
+
+
+def ring_positions_from_cake(cake_img, cake_tth, cake_azi, tth_rings, delta_tth=0.1):
+    """
+    Estimates the ring position for every azimuth bin of a cake image by an intensity weighted centroid within
+    +- delta_tth around the expected ring positions.
+
+    :param cake_img: 2d cake image (azimuth x 2theta)
+    :param cake_tth: 2theta axis of the cake in degree
+    :param cake_azi: azimuth axis of the cake in degree
+    :param tth_rings: expected ring positions in degree
+    :param delta_tth: half width of the search window in degree
+    :return: dictionary with the ring index as key and (azimuth, residual) tuples as values, azimuth bins without
+             intensity in the window are omitted
+    """
+    cake_img = np.asarray(cake_img, dtype=np.float64)
+    result = {}
+    for ring_ind, tth_ring in enumerate(tth_rings):
+        window = np.where(np.abs(cake_tth - tth_ring) <= delta_tth)[0]
+        if len(window) < 3:
+            continue
+        sub_cake = cake_img[:, window]
+        sub_cake = sub_cake - sub_cake.min(axis=1)[:, None]
+        weight_sum = sub_cake.sum(axis=1)
+        valid = weight_sum > 0
+        if not np.any(valid):
+            continue
+        position = np.dot(sub_cake[valid], cake_tth[window]) / weight_sum[valid]
+        result[ring_ind] = (cake_azi[valid], position - tth_ring)
+    return result
@@ -0,0 +1,212 @@
+# -*- coding: utf8 -*-
+# Dioptas - GUI program for fast processing of 2D X-ray data
+# Copyright (C) 2014  Clemens Prescher (clemens.prescher@gmail.com)
+# GSECARS, University of Chicago
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__author__ = 'Clemens Prescher'
+
+import os
+import numpy as np
+import fabio
+from PIL import Image
+from scipy.ndimage import median_filter
+from ProcessPool import get_process_pool
+
+IMAGE_FILE_EXTENSIONS = ('.tif', '.tiff', '.mar3450', '.mar2300', '.edf', '.cbf', '.img', '.sfrm', '.h5', '.png')
+
+
+class PixelStatistics(object):
+    """
+    Per pixel mean, variance, minimum and maximum of an image series. Frames are added one at a time with Welford's
+    update, so the series never has to be in memory. Statistics of different parts of a series can be combined with
+    merge(), which allows accumulating them in parallel.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = None
+        self.m2 = None
+        self.min = None
+        self.max = None
+
+    def add_frame(self, frame):
+        frame = np.asarray(frame, dtype=np.float64)
+        if self.count == 0:
+            self.mean = frame.copy()
+            self.m2 = np.zeros(frame.shape)
+            self.min = frame.copy()
+            self.max = frame.copy()
+            self.count = 1
+            return
+        if frame.shape != self.mean.shape:
+            raise ValueError, "frame shape %s does not match %s" % (frame.shape, self.mean.shape)
+        self.count += 1
+        delta = frame - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (frame - self.mean)
+        np.minimum(self.min, frame, out=self.min)
+        np.maximum(self.max, frame, out=self.max)
+
+    def merge(self, other):
+        """
+        Combines the statistics of another (disjoint) part of the series into this one (Chan et al.).
+        """
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.count = other.count
+            self.mean = other.mean.copy()
+            self.m2 = other.m2.copy()
+            self.min = other.min.copy()
+            self.max = other.max.copy()
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * (float(other.count) / count)
+        self.m2 += other.m2 + delta ** 2 * (float(self.count) * other.count / count)
+        np.minimum(self.min, other.min, out=self.min)
+        np.maximum(self.max, other.max, out=self.max)
+        self.count = count
+
+    @property
+    def variance(self):
+        if self.count < 2:
+            return np.zeros_like(self.mean)
+        return self.m2 / (self.count - 1)
+
+    @property
+    def std(self):
+        return np.sqrt(self.variance)
+
+
+def get_image_file_list(directory, extensions=IMAGE_FILE_EXTENSIONS):
+    """
+    Returns the sorted list of image files in directory. The directory is listed only once.
+    """
+    filenames = [filename for filename in os.listdir(directory)
+                 if os.path.splitext(filename)[1].lower() in extensions]
+    return [os.path.join(directory, filename) for filename in sorted(filenames)]
+
+
+def read_frame(filename):
+    """
+    Reads an image file in the same orientation as ImgData.load (without image transformations).
+    """
+    try:
+        return fabio.open(filename).data[::-1]
+    except AttributeError:
+        return np.array(Image.open(filename))
+
+
+def accumulate_statistics(filenames, read_function=read_frame):
+    statistics = PixelStatistics()
+    for filename in filenames:
+        statistics.add_frame(read_function(filename))
+    return statistics
+
+
+def _accumulate_statistics_job(job):
+    return accumulate_statistics(*job)
+
+
+def calculate_image_series_statistics(filenames, processes=None, read_function=read_frame, callback=None,
+                                      chunk_size=16):
+    """
+    Calculates the per pixel statistics of an image series. The file list is split into contiguous chunks, worker
+    processes stream over the files of a chunk and the partial statistics are merged as they arrive.
+
+    :param filenames: list of image files
+    :param processes: 1 runs everything in this process, otherwise the shared process pool is used
+    :param read_function: function returning the image data of a file, has to be picklable (module level)
+    :param callback: function called with the number of processed and all files after every chunk, the calculation
+                     is canceled if it returns False
+    :param chunk_size: number of files per chunk
+    :return: PixelStatistics or None if canceled
+    """
+    chunk_starts = range(0, len(filenames), chunk_size)
+    jobs = [(filenames[start:start + chunk_size], read_function) for start in chunk_starts]
+
+    if processes == 1 or len(jobs) <= 1:
+        partial_statistics = (_accumulate_statistics_job(job) for job in jobs)
+    else:
+        partial_statistics = get_process_pool().imap_unordered(_accumulate_statistics_job, jobs)
+
+    statistics = PixelStatistics()
+    for partial in partial_statistics:
+        statistics.merge(partial)
+        if callback is not None and callback(statistics.count, len(filenames)) is False:
+            return None
+    return statistics
+
+
+def get_varying_fraction(statistics):
+    """
+    :return: fraction of the pixels which changed within the series
+    """
+    return np.mean(statistics.min != statistics.max)
+
+
+def get_gap_mask(statistics, gap_value=0, min_varying_fraction=0.5):
+    """
+    Panel gaps are pixels which are below gap_value in every frame (many detectors mark them with negative values)
+    and complete rows or columns which never change. Constant rows and columns are only taken as gaps if at least
+    min_varying_fraction of the detector changed within the series, identical frames (e.g. repeated darks) would mark
+    the whole detector.
+    """
+    gap_mask = statistics.max < gap_value
+    if get_varying_fraction(statistics) >= min_varying_fraction:
+        constant = statistics.min == statistics.max
+        gap_mask |= np.all(constant, axis=1)[:, None]
+        gap_mask |= np.all(constant, axis=0)[None, :]
+    return gap_mask
+
+
+def get_dead_pixel_mask(statistics, gap_mask=None, min_varying_fraction=0.5):
+    """
+    Dead pixels are pixels outside of the gaps which have the same value in every frame. Like the gaps they are only
+    determined if at least min_varying_fraction of the detector changed within the series.
+    """
+    if gap_mask is None:
+        gap_mask = get_gap_mask(statistics, min_varying_fraction=min_varying_fraction)
+    if get_varying_fraction(statistics) < min_varying_fraction:
+        return np.zeros(statistics.min.shape, dtype=bool)
+    return (statistics.min == statistics.max) & ~gap_mask
+
+
+def get_hot_pixel_mask(statistics, sigma=5, filter_size=5, gap_mask=None):
+    """
+    Hot pixels are pixels whose mean is more than sigma robust standard deviations above the median of their
+    neighbourhood.
+    """
+    if gap_mask is None:
+        gap_mask = get_gap_mask(statistics)
+    residual = statistics.mean - median_filter(statistics.mean, size=filter_size)
+    valid_residual = residual[~gap_mask]
+    if len(valid_residual) == 0:
+        return np.zeros(residual.shape, dtype=bool)
+    median_residual = np.median(valid_residual)
+    robust_std = 1.4826 * np.median(np.abs(valid_residual - median_residual))
+    return (residual - median_residual > sigma * robust_std) & (residual > 0) & ~gap_mask
+
+
+def calculate_detector_masks(statistics, sigma=5, filter_size=5, gap_value=0):
+    """
+    :return: dictionary with the boolean 'dead', 'hot' and 'gaps' masks
+    """
+    gap_mask = get_gap_mask(statistics, gap_value)
+    return {'dead': get_dead_pixel_mask(statistics, gap_mask),
+            'hot': get_hot_pixel_mask(statistics, sigma, filter_size, gap_mask),
+            'gaps': gap_mask}
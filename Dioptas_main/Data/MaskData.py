@@ -20,70 +20,349 @@ __author__ = 'Clemens Prescher'
 import numpy as np
 import pyqtgraph as pg
 from PyQt4 import QtGui
-from collections import deque
-import skimage.draw
+from collections import deque, OrderedDict
+import zlib
+import struct
 import scipy.signal
-from cosmics import cosmicsimage
+from cosmics import lacosmic_tiled
+from Tools import rasterizer
+from HelperModule import rotate_matrix_p90, rotate_matrix_m90
 
 import time
 from sys import getsizeof
 
 
+DRAWING_LAYER = 'drawing'
+RANGES_LAYER = '2theta/Q ranges'
+ROI_LAYER = 'integration ROI'
+DEAD_PIXEL_LAYER = 'dead pixels'
+HOT_PIXEL_LAYER = 'hot pixels'
+GAP_LAYER = 'detector gaps'
+
+
 class MaskData(object):
+    """
+    The mask consists of layers: the drawing layer, which is changed by all the drawing, threshold and cosmic
+    operations, the 2theta/Q range layer (see mask_tth_range) and further named layers, e.g. static detector masks
+    loaded from file. The named layers are stored bit-packed. Every layer can be hidden, the composite mask returned by
+    get_mask() is only recalculated if a layer changed. The integration ROI (see set_roi) is only part of the mask
+    returned by get_integration_mask().
+    """
+
     def __init__(self, mask_dimension=(2048, 2048)):
         self.mask_dimension = mask_dimension
+        self._layers = OrderedDict()
+        self.drawing_visible = True
+        self.ranges_visible = True
+        self._mask_version = 0
+        self._layers_version = 0
+        self._static_mask = None
+        self._static_key = None
+        self._composite = None
+        self._composite_key = None
+        self.geometric_masks = []
+        self._tth_array = None
+        self._tth_order = None
+        self._tth_sorted = None
+        self._chi_flat = None
+        self._wavelength = None
+        self._geometric_mask_data = None
+        self._roi_limits = None
+        self._roi_mask = None
+        self._integration_mask = None
+        self._integration_key = None
+        self.transformations = []
         self.reset_dimension()
         self.mode = True
 
-    def set_dimension(self, mask_dimension):
-        if not np.array_equal(mask_dimension, self.mask_dimension):
+    def set_dimension(self, mask_dimension, transformations=None):
+        """
+        Sets the shape of the mask. If the image transformations are given, the mask is first brought into their
+        orientation (see set_transformations), so that rotated images keep their mask. The mask is only reset if the
+        shape still does not fit.
+        """
+        if transformations is not None:
+            self.set_transformations(transformations)
+        if not np.array_equal(mask_dimension, self._mask_data.shape):
             self.mask_dimension = mask_dimension
             self.reset_dimension()
 
+    def set_transformations(self, transformations):
+        """
+        Brings the mask into the orientation of an image with the given transformations (list of functions or names as
+        in ImgData.img_transformations). The drawing and range layers are rotated/flipped as views, the stored layers
+        keep the orientation they were created in and are converted when they are read. The undo history is cleared,
+        because it refers to the previous orientation.
+        """
+        transformations = get_transformation_names(transformations)
+        if transformations == self.transformations:
+            return
+        self._mask_data = convert_mask_orientation(self._mask_data, self.transformations, transformations)
+        if self._geometric_mask_data is not None:
+            self._geometric_mask_data = convert_mask_orientation(self._geometric_mask_data, self.transformations,
+                                                                 transformations)
+        # the pixel arrays of the calibration have to be set again for the new orientation
+        self._tth_array = None
+        self.transformations = transformations
+        self.mask_dimension = self._mask_data.shape
+        self._undo_deque.clear()
+        self._redo_deque.clear()
+        self._mask_version += 1
+        self._layers_version += 1
+
     def reset_dimension(self):
         if self.mask_dimension is not None:
             self._mask_data = np.zeros(self.mask_dimension, dtype=bool)
+            self._mask_version += 1
             self._undo_deque = deque(maxlen=50)
             self._redo_deque = deque(maxlen=50)
+            self.rasterize_geometric_masks()
 
     def get_mask(self):
-        return self._mask_data
+        """
+        Returns the composite of all visible layers. If only the drawing layer is visible it is returned directly,
+        otherwise the composite is cached until one of the layers changes.
+        """
+        static_mask = self._get_static_mask()
+        if static_mask is None and self.drawing_visible:
+            return self._mask_data
+        key = (self._mask_version, self._layers_version, self.drawing_visible, self.ranges_visible,
+               self._mask_data.shape)
+        if key != self._composite_key:
+            if static_mask is None:
+                self._composite = np.zeros(self._mask_data.shape, dtype=bool)
+            elif self.drawing_visible:
+                self._composite = np.logical_or(self._mask_data, static_mask)
+            else:
+                self._composite = static_mask
+            self._composite_key = key
+        return self._composite
+
+    def _get_static_mask(self):
+        """
+        Combines all visible layers except the drawing layer, the result is cached until a layer is changed.
+        """
+        key = (self._layers_version, self.ranges_visible, self._mask_data.shape)
+        if key != self._static_key:
+            static_mask = None
+            layer_masks = [self._get_layer_data(layer) for layer in self._layers.itervalues() if layer['visible']]
+            layer_masks = [layer_mask for layer_mask in layer_masks if layer_mask.shape == self._mask_data.shape]
+            if self.ranges_visible and self._geometric_mask_data is not None:
+                layer_masks.append(self._geometric_mask_data)
+            for layer_mask in layer_masks:
+                if static_mask is None:
+                    static_mask = np.copy(layer_mask)
+                else:
+                    static_mask |= layer_mask
+            self._static_mask = static_mask
+            self._static_key = key
+        return self._static_mask
+
+    def set_roi(self, roi_limits):
+        """
+        Sets the integration region of interest, everything outside of it is masked for the integration.
+        :param roi_limits: (row_min, row_max, column_min, column_max) of the region or None to remove it
+        """
+        if roi_limits is not None:
+            roi_limits = tuple(int(limit) for limit in roi_limits)
+        if roi_limits != self._roi_limits:
+            self._roi_limits = roi_limits
+            self._roi_mask = None
+
+    def _get_roi_mask(self):
+        if self._roi_limits is None:
+            return None
+        if self._roi_mask is None or self._roi_mask.shape != self._mask_data.shape:
+            row_min, row_max, column_min, column_max = self._roi_limits
+            self._roi_mask = np.ones(self._mask_data.shape, dtype=bool)
+            self._roi_mask[row_min:row_max, column_min:column_max] = False
+        return self._roi_mask
+
+    def get_integration_mask(self, use_mask=True):
+        """
+        Returns the mask used for the integration: the composite of all visible layers (if use_mask is True) combined
+        with the region of interest. The result is cached until a layer or the region of interest changes.
+        :return: boolean mask or None if nothing is masked
+        """
+        roi_mask = self._get_roi_mask()
+        if roi_mask is None:
+            return self.get_mask() if use_mask else None
+        if not use_mask:
+            return roi_mask
+        mask = self.get_mask()
+        key = (self._mask_version, self._layers_version, self.drawing_visible, self.ranges_visible,
+               self._roi_limits, self._mask_data.shape)
+        if key != self._integration_key:
+            self._integration_mask = np.logical_or(mask, roi_mask)
+            self._integration_key = key
+        return self._integration_mask
+
+    def get_layer_names(self):
+        names = [DRAWING_LAYER]
+        if self.geometric_masks:
+            names.append(RANGES_LAYER)
+        return names + list(self._layers.keys())
+
+    def get_layer_visibility(self, name):
+        if name == DRAWING_LAYER:
+            return self.drawing_visible
+        elif name == RANGES_LAYER:
+            return self.ranges_visible
+        return self._layers[name]['visible']
+
+    def set_layer_visibility(self, name, visible):
+        if name == DRAWING_LAYER:
+            self.drawing_visible = visible
+        elif name == RANGES_LAYER:
+            self.ranges_visible = visible
+        else:
+            self._layers[name]['visible'] = visible
+            self._layers_version += 1
+
+    def get_layer(self, name):
+        if name == DRAWING_LAYER:
+            return self._mask_data
+        elif name == RANGES_LAYER:
+            return self._geometric_mask_data
+        return self._get_layer_data(self._layers[name])
+
+    def set_layer(self, name, mask, visible=None):
+        """
+        Creates or replaces the named layer with the given mask. The change can be undone.
+        """
+        self._push_history(('layer', name, self._layers.get(name)))
+        if visible is None:
+            visible = self._layers[name]['visible'] if name in self._layers else True
+        self._layers[name] = self._pack_layer(mask, visible)
+        self._layers_version += 1
+
+    def set_detector_masks(self, detector_masks):
+        """
+        Sets the dead pixel, hot pixel and detector gap layers in one undoable step.
+        :param detector_masks: dictionary with 'dead', 'hot' and 'gaps' masks (see
+                               DetectorStatistics.calculate_detector_masks)
+        """
+        entries = []
+        for name, key in [(DEAD_PIXEL_LAYER, 'dead'), (HOT_PIXEL_LAYER, 'hot'), (GAP_LAYER, 'gaps')]:
+            entries.append(('layer', name, self._layers.get(name)))
+            visible = self._layers[name]['visible'] if name in self._layers else True
+            self._layers[name] = self._pack_layer(detector_masks[key], visible)
+        self._push_history(('compound', entries))
+        self._layers_version += 1
+
+    def remove_layer(self, name):
+        if name not in self._layers:
+            return
+        self._push_history(('layer', name, self._layers[name]))
+        del self._layers[name]
+        self._layers_version += 1
+
+    def load_layer(self, name, filename):
+        """
+        Loads a mask file as a named layer, e.g. for static detector gap or beamstop masks.
+        :return: list of the image transformation names stored in the file
+        """
+        mask, transformations = read_mask_file(filename)
+        self.set_layer(name, mask)
+        return transformations
+
+    def _pack_layer(self, mask, visible=True):
+        mask = np.asarray(mask, dtype=bool)
+        return {'packed': np.packbits(mask), 'shape': mask.shape, 'visible': visible,
+                'transformations': list(self.transformations)}
+
+    @staticmethod
+    def _unpack_layer(layer):
+        shape = layer['shape']
+        return np.unpackbits(layer['packed'])[:shape[0] * shape[1]].reshape(shape).view(bool)
+
+    def _get_layer_data(self, layer):
+        """
+        Unpacks a layer and converts it into the current orientation of the mask.
+        """
+        return convert_mask_orientation(self._unpack_layer(layer), layer['transformations'], self.transformations)
 
     def get_img(self):
-        return self._mask_data
+        return self.get_mask()
 
-    def update_deque(self):
+    def update_deque(self, region=None):
         """
-        Saves the current mask data into a deque, which can be popped later
-        to provide an undo/redo feature.
+        Saves the part of the current mask data which will be changed by the next action into a deque, which can be
+        popped later to provide an undo/redo feature. Only the region is stored, bit-packed and compressed.
         When performing a new action the old redo steps will be cleared..._
+        :param region: tuple of slices of the mask which will be modified, None for the whole mask
         """
-        self._undo_deque.append(np.copy(self._mask_data))
+        self._push_history(self._create_history_entry(region))
+
+    def _push_history(self, entry):
+        if entry[0] != 'layer':
+            self._mask_version += 1
+        self._undo_deque.append(entry)
         self._redo_deque.clear()
 
+    def _create_history_entry(self, region=None):
+        if region is None:
+            region = (slice(None), slice(None))
+        region_data = np.asarray(self._mask_data[region], dtype=bool)
+        return ('region', region, self._mask_data.shape, region_data.shape,
+                zlib.compress(np.packbits(region_data).tostring(), 1))
+
+    def _restore_history_entry(self, entry):
+        _, region, mask_shape, region_shape, compressed_data = entry
+        region_data = np.unpackbits(np.fromstring(zlib.decompress(compressed_data), dtype=np.uint8))
+        region_data = region_data[:int(np.prod(region_shape))].reshape(region_shape).astype(bool)
+        if self._mask_data.shape != mask_shape:
+            self._mask_data = np.zeros(mask_shape, dtype=bool)
+        self._mask_data[region] = region_data
+
+    def _swap_history_entry(self, entry):
+        """
+        Restores the region saved in entry and returns an entry with the data currently in this region, which can be
+        used to revert the restore.
+        """
+        if entry[0] == 'compound':
+            return 'compound', [self._swap_history_entry(sub_entry) for sub_entry in reversed(entry[1])]
+        elif entry[0] == 'layer':
+            _, name, layer = entry
+            current_layer = self._layers.get(name)
+            if layer is None:
+                del self._layers[name]
+            else:
+                if current_layer is not None:
+                    layer = dict(layer, visible=current_layer['visible'])
+                self._layers[name] = layer
+            self._layers_version += 1
+            return 'layer', name, current_layer
+
+        if self._mask_data.shape != entry[2]:
+            current_entry = self._create_history_entry()
+        else:
+            current_entry = self._create_history_entry(entry[1])
+        self._restore_history_entry(entry)
+        self._mask_version += 1
+        return current_entry
+
     def undo(self):
         try:
-            old_data = self._undo_deque.pop()
-            self._redo_deque.append(np.copy(self._mask_data))
-            self._mask_data = old_data
+            entry = self._undo_deque.pop()
+            self._redo_deque.append(self._swap_history_entry(entry))
         except IndexError:
             pass
 
     def redo(self):
         try:
-            new_data = self._redo_deque.pop()
-            self._undo_deque.append(np.copy(self._mask_data))
-            self._mask_data = new_data
+            entry = self._redo_deque.pop()
+            self._undo_deque.append(self._swap_history_entry(entry))
         except IndexError:
             pass
 
     def mask_below_threshold(self, img_data, threshold):
         self.update_deque()
-        self._mask_data += (img_data < threshold)
+        self._mask_data |= (img_data < threshold)
 
     def mask_above_threshold(self, img_data, threshold):
         self.update_deque()
-        self._mask_data += (img_data > threshold)
+        self._mask_data |= (img_data > threshold)
 
     def mask_QGraphicsRectItem(self, QGraphicsRectItem):
         rect = QGraphicsRectItem.rect()
@@ -92,23 +371,17 @@ class MaskData(object):
     def mask_QGraphicsPolygonItem(self, QGraphicsPolygonItem):
         """
         Masks a polygon given by a QGraphicsPolygonItem from the QtGui Library.
-        Uses the sklimage.draw.polygon function.
         """
 
         # get polygon points
-        poly_list = list(QGraphicsPolygonItem.shape().toFillPolygon())
-        x = np.zeros(len(poly_list))
-        y = np.zeros(len(poly_list))
-
-        for i, point in enumerate(poly_list):
-            x[i] = point.x()
-            y[i] = point.y()
-        self.mask_polygon(x, y)
+        points = np.array([(point.x(), point.y()) for point in QGraphicsPolygonItem.shape().toFillPolygon()],
+                          dtype=np.float64).reshape(-1, 2)
+        self.mask_polygon(points[:, 0], points[:, 1])
 
     def mask_QGraphicsEllipseItem(self, QGraphicsEllipseItem):
         """
         Masks an Ellipse given by a QGraphicsEllipseItem from the QtGui
-        Library. Uses the sklimage.draw.ellipse function.
+        Library.
         """
         bounding_rect = QGraphicsEllipseItem.rect()
         cx = bounding_rect.center().x()
@@ -122,66 +395,139 @@ class MaskData(object):
         Masks a rectangle. x and y parameters are the upper left corner
         of the rectangle.
         """
-        self.update_deque()
-        if width > 0:
-            x_ind1 = np.round(x)
-            x_ind2 = np.round(x + width)
-        else:
-            x_ind1 = np.round(x + width)
-            x_ind2 = np.round(x)
-        if height > 0:
-            y_ind1 = np.round(y)
-            y_ind2 = np.round(y + height)
-        else:
-            y_ind1 = np.round(y + height)
-            y_ind2 = np.round(y)
-
-        if x_ind1 < 0:
-            x_ind1 = 0
-        if y_ind1 < 0:
-            y_ind1 = 0
-
-        self._mask_data[x_ind1:x_ind2, y_ind1:y_ind2] = self.mode
+        region = rasterizer.get_rectangle_region(x, y, x + width, y + height, self._mask_data.shape)
+        self.update_deque(region)
+        self._mask_data[region] = self.mode
 
     def mask_polygon(self, x, y):
         """
         Masks the a polygon with given vertices. x and y are lists of
-        the polygon vertices. Uses the draw.polygon implementation of
-        the skimage library.
+        the polygon vertices. Uses the scanline fill of Tools.rasterizer.
         """
-        self.update_deque()
-        rr, cc = skimage.draw.polygon(y, x, self._mask_data.shape)
-        self._mask_data[rr, cc] = self.mode
+        self.update_deque(rasterizer.get_polygon_region(y, x, self._mask_data.shape))
+        rasterizer.fill_polygon(self._mask_data, y, x, self.mode)
 
     def mask_ellipse(self, cx, cy, x_radius, y_radius):
         """
         Masks an ellipse with center coordinates (cx, cy) and the radii
-        given. Uses the draw.ellipse implementation of
-        the skimage library.
+        given. Uses the scanline fill of Tools.rasterizer.
         """
-        self.update_deque()
-        rr, cc = skimage.draw.ellipse(
-            cy, cx, y_radius, x_radius, shape=self._mask_data.shape)
-        self._mask_data[rr, cc] = self.mode
+        self.update_deque(rasterizer.get_ellipse_region(cy, cx, y_radius, x_radius, self._mask_data.shape))
+        rasterizer.fill_ellipse(self._mask_data, cy, cx, y_radius, x_radius, self.mode)
+
+    def mask_annulus(self, cx, cy, inner_radius, outer_radius):
+        """
+        Masks a ring with center coordinates (cx, cy) between inner_radius and outer_radius.
+        """
+        self.update_deque(rasterizer.get_ellipse_region(cy, cx, outer_radius, outer_radius, self._mask_data.shape))
+        rasterizer.fill_annulus(self._mask_data, cy, cx, inner_radius, outer_radius, self.mode)
+
+    def mask_stroke(self, x, y, radius):
+        """
+        Masks a brush stroke with the given radius along the line through the points given by the lists x and y.
+        """
+        self.update_deque(rasterizer.get_stroke_region(y, x, radius, self._mask_data.shape))
+        rasterizer.fill_stroke(self._mask_data, y, x, radius, self.mode)
 
     def invert_mask(self):
         self.update_deque()
         self._mask_data = np.logical_not(self._mask_data)
 
     def clear_mask(self):
+        """
+        Clears the drawing layer. Layers loaded from file are kept.
+        """
         self.update_deque()
         self._mask_data[:, :] = False
 
     def remove_cosmic(self, img):
+        cosmic_mask = lacosmic_tiled(img, iterations=2, sigclip=3.0, objlim=3.0, fast=True)
         self.update_deque()
-        test = cosmicsimage(img, sigclip=3.0, objlim=3.0)
-        num = 2
-        for i in xrange(num):
-            test.lacosmiciteration(True)
-            test.clean()
-            self._mask_data = np.logical_or(self._mask_data, np.array(test.mask, dtype='bool'))
+        self._mask_data |= cosmic_mask
 
-        print test.mask
+    def set_geometry(self, tth_array, chi_array, wavelength):
+        """
+        Sets the pixel arrays of the current calibration, which are needed for the geometric masks. The geometric masks
+        are re-rasterized if the calibration changed.
+        :param tth_array: 2theta value of every pixel in radians
+        :param chi_array: azimuth of every pixel in radians
+        :param wavelength: wavelength in m
+        """
+        if tth_array is self._tth_array and wavelength == self._wavelength:
+            return
+        self._tth_array = tth_array
+        self._tth_order = np.argsort(tth_array.ravel())
+        self._tth_sorted = np.rad2deg(tth_array.ravel()[self._tth_order])
+        self._chi_flat = np.rad2deg(chi_array.ravel())
+        self._wavelength = wavelength
+        self.rasterize_geometric_masks()
+
+    def has_geometry(self):
+        return self._tth_array is not None and self._tth_array.shape == self._mask_data.shape
+
+    def mask_tth_range(self, tth_min, tth_max, chi_min=None, chi_max=None):
+        """
+        Masks all pixels with 2theta (in degree) between tth_min and tth_max, optionally limited to an azimuth (chi)
+        range in degree. The range is stored and re-rasterized whenever the calibration changes.
+        """
+        self.add_geometric_mask({'unit': '2th_deg', 'min': tth_min, 'max': tth_max,
+                                 'chi_min': chi_min, 'chi_max': chi_max})
+
+    def mask_q_range(self, q_min, q_max, chi_min=None, chi_max=None):
+        """
+        Masks all pixels with Q (in A^-1) between q_min and q_max, optionally limited to an azimuth (chi) range in
+        degree. The range is stored and re-rasterized whenever the calibration changes.
+        """
+        self.add_geometric_mask({'unit': 'q_A^-1', 'min': q_min, 'max': q_max,
+                                 'chi_min': chi_min, 'chi_max': chi_max})
+
+    def add_geometric_mask(self, geometric_mask):
+        self.geometric_masks.append(geometric_mask)
+        if self.has_geometry():
+            if self._geometric_mask_data is None:
+                self._geometric_mask_data = np.zeros(self._mask_data.shape, dtype=bool)
+            self._geometric_mask_data.ravel()[self._get_geometric_mask_indices(geometric_mask)] = True
+            self._layers_version += 1
+
+    def remove_geometric_mask(self, ind):
+        del self.geometric_masks[ind]
+        self.rasterize_geometric_masks()
+
+    def clear_geometric_masks(self):
+        self.geometric_masks = []
+        self._geometric_mask_data = None
+        self._layers_version += 1
+
+    def rasterize_geometric_masks(self):
+        self._layers_version += 1
+        if not self.geometric_masks or not self.has_geometry():
+            self._geometric_mask_data = None
+            return
+        self._geometric_mask_data = np.zeros(self._mask_data.shape, dtype=bool)
+        for geometric_mask in self.geometric_masks:
+            self._geometric_mask_data.ravel()[self._get_geometric_mask_indices(geometric_mask)] = True
+
+    def _get_geometric_mask_indices(self, geometric_mask):
+        """
+        Returns the flat indices of all pixels within the geometric mask. The 2theta band is taken from the pixels
+        sorted by 2theta, so only the pixels in the band have to be checked for their azimuth.
+        """
+        tth_min, tth_max = geometric_mask['min'], geometric_mask['max']
+        if geometric_mask['unit'] == 'q_A^-1':
+            tth_min, tth_max = convert_q_to_tth(np.array([tth_min, tth_max]), self._wavelength)
+
+        start_ind = np.searchsorted(self._tth_sorted, tth_min, side='left')
+        end_ind = np.searchsorted(self._tth_sorted, tth_max, side='right')
+        indices = self._tth_order[start_ind:end_ind]
+
+        chi_min, chi_max = geometric_mask['chi_min'], geometric_mask['chi_max']
+        if chi_min is None or chi_max is None:
+            return indices
+        chi = self._chi_flat[indices]
+        if chi_min <= chi_max:
+            return indices[(chi >= chi_min) & (chi <= chi_max)]
+        # azimuth range crossing +-180 degree
+        return indices[(chi >= chi_min) | (chi <= chi_max)]
 
     def set_mode(self, mode):
         """
@@ -190,17 +536,127 @@ class MaskData(object):
         self.mode = mode
 
     def set_mask(self, mask_data):
+        """
+        Replaces the drawing layer, named layers loaded from file are kept.
+        """
         self.update_deque()
         self._mask_data = mask_data
 
     def load_mask(self, filename):
-        data = np.loadtxt(filename)
+        """
+        Loads a mask file (binary or legacy text format) and replaces the current mask with it.
+        :return: list of the image transformation names stored in the file
+        """
+        data, transformations = read_mask_file(filename)
         self.mask_dimension = data.shape
         self.reset_dimension()
         self.set_mask(data)
+        return transformations
+
+    def save_mask(self, filename, transformations=None, compress=True):
+        """
+        Saves the composite of all visible layers.
+        """
+        write_mask_file(filename, self.get_mask(), transformations, compress)
 
     def add_mask(self, mask_data):
-        self._mask_data = np.logical_or(np.array(mask_data, dtype='bool'))
+        self.update_deque()
+        self._mask_data = np.logical_or(self._mask_data, np.array(mask_data, dtype='bool'))
+
+
+def convert_q_to_tth(q, wavelength):
+    """
+    Converts Q in A^-1 into 2theta in degree for a wavelength in m.
+    """
+    return np.rad2deg(2 * np.arcsin(np.clip(q * wavelength * 1e10 / (4 * np.pi), -1, 1)))
+
+
+MASK_FILE_MAGIC = 'DIOPTAS_MASK'
+MASK_FILE_VERSION = 1
+# magic, version, compressed flag, rows, columns, length of the transformation string
+MASK_FILE_HEADER = struct.Struct('<12sBBIIH')
+
+mask_transformations = {'rotate_matrix_p90': rotate_matrix_p90,
+                        'rotate_matrix_m90': rotate_matrix_m90,
+                        'fliplr': np.fliplr,
+                        'flipud': np.flipud}
+inverse_mask_transformations = {'rotate_matrix_p90': 'rotate_matrix_m90',
+                                'rotate_matrix_m90': 'rotate_matrix_p90',
+                                'fliplr': 'fliplr',
+                                'flipud': 'flipud'}
+
+
+def get_transformation_names(transformations):
+    """
+    Converts a list of image transformation functions (as used in ImgData.img_transformations) into names.
+    """
+    if transformations is None:
+        return []
+    return [transformation if isinstance(transformation, basestring) else transformation.__name__
+            for transformation in transformations]
+
+
+def write_mask_file(filename, mask, transformations=None, compress=True):
+    """
+    Saves a mask in the binary mask format: a short header with shape and image transformation state followed by the
+    bit-packed mask data, optionally zlib compressed.
+    :param transformations: list of image transformation functions or names which were applied to the image the
+                            mask was created for
+    """
+    mask = np.asarray(mask, dtype=bool)
+    transformation_str = ','.join(get_transformation_names(transformations))
+    packed_data = np.packbits(mask).tostring()
+    if compress:
+        packed_data = zlib.compress(packed_data, 1)
+
+    with open(filename, 'wb') as fp:
+        fp.write(MASK_FILE_HEADER.pack(MASK_FILE_MAGIC, MASK_FILE_VERSION, int(compress),
+                                       mask.shape[0], mask.shape[1], len(transformation_str)))
+        fp.write(transformation_str)
+        fp.write(packed_data)
+
+
+def read_mask_file(filename):
+    """
+    Reads a mask file. Binary mask files are detected by their header, all other files are read as the legacy text
+    format (one integer per pixel). Uncompressed binary files are memory mapped.
+    :return: boolean mask array, list of image transformation names (empty for legacy files)
+    """
+    with open(filename, 'rb') as fp:
+        header = fp.read(MASK_FILE_HEADER.size)
+        if len(header) < MASK_FILE_HEADER.size or not header.startswith(MASK_FILE_MAGIC):
+            return np.array(np.loadtxt(filename), dtype=bool), []
+
+        magic, version, compressed, rows, columns, transformation_length = MASK_FILE_HEADER.unpack(header)
+        if version > MASK_FILE_VERSION:
+            raise IOError('Mask file version {} is not supported.'.format(version))
+        transformation_str = fp.read(transformation_length)
+        if compressed:
+            packed_data = np.fromstring(zlib.decompress(fp.read()), dtype=np.uint8)
+
+    if not compressed:
+        packed_data = np.memmap(filename, dtype=np.uint8, mode='r',
+                                offset=MASK_FILE_HEADER.size + transformation_length)
+
+    mask = np.unpackbits(packed_data)[:rows * columns].reshape((rows, columns)).astype(bool)
+    transformations = transformation_str.split(',') if transformation_str else []
+    return mask, transformations
+
+
+def convert_mask_orientation(mask, from_transformations, to_transformations):
+    """
+    Converts a mask created for an image with the transformations from_transformations into the orientation of an
+    image with to_transformations. Both can be lists of functions or names.
+    """
+    from_transformations = get_transformation_names(from_transformations)
+    to_transformations = get_transformation_names(to_transformations)
+    if from_transformations == to_transformations:
+        return mask
+    for name in reversed(from_transformations):
+        mask = mask_transformations[inverse_mask_transformations[name]](mask)
+    for name in to_transformations:
+        mask = mask_transformations[name](mask)
+    return mask
 
 
 def test_mask_data():
@@ -0,0 +1,202 @@
+# -*- coding: utf8 -*-
+# Dioptas - GUI program for fast processing of 2D X-ray data
+# Copyright (C) 2014  Clemens Prescher (clemens.prescher@gmail.com)
+# GSECARS, University of Chicago
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__author__ = 'Clemens Prescher'
+
+import numpy as np
+from scipy.optimize import leastsq
+from multiprocessing.pool import ThreadPool
+
+
+class MultiCalibrationData(object):
+    """
+    Joint geometry refinement of several calibrant images taken at different detector distances.
+    Wavelength and detector tilt (rot1, rot2, rot3) are shared by all images, while distance and point of normal
+    incidence (poni1, poni2) are refined for each image separately.
+
+    Every image is handled by its own CalibrationData object, which provides the peak search and holds the start
+    geometry. After refine() the jointly refined parameters are written back into the geometry of each of them.
+    """
+
+    def __init__(self, calibration_data_list=None):
+        if calibration_data_list is None:
+            calibration_data_list = []
+        self.calibration_data_list = list(calibration_data_list)
+        self.fit_wavelength = True
+        self.num_threads = 4
+        self.residuals = None
+
+    def add_calibration_data(self, calibration_data):
+        self.calibration_data_list.append(calibration_data)
+
+    def clear(self):
+        self.calibration_data_list = []
+        self.residuals = None
+
+    def search_peaks(self, num_rings, algorithm='Massif', delta_tth=0.1, min_mean_factor=1, upper_limit=55000,
+                     mask=None):
+        """
+        Searches peaks on the first num_rings calibrant rings of every image. The images are processed in parallel,
+        each in its own thread. All images need to be pre-calibrated (e.g. by a calibrate() on a few manually picked
+        peaks).
+        """
+
+        def search_image_peaks(calibration_data):
+            calibration_data.clear_peaks()
+            calibration_data.setup_peak_search_algorithm(algorithm, mask)
+            for ring_ind in xrange(num_rings):
+                calibration_data.search_peaks_on_ring(ring_ind, delta_tth, min_mean_factor, upper_limit, mask)
+            return len(calibration_data.points)
+
+        pool = ThreadPool(min(self.num_threads, max(len(self.calibration_data_list), 1)))
+        try:
+            num_found = pool.map(search_image_peaks, self.calibration_data_list)
+        finally:
+            pool.close()
+            pool.join()
+        return num_found
+
+    def refine(self):
+        """
+        Refines all images simultaneously and updates the geometries of the individual calibration data objects.
+        :return: refined wavelength in m
+        """
+        points_list = [calibration_data.get_point_array() for calibration_data in self.calibration_data_list]
+        geometries = [calibration_data.geometry for calibration_data in self.calibration_data_list]
+        calibrant = self.calibration_data_list[0].calibrant
+
+        start_parameter = {'wavelength': geometries[0].wavelength,
+                           'rot1': geometries[0].rot1,
+                           'rot2': geometries[0].rot2,
+                           'rot3': geometries[0].rot3,
+                           'dist': [geometry.dist for geometry in geometries],
+                           'poni1': [geometry.poni1 for geometry in geometries],
+                           'poni2': [geometry.poni2 for geometry in geometries]}
+
+        result, self.residuals = refine_joint_geometry(points_list, np.array(calibrant.dSpacing, dtype=np.float64),
+                                                       start_parameter,
+                                                       geometries[0].pixel1, geometries[0].pixel2,
+                                                       self.fit_wavelength)
+
+        for ind, calibration_data in enumerate(self.calibration_data_list):
+            calibration_data.geometry.setPyFAI(dist=result['dist'][ind],
+                                               poni1=result['poni1'][ind],
+                                               poni2=result['poni2'][ind],
+                                               rot1=result['rot1'],
+                                               rot2=result['rot2'],
+                                               rot3=result['rot3'],
+                                               pixel1=calibration_data.geometry.pixel1,
+                                               pixel2=calibration_data.geometry.pixel2)
+            calibration_data.geometry.wavelength = result['wavelength']
+            calibration_data.calibrant.setWavelength_change2th(result['wavelength'])
+            calibration_data.is_calibrated = True
+            calibration_data.calibration_name = 'current'
+        return result['wavelength']
+
+
+def calculate_tth(d1, d2, dist, poni1, poni2, rot1, rot2, rot3, pixel1, pixel2):
+    """
+    Calculates the two theta angle (in radians) of pixel positions for a flat detector, following the pyFAI geometry
+    convention. All parameters may be arrays with the same shape as d1 and d2, which allows evaluating points
+    belonging to different detector distances in one vectorized call.
+    :param d1: pixel position along the slow axis
+    :param d2: pixel position along the fast axis
+    """
+    p1 = (0.5 + d1) * pixel1 - poni1
+    p2 = (0.5 + d2) * pixel2 - poni2
+
+    cos_rot1 = np.cos(rot1)
+    cos_rot2 = np.cos(rot2)
+    cos_rot3 = np.cos(rot3)
+    sin_rot1 = np.sin(rot1)
+    sin_rot2 = np.sin(rot2)
+    sin_rot3 = np.sin(rot3)
+
+    t1 = p1 * cos_rot2 * cos_rot3 + \
+         p2 * (cos_rot3 * sin_rot1 * sin_rot2 - cos_rot1 * sin_rot3) - \
+         dist * (cos_rot1 * cos_rot3 * sin_rot2 + sin_rot1 * sin_rot3)
+    t2 = p1 * cos_rot2 * sin_rot3 + \
+         p2 * (cos_rot1 * cos_rot3 + sin_rot1 * sin_rot2 * sin_rot3) - \
+         dist * (-cos_rot3 * sin_rot1 + cos_rot1 * sin_rot2 * sin_rot3)
+    t3 = p1 * sin_rot2 - p2 * cos_rot2 * sin_rot1 + dist * cos_rot1 * cos_rot2
+    return np.arctan2(np.sqrt(t1 * t1 + t2 * t2), t3)
+
+
+def refine_joint_geometry(points_list, d_spacings, start_parameter, pixel1, pixel2, fit_wavelength=True):
+    """
+    Least squares refinement of several images sharing wavelength and detector tilt.
+
+    :param points_list: list of (N_i, 3) arrays with columns (d1, d2, ring index), one per image
+    :param d_spacings: d-spacings of the calibrant rings in Angstrom
+    :param start_parameter: dictionary with 'wavelength' (m), 'rot1', 'rot2', 'rot3' (rad) and lists of 'dist',
+                            'poni1', 'poni2' (m) with one entry per image
+    :param pixel1: pixel size along the slow axis in m
+    :param pixel2: pixel size along the fast axis in m
+    :param fit_wavelength: if False the wavelength is kept at its start value
+    :return: dictionary with the refined parameters (same layout as start_parameter) and the 2theta residuals of all
+             points in radians
+    """
+    num_images = len(points_list)
+    points = np.vstack([np.asarray(image_points, dtype=np.float64).reshape(-1, 3) for image_points in points_list])
+    image_index = np.concatenate([np.ones(len(np.asarray(image_points).reshape(-1, 3)), dtype=int) * ind
+                                  for ind, image_points in enumerate(points_list)])
+    d1 = points[:, 0]
+    d2 = points[:, 1]
+    ring_d = d_spacings[points[:, 2].astype(int)]
+
+    # wavelength is handled in Angstrom to have all fit parameters in a similar order of magnitude
+    wavelength = start_parameter['wavelength'] * 1e10
+    shared = np.array([start_parameter['rot1'], start_parameter['rot2'], start_parameter['rot3']], dtype=np.float64)
+    per_image = np.vstack((start_parameter['dist'],
+                           start_parameter['poni1'],
+                           start_parameter['poni2'])).T.astype(np.float64)
+
+    def unpack(parameter):
+        if fit_wavelength:
+            cur_wavelength = parameter[0]
+            parameter = parameter[1:]
+        else:
+            cur_wavelength = wavelength
+        rotations = parameter[:3]
+        image_parameter = parameter[3:].reshape(num_images, 3)
+        return cur_wavelength, rotations, image_parameter
+
+    def residuals(parameter):
+        cur_wavelength, rotations, image_parameter = unpack(parameter)
+        point_parameter = image_parameter[image_index]
+        tth = calculate_tth(d1, d2,
+                            point_parameter[:, 0], point_parameter[:, 1], point_parameter[:, 2],
+                            rotations[0], rotations[1], rotations[2],
+                            pixel1, pixel2)
+        return tth - 2 * np.arcsin(cur_wavelength / (2 * ring_d))
+
+    start = np.concatenate((shared, per_image.ravel()))
+    if fit_wavelength:
+        start = np.concatenate(([wavelength], start))
+
+    parameter, _ = leastsq(residuals, start)
+    cur_wavelength, rotations, image_parameter = unpack(parameter)
+
+    result = {'wavelength': cur_wavelength * 1e-10 if fit_wavelength else start_parameter['wavelength'],
+              'rot1': rotations[0],
+              'rot2': rotations[1],
+              'rot3': rotations[2],
+              'dist': list(image_parameter[:, 0]),
+              'poni1': list(image_parameter[:, 1]),
+              'poni2': list(image_parameter[:, 2])}
+    return result, residuals(parameter)
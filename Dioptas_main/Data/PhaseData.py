@@ -21,6 +21,7 @@ __author__ = 'Clemens Prescher'
 from HelperModule import Observable
 from Data.jcpds import jcpds
 import numpy as np
+from scipy.optimize import brentq
 
 
 class PhaseData(Observable):
@@ -52,13 +53,8 @@ class PhaseData(Observable):
 
     def get_lines_d(self, ind):
         reflections = self.phases[ind].get_reflections()
-        res = np.zeros((len(reflections), 5))
-        for i, reflection in enumerate(reflections):
-            res[i, 0] = reflection.d
-            res[i, 1] = reflection.intensity
-            res[i, 2] = reflection.h
-            res[i, 3] = reflection.k
-            res[i, 4] = reflection.l
+        res = np.column_stack((reflections.d, reflections.intensity,
+                               reflections.h, reflections.k, reflections.l)).astype(np.float64)
         self.reflections[ind] = res
         return res
 
@@ -72,21 +68,8 @@ class PhaseData(Observable):
 
     def rescale_reflections(self, ind, spectrum, x_range,
                             y_range, wavelength, unit='tth'):
-        positions = self.reflections[ind][:, 0]
-        if unit is 'q' or unit is 'tth':
-            positions = 2 * \
-                        np.arcsin(wavelength / (2 * positions)) * 180.0 / np.pi
-            if unit == 'q':
-                positions = 4 * np.pi / wavelength * \
-                            np.sin(positions / 360 * np.pi)
-
-        x, y = spectrum.data
-        max_intensity = np.min(
-            [np.max(y[np.where((x > x_range[0]) &
-                               (x < x_range[1]))]), y_range[1]])
-        baseline = y_range[0] + 0.05 * (y_range[1] - y_range[0])
-        if baseline < 0:
-            baseline = 0
+        positions = convert_d_spacings(self.reflections[ind][:, 0], wavelength, unit)
+        max_intensity, baseline = get_line_scaling_range(spectrum, x_range, y_range)
         # search for reflections within spectrum range
         intensities = self.reflections[ind][:, 1]
         intensities_for_scaling = intensities[
@@ -104,6 +87,236 @@ class PhaseData(Observable):
         intensities = scale_factor * self.reflections[ind][:, 1] + baseline
         return positions, intensities, baseline
 
+    def rescale_reflections_all(self, spectrum, x_range, y_range, wavelength, unit='tth'):
+        """
+        Rescales the reflections of all phases at once. Gives the same result as calling rescale_reflections for every
+        phase, but the spectrum is only searched once and the reflections of all phases are converted together.
+        :return: list of positions arrays, list of intensities arrays (one per phase), baseline
+        """
+        if len(self.reflections) == 0:
+            return [], [], 0
+        lengths = np.array([len(reflections) for reflections in self.reflections])
+        phase_indices = np.repeat(np.arange(len(lengths)), lengths)
+        all_reflections = np.concatenate([np.reshape(reflections, (-1, 5)) for reflections in self.reflections])
+        intensities = all_reflections[:, 1]
+
+        positions = convert_d_spacings(all_reflections[:, 0], wavelength, unit)
+        max_intensity, baseline = get_line_scaling_range(spectrum, x_range, y_range)
+
+        # maximum intensity of each phase within the spectrum range
+        in_range = (positions > x_range[0]) & (positions < x_range[1])
+        max_phase_intensities = np.zeros(len(lengths))
+        np.maximum.at(max_phase_intensities, phase_indices[in_range], intensities[in_range])
+        scale_factors = np.ones(len(lengths))
+        scaled = max_phase_intensities > 0
+        scale_factors[scaled] = (max_intensity - baseline) / max_phase_intensities[scaled]
+        scale_factors[scale_factors <= 0] = 0.01
+
+        intensities = scale_factors[phase_indices] * intensities + baseline
+        split_indices = np.cumsum(lengths)[:-1]
+        return np.split(positions, split_indices), np.split(intensities, split_indices), baseline
+
+    def fit_pressure(self, ind, x, y, wavelength, unit='tth', fit_temperature=False, tolerance=0.02):
+        """
+        Fits the pressure of a phase to the peaks of a pattern next to its lines and sets it. With fit_temperature the
+        temperature is fitted at the current pressure instead.
+        :return: (fitted value, its error, number of peaks used), None if no peak could be found
+        """
+        phase = self.phases[ind]
+        result = fit_phase(phase, x, y, wavelength, unit, phase.pressure, phase.temperature, fit_temperature,
+                           tolerance)
+        if result is not None:
+            if fit_temperature:
+                self.set_temperature(ind, result[0])
+            else:
+                self.set_pressure(ind, result[0])
+        return result
+
+    def fit_pressure_series(self, ind, x, intensities, wavelength, unit='tth', tolerance=0.02):
+        """
+        Fits the pressure of a phase to every spectrum of a series, starting each frame from the result of the
+        previous one. The state of the phase is not changed.
+        :param intensities: (frames, x) array
+        :return: pressures and their errors for each frame, nan for frames where the fit failed
+        """
+        phase = self.phases[ind]
+        pressures = np.ones(len(intensities)) * np.nan
+        errors = np.ones(len(intensities)) * np.nan
+        pressure = phase.pressure
+        for frame_ind, y in enumerate(intensities):
+            result = fit_phase(phase, x, y, wavelength, unit, pressure, phase.temperature, tolerance=tolerance)
+            if result is not None:
+                pressure, errors[frame_ind], _ = result
+                pressures[frame_ind] = pressure
+        return pressures, errors
+
+
+def convert_d_spacings(d_spacings, wavelength, unit='tth'):
+    """
+    Converts d-spacings into the positions in the given unit ('tth', 'q' or 'd')
+    """
+    if unit == 'q' or unit == 'tth':
+        positions = 2 * np.arcsin(wavelength / (2 * d_spacings)) * 180.0 / np.pi
+        if unit == 'q':
+            positions = 4 * np.pi / wavelength * np.sin(positions / 360 * np.pi)
+        return positions
+    return d_spacings
+
+
+def get_line_scaling_range(spectrum, x_range, y_range):
+    """
+    Returns the maximum intensity of the spectrum within the visible range and the baseline of the phase lines.
+    """
+    x, y = spectrum.data
+    max_intensity = np.min(
+        [np.max(y[np.where((x > x_range[0]) &
+                           (x < x_range[1]))]), y_range[1]])
+    baseline = y_range[0] + 0.05 * (y_range[1] - y_range[0])
+    if baseline < 0:
+        baseline = 0
+    return max_intensity, baseline
+
+
+def convert_positions_to_d(positions, wavelength, unit='tth'):
+    """
+    Converts positions in the given unit ('tth', 'q' or 'd') into d-spacings
+    """
+    if unit == 'tth':
+        return wavelength / (2 * np.sin(np.asarray(positions) / 360. * np.pi))
+    elif unit == 'q':
+        return 2 * np.pi / np.asarray(positions)
+    return np.asarray(positions)
+
+
+def find_peaks_in_windows(x, y, lower, upper, noise=None):
+    """
+    Searches for one peak in each of the windows [lower, upper] of a pattern. The peak position is refined by a
+    parabola through the maximum and its neighbours.
+    :param x: ascending x values of the pattern
+    :param noise: noise level of y, peaks have to be 5 times higher than it, estimated from y if None
+    :return: peak positions, boolean array which is False for windows without a clear local maximum
+    """
+    start = np.searchsorted(x, lower, side='left')
+    end = np.searchsorted(x, upper, side='right')
+    width = np.max(end - start) if len(start) else 0
+    if width < 3:
+        return np.zeros(len(start)), np.zeros(len(start), dtype=bool)
+
+    indices = start[:, np.newaxis] + np.arange(width)
+    in_window = indices < end[:, np.newaxis]
+    indices = np.minimum(indices, len(x) - 1)
+    window_max = np.argmax(np.where(in_window, y[indices], -np.inf), axis=1)
+    peak_indices = start + window_max
+    window_min = np.min(np.where(in_window, y[indices], np.inf), axis=1)
+
+    if noise is None:
+        noise = estimate_noise(y)
+    found = (window_max > 0) & (peak_indices < end - 1) & \
+            (y[np.minimum(peak_indices, len(x) - 1)] - window_min > 5 * noise)
+
+    peak_indices = np.clip(peak_indices, 1, len(x) - 2)
+    x0, x1, x2 = x[peak_indices - 1], x[peak_indices], x[peak_indices + 1]
+    y0, y1, y2 = y[peak_indices - 1], y[peak_indices], y[peak_indices + 1]
+    denominator = (x0 - x1) * (x0 - x2) * (x1 - x2)
+    a = (x2 * (y1 - y0) + x1 * (y0 - y2) + x0 * (y2 - y1))
+    b = (x2 * x2 * (y0 - y1) + x1 * x1 * (y2 - y0) + x0 * x0 * (y1 - y2))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        positions = np.where((a != 0) & (denominator != 0), -b / (2 * a), x1)
+    found &= (positions > x0) & (positions < x2)
+    return positions, found
+
+
+def estimate_noise(y):
+    """
+    Estimates the noise level of a pattern from its point to point scatter.
+    """
+    return 1.4826 * np.median(np.abs(np.diff(y))) / np.sqrt(2)
+
+
+def fit_phase(phase, x, y, wavelength, unit='tth', pressure=0., temperature=298., fit_temperature=False,
+              tolerance=0.02, search_range=0.05, iterations=4):
+    """
+    Fits the pressure (or temperature) of a jcpds phase to a pattern. A coarse start value is taken from the
+    compression (within +-search_range of the d-spacings) at which the pattern has the highest intensity at the
+    lines of the phase. Peaks are then searched within a relative d-spacing tolerance around the predicted lines and
+    the unit cell volume is fitted to the intensity weighted mean of the observed/predicted d-spacing ratios. The
+    search windows are halved in each iteration. The volume is finally converted into pressure (or temperature at
+    the given pressure) with the equation of state.
+    :return: (fitted value, its error, number of peaks used), None if no peak could be found
+    """
+    if phase.k0 <= 0 or phase.v0 <= 0:
+        return None
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # spectra of a series are padded with nan
+    finite = np.isfinite(y)
+    x = x[finite]
+    y = y[finite]
+    if len(x) < 3:
+        return None
+    if x[0] > x[-1]:
+        x = x[::-1]
+        y = y[::-1]
+    intensities = phase.get_reflections().intensity
+    volume = float(phase.compute_volumes(pressure, temperature))
+    noise = estimate_noise(y)
+
+    if search_range > 0:
+        scales = np.exp(np.linspace(-search_range, search_range, 201))
+        with np.errstate(invalid='ignore'):
+            positions = convert_d_spacings(phase.get_d_spacings_for_volume(volume) * scales[:, np.newaxis],
+                                           wavelength, unit)
+            line_intensities = np.interp(positions, x, y - np.min(y), left=np.nan, right=np.nan)
+        scores = np.nansum(intensities * line_intensities, axis=1)
+        volume *= scales[np.argmax(scores)] ** 3
+
+    num_peaks = 0
+    log_ratio_error = 0.
+    for iteration in xrange(iterations):
+        d_spacings = phase.get_d_spacings_for_volume(volume)
+        with np.errstate(invalid='ignore'):
+            bounds = convert_d_spacings(np.array([d_spacings * (1 - tolerance), d_spacings * (1 + tolerance)]),
+                                        wavelength, unit)
+            bounds = np.where(np.isfinite(bounds), bounds, -np.inf)
+        positions, found = find_peaks_in_windows(x, y, np.min(bounds, axis=0), np.max(bounds, axis=0), noise)
+        if not np.any(found):
+            break
+        num_peaks = int(np.sum(found))
+
+        log_ratios = np.log(convert_positions_to_d(positions[found], wavelength, unit) / d_spacings[found])
+        weights = intensities[found] / np.sum(intensities[found])
+        mean_log_ratio = np.sum(weights * log_ratios)
+        if num_peaks > 1:
+            log_ratio_error = np.sqrt(np.sum(weights * (log_ratios - mean_log_ratio) ** 2) / (num_peaks - 1))
+        else:
+            log_ratio_error = 0.
+        volume *= np.exp(3 * mean_log_ratio)
+        tolerance *= 0.5
+
+    if num_peaks == 0:
+        return None
+    if fit_temperature:
+        value = get_temperature_for_volume(phase, volume, pressure)
+        if value is None:
+            return None
+        error_value = get_temperature_for_volume(phase, volume * np.exp(3 * log_ratio_error), pressure)
+        error = abs(error_value - value) if error_value is not None else np.nan
+    else:
+        value = float(phase.get_pressure(volume, temperature))
+        error = abs(float(phase.get_pressure(volume * np.exp(-3 * log_ratio_error), temperature)) - value)
+    return value, error, num_peaks
+
+
+def get_temperature_for_volume(phase, volume, pressure, t_min=1., t_max=6000.):
+    """
+    Returns the temperature at which the phase has the given volume at the given pressure, None if it is outside of
+    [t_min, t_max]
+    """
+    difference = lambda temperature: float(phase.compute_volumes(pressure, temperature)) - volume
+    if difference(t_min) * difference(t_max) > 0:
+        return None
+    return brentq(difference, t_min, t_max)
+
 
 def test_volume_calculation():
     import numpy as np
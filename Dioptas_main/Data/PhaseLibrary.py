@@ -0,0 +1,194 @@
+# -*- coding: utf8 -*-
+# Dioptas - GUI program for fast processing of 2D X-ray data
+#     Copyright (C) 2014  Clemens Prescher (clemens.prescher@gmail.com)
+#     GSECARS, University of Chicago
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__author__ = 'Clemens Prescher'
+
+import os
+import numpy as np
+from Data.jcpds import jcpds, compute_volumes
+
+
+class PhaseLibrary(object):
+    """
+    Catalog of the jcpds files in one or more directories, which can be searched for the phases explaining a list of
+    observed d-spacings. Parsed files are cached by their modification time, rescanning a directory only reads new or
+    changed files. The ambient d-spacings of all phases are kept in one sorted index.
+    """
+
+    def __init__(self):
+        self.directories = []
+        self.filenames = []
+        self.phases = []
+        self._cache = {}
+
+        self.d_spacings = np.zeros(0)
+        self.intensities = np.zeros(0)
+        self.phase_indices = np.zeros(0, dtype=int)
+        self._sort_order = np.zeros(0, dtype=int)
+        self._sorted_d_spacings = np.zeros(0)
+
+    def __len__(self):
+        return len(self.phases)
+
+    def add_directory(self, directory, recursive=True):
+        """
+        Adds all jcpds files in directory to the library.
+        :param recursive: whether subdirectories are scanned as well
+        """
+        directory = os.path.abspath(directory)
+        if (directory, recursive) not in self.directories:
+            self.directories.append((directory, recursive))
+        self.rescan()
+
+    def rescan(self):
+        """
+        Updates the catalog from the directories of the library. Files are only parsed again when their modification
+        time has changed, files which do not exist anymore are removed.
+        """
+        filenames = []
+        for directory, recursive in self.directories:
+            filenames.extend(get_jcpds_filenames(directory, recursive))
+        filenames = sorted(set(filenames))
+
+        cache = {}
+        for filename in filenames:
+            mtime = os.path.getmtime(filename)
+            if filename in self._cache and self._cache[filename][0] == mtime:
+                cache[filename] = self._cache[filename]
+            else:
+                cache[filename] = (mtime, read_phase(filename))
+        self._cache = cache
+
+        self.filenames = [filename for filename in filenames if cache[filename][1] is not None]
+        self.phases = [cache[filename][1] for filename in self.filenames]
+        self._create_index()
+
+    def _create_index(self):
+        d_spacings = []
+        intensities = []
+        for phase in self.phases:
+            reflections = phase.get_reflections()
+            valid = np.isfinite(reflections.d) & (reflections.d > 0)
+            d_spacings.append(reflections.d[valid])
+            intensities.append(reflections.intensity[valid])
+        lengths = [len(d) for d in d_spacings]
+
+        self.d_spacings = np.concatenate(d_spacings) if len(d_spacings) else np.zeros(0)
+        self.intensities = np.concatenate(intensities) if len(intensities) else np.zeros(0)
+        self.phase_indices = np.repeat(np.arange(len(lengths)), lengths)
+        self._sort_order = np.argsort(self.d_spacings, kind='mergesort')
+        self._sorted_d_spacings = self.d_spacings[self._sort_order]
+
+    def search(self, d_spacings, tolerance=0.005, pressures=None, temperature=298., max_results=20):
+        """
+        Ranks the phases of the library by how well they explain the observed d-spacings. The score of a phase is the
+        fraction of observed peaks having a reflection of the phase within the tolerance, multiplied by the intensity
+        fraction of its reflections within the observed d range which are matched by a peak.
+        :param d_spacings: observed peak positions in Angstrom
+        :param tolerance: relative tolerance of a match
+        :param pressures: optional pressures in GPa, each phase is then compressed to all of them and its best
+                          pressure is reported
+        :param temperature: temperature in K used for the compression
+        :return: list of (filename, score, pressure) tuples, best match first
+        """
+        d_spacings = np.sort(np.asarray(d_spacings, dtype=np.float64))
+        if len(d_spacings) == 0 or len(self.phases) == 0:
+            return []
+        if pressures is None:
+            pressures = [0.]
+        pressures = np.asarray(pressures, dtype=np.float64)
+
+        scales = self.get_compression_ratios(pressures, temperature)
+        scores = np.array([self._score(d_spacings, tolerance, phase_scales) for phase_scales in scales])
+        best_scores = np.max(scores, axis=0)
+        # usually a range of pressures reaches the best score, its center is reported
+        is_best = scores == best_scores
+        best_pressures = np.sum(is_best * pressures[:, np.newaxis], axis=0) / np.sum(is_best, axis=0)
+
+        ranking = np.argsort(-best_scores, kind='mergesort')[:max_results]
+        return [(self.filenames[ind], best_scores[ind], best_pressures[ind])
+                for ind in ranking if best_scores[ind] > 0]
+
+    def get_compression_ratios(self, pressures, temperature=298.):
+        """
+        :return: (pressures, phases) array of the linear compression (V/V0)^(1/3) of every phase, phases without a
+                 valid equation of state are not compressed
+        """
+        parameters = np.array([(phase.v0, phase.k0, phase.k0p0, phase.dk0pdt, phase.alpha_t0, phase.d_alpha_dt)
+                               for phase in self.phases]).reshape(-1, 6).T
+        valid = np.all(np.isfinite(parameters), axis=0) & (parameters[0] > 0)
+        ratios = np.ones((len(pressures), len(self.phases)))
+        volumes = compute_volumes(np.asarray(pressures, dtype=np.float64)[:, np.newaxis], temperature,
+                                  *parameters[:, valid])
+        ratios[:, valid] = (volumes / parameters[0, valid]) ** (1. / 3.)
+        ratios[~np.isfinite(ratios) | (ratios <= 0)] = 1
+        return ratios
+
+    def _score(self, d_spacings, tolerance, scales):
+        num_peaks = len(d_spacings)
+        num_phases = len(self.phases)
+
+        # candidates from the sorted index, with the extreme compression of all phases
+        lower = np.searchsorted(self._sorted_d_spacings, d_spacings * (1 - tolerance) / np.max(scales), side='left')
+        upper = np.searchsorted(self._sorted_d_spacings, d_spacings * (1 + tolerance) / np.min(scales), side='right')
+        counts = upper - lower
+        peak_indices = np.repeat(np.arange(num_peaks), counts)
+        offsets = np.arange(np.sum(counts)) - np.repeat(np.cumsum(counts) - counts, counts)
+        reflection_indices = self._sort_order[np.repeat(lower, counts) + offsets]
+        phase_indices = self.phase_indices[reflection_indices]
+
+        compressed_d = self.d_spacings[reflection_indices] * scales[phase_indices]
+        matched = np.abs(compressed_d - d_spacings[peak_indices]) <= tolerance * d_spacings[peak_indices]
+        reflection_indices = reflection_indices[matched]
+        peak_pairs = np.unique(phase_indices[matched] * num_peaks + peak_indices[matched])
+        explained_peaks = np.bincount(peak_pairs // num_peaks, minlength=num_phases)
+
+        matched_reflections = np.unique(reflection_indices)
+        matched_intensity = np.bincount(self.phase_indices[matched_reflections],
+                                        weights=self.intensities[matched_reflections], minlength=num_phases)
+        all_compressed_d = self.d_spacings * scales[self.phase_indices]
+        in_range = (all_compressed_d >= d_spacings[0] * (1 - tolerance)) & \
+                   (all_compressed_d <= d_spacings[-1] * (1 + tolerance))
+        expected_intensity = np.bincount(self.phase_indices[in_range], weights=self.intensities[in_range],
+                                         minlength=num_phases)
+
+        intensity_fraction = np.zeros(num_phases)
+        has_lines = expected_intensity > 0
+        intensity_fraction[has_lines] = matched_intensity[has_lines] / expected_intensity[has_lines]
+        return explained_peaks / float(num_peaks) * intensity_fraction
+
+
+def get_jcpds_filenames(directory, recursive=True):
+    filenames = []
+    for root, dirs, files in os.walk(directory):
+        filenames.extend(os.path.join(root, name) for name in files if name.lower().endswith('.jcpds'))
+        if not recursive:
+            break
+    return filenames
+
+
+def read_phase(filename):
+    """
+    :return: the jcpds object of the file or None if the file can not be read
+    """
+    phase = jcpds()
+    try:
+        phase.read_file(filename)
+    except (IOError, ValueError, IndexError, ZeroDivisionError):
+        return None
+    return phase
@@ -0,0 +1,63 @@
+# -*- coding: utf8 -*-
+# Dioptas - GUI program for fast processing of 2D X-ray data
+#     Copyright (C) 2014  Clemens Prescher (clemens.prescher@gmail.com)
+#     GSECARS, University of Chicago
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__author__ = 'Clemens Prescher'
+
+import atexit
+import multiprocessing
+
+_pool = None
+
+
+def get_process_pool():
+    """
+    Returns the process pool shared by all parallel computations of the program. It is created with one worker per
+    CPU on the first call and terminated when the program exits. Frozen (PyInstaller) builds need
+    multiprocessing.freeze_support() at the start of the main script for the workers to start.
+    """
+    global _pool
+    if _pool is None:
+        _pool = multiprocessing.Pool()
+        atexit.register(close_process_pool)
+    return _pool
+
+
+def close_process_pool():
+    global _pool
+    if _pool is not None:
+        _pool.terminate()
+        _pool.join()
+        _pool = None
+
+
+def map_in_processes(function, jobs, processes=None):
+    """
+    Maps function over jobs in worker processes. With a single job or processes=1 everything runs in this process,
+    processes=None uses the shared pool and any other number a temporary pool of this size.
+    :param function: function on module level (has to be picklable)
+    """
+    if processes == 1 or len(jobs) <= 1:
+        return map(function, jobs)
+    if processes is None:
+        return get_process_pool().map(function, jobs)
+    pool = multiprocessing.Pool(processes)
+    try:
+        return pool.map(function, jobs)
+    finally:
+        pool.close()
+        pool.join()
@@ -0,0 +1,168 @@
+# -*- coding: utf8 -*-
+# Dioptas - GUI program for fast processing of 2D X-ray data
+# Copyright (C) 2014  Clemens Prescher (clemens.prescher@gmail.com)
+# GSECARS, University of Chicago
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__author__ = 'Clemens Prescher'
+
+import numpy as np
+from HelperModule import Observable
+from SpectrumData import resample_spectrum, convert_x_value
+from SpectrumStack import is_evenly_spaced
+
+INITIAL_CAPACITY = 256
+
+
+class SeriesData(Observable):
+    """
+    Integrated spectra of an image series as (frame x bin) intensity matrix. The x axis is set by the first frame,
+    later frames with different x values are resampled onto it. The matrix is preallocated and its capacity is doubled
+    when it is full, frames of already known image files replace their row.
+    """
+
+    def __init__(self):
+        Observable.__init__(self)
+        self.clear()
+
+    def clear(self):
+        self.x = None
+        self.unit = None
+        self.filenames = []
+        self._frame_indices = {}
+        self._intensities = np.zeros((0, 0), dtype=np.float32)
+        self.num_frames = 0
+        self._display_x = None
+        self._display_interpolation = None
+
+    def __len__(self):
+        return self.num_frames
+
+    @property
+    def intensities(self):
+        return self._intensities[:self.num_frames]
+
+    def add_frame(self, filename, x, y, unit='2th_deg', wavelength=None):
+        """
+        Adds the spectrum of an image file. Spectra in another unit than the one of the series are converted into it,
+        without a wavelength they can not be converted and are ignored.
+        :param wavelength: wavelength in m
+        :return: row index of the frame, -1 if the frame was ignored
+        """
+        if unit != self.unit and self.x is not None:
+            if wavelength is None:
+                return -1
+            x = convert_x_value(np.asarray(x, dtype=np.float64), unit, self.unit, wavelength)
+
+        if self.x is None:
+            self.x = np.array(x, dtype=np.float64)
+            self.unit = unit
+        elif not np.array_equal(x, self.x):
+            y = resample_spectrum(x, y, self.x)
+            outside = (self.x < np.min(x)) | (self.x > np.max(x))
+            y[outside] = np.nan
+
+        ind = self._frame_indices.get(filename)
+        if ind is None:
+            ind = self.num_frames
+            self._reserve(ind + 1)
+            self._frame_indices[filename] = ind
+            self.filenames.append(filename)
+            self.num_frames += 1
+        self._intensities[ind] = y
+        self.notify()
+        return ind
+
+    def get_frame_index(self, filename):
+        return self._frame_indices.get(filename, -1)
+
+    def get_bin_index(self, x_value):
+        return int(np.argmin(np.abs(self.x - x_value)))
+
+    def get_trace(self, x_value):
+        """
+        :return: intensity of the bin closest to x_value in every frame
+        """
+        return self.intensities[:, self.get_bin_index(x_value)]
+
+    def get_display_x(self):
+        """
+        Returns the x axis of the images of get_image: the x axis of the series if it is ascending and evenly spaced,
+        otherwise (e.g. d spacings) an evenly spaced axis with the same number of points covering its range.
+        """
+        if self.x is None or is_evenly_spaced(self.x):
+            return self.x
+        if self._display_x is None:
+            self._display_x = np.linspace(np.min(self.x), np.max(self.x), len(self.x))
+            order = np.argsort(self.x)
+            x = self.x[order]
+            upper = np.clip(np.searchsorted(x, self._display_x), 1, len(x) - 1)
+            weights = (self._display_x - x[upper - 1]) / (x[upper] - x[upper - 1])
+            self._display_interpolation = order[upper - 1], order[upper], weights.astype(np.float32)
+        return self._display_x
+
+    def _resample_to_display_x(self, image):
+        if self.get_display_x() is self.x:
+            return image
+        lower, upper, weights = self._display_interpolation
+        return image[:, lower] * (1 - weights) + image[:, upper] * weights
+
+    def get_image(self, max_frames=2000, max_bins=2000, frame_start=0, frame_end=None):
+        """
+        Returns the intensities of a frame range on the axis of get_display_x(), reduced to at most
+        max_frames x max_bins by averaging blocks of neighbouring frames and bins, so that large series can be shown
+        at screen resolution.
+        :return: image, number of frames per row, number of bins per column
+        """
+        if frame_end is None:
+            frame_end = self.num_frames
+        frame_start = min(max(int(frame_start), 0), self.num_frames)
+        frame_end = min(max(int(frame_end), frame_start), self.num_frames)
+        image = self._intensities[frame_start:frame_end]
+        if image.size == 0:
+            return image, 1, 1
+        image = self._resample_to_display_x(image)
+        frame_step = int(np.ceil(image.shape[0] / float(max_frames)))
+        bin_step = int(np.ceil(image.shape[1] / float(max_bins)))
+        return downsample_image(image, frame_step, bin_step), frame_step, bin_step
+
+    def _reserve(self, num_frames):
+        capacity = self._intensities.shape[0]
+        if num_frames <= capacity:
+            return
+        new_intensities = np.empty((max(2 * capacity, num_frames, INITIAL_CAPACITY), len(self.x)), dtype=np.float32)
+        if self.num_frames:
+            new_intensities[:self.num_frames] = self.intensities
+        self._intensities = new_intensities
+
+
+def downsample_image(image, row_step, col_step):
+    """
+    Averages blocks of row_step x col_step pixels, nan values are ignored. Incomplete blocks at the end are averaged
+    over their existing pixels.
+    """
+    if row_step <= 1 and col_step <= 1:
+        return image
+    num_rows = int(np.ceil(image.shape[0] / float(row_step)))
+    num_cols = int(np.ceil(image.shape[1] / float(col_step)))
+    padded = np.empty((num_rows * row_step, num_cols * col_step), dtype=np.float32)
+    padded[:] = np.nan
+    padded[:image.shape[0], :image.shape[1]] = image
+    blocks = padded.reshape(num_rows, row_step, num_cols, col_step)
+    valid = ~np.isnan(blocks)
+    sums = np.sum(np.where(valid, blocks, 0), axis=(1, 3))
+    counts = np.sum(valid, axis=(1, 3))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (sums / counts).astype(np.float32)
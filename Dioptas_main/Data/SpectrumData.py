@@ -21,6 +21,9 @@ import numpy as np
 import os
 from copy import deepcopy
 from HelperModule import Observable, FileNameIterator, get_base_name
+from SpectrumReader import read_spectrum_file
+from SpectrumStore import SpectrumStore
+from SpectrumStack import SpectrumStack
 
 
 class SpectrumData(Observable):
@@ -28,6 +31,7 @@ class SpectrumData(Observable):
         Observable.__init__(self)
         self.spectrum = Spectrum()
         self.overlays = []
+        self.overlay_stack = SpectrumStack()
         self.phases = []
 
         self.file_iteration_mode = 'number'
@@ -67,9 +71,66 @@ class SpectrumData(Observable):
         self.overlays.append(Spectrum())
         self.overlays[-1].load(filename)
 
+    def add_overlays_from_store(self, directory, indices=None):
+        """
+        Adds the frames of a SpectrumStore as overlays.
+        :param indices: list of frame indices, None for all frames
+        """
+        store = SpectrumStore(directory)
+        intensities = store.get_intensities()
+        frames = store.get_frames()
+        if indices is None:
+            indices = xrange(len(store))
+        for ind in indices:
+            name = os.path.splitext(frames['filename'][ind])[0]
+            self.overlays.append(Spectrum(store.x, np.array(intensities[ind], dtype=np.float64), name))
+
     def del_overlay(self, ind):
         del self.overlays[ind]
 
+    def clear_overlays(self):
+        self.overlays = []
+        if self.bkg_ind != -1:
+            self.bkg_ind = -1
+            self.spectrum.reset_background()
+            self.notify()
+
+    def load_overlay_stack(self, filenames):
+        """
+        Loads a series of spectrum files into the overlay stack, consecutive files with the same x values are added
+        in one step.
+        """
+        x_values = []
+        intensities = []
+        names = []
+        for filename in filenames:
+            x, y = read_spectrum_file(filename)
+            if len(x_values) and not np.array_equal(x, x_values[-1]):
+                self.overlay_stack.extend(x_values[-1], intensities, names)
+                intensities = []
+                names = []
+            x_values = [x]
+            intensities.append(y)
+            names.append(get_base_name(filename))
+        if len(intensities):
+            self.overlay_stack.extend(x_values[-1], intensities, names)
+
+    def load_overlay_stack_from_store(self, directory):
+        """
+        Adds all frames of a SpectrumStore to the overlay stack.
+        """
+        store = SpectrumStore(directory)
+        names = [os.path.splitext(filename)[0] for filename in store.get_frames()['filename']]
+        self.overlay_stack.extend(store.x, store.get_intensities(), names)
+
+    def set_auto_background(self, estimator):
+        """
+        Subtracts a background estimated from the spectrum itself, None switches it off.
+        :param estimator: BackgroundEstimator
+        """
+        self.spectrum.set_auto_background(estimator)
+        self.notify()
+
     def set_file_iteration_mode(self, mode):
         """
         The file iteration_mode determines how to browse between files in a specific folder:
@@ -97,12 +158,21 @@ class Spectrum(object):
         self.offset = 0
         self._scaling = 1
         self.bkg_spectrum = None
+        # the version changes with the x and y data, it is used for caching the resampled background
+        self._version = 0
+        self._bkg_key = None
+        self._bkg_on_grid = None
+        self.auto_bkg_estimator = None
+        self._auto_bkg_key = None
+        self._auto_bkg = None
 
-    def load(self, filename, skiprows=4):
+    def load(self, filename, skiprows=None):
+        """
+        Loads the first two columns of a spectrum file, the header is detected automatically if skiprows is None.
+        """
         try:
-            data = np.loadtxt(filename, skiprows=skiprows)
-            self._x = data.T[0]
-            self._y = data.T[1]
+            self._x, self._y = read_spectrum_file(filename, skiprows)
+            self._version += 1
             self.name = os.path.basename(filename).split('.')[:-1][0]
 
         except ValueError:
@@ -119,19 +189,63 @@ class Spectrum(object):
     def reset_background(self):
         self.bkg_spectrum = None
 
-    @property
-    def data(self):
+    def set_auto_background(self, estimator):
+        self.auto_bkg_estimator = estimator
+
+    def reset_auto_background(self):
+        self.auto_bkg_estimator = None
+
+    def get_auto_background(self):
+        """
+        Returns the background estimated from the (background subtracted) spectrum. It is cached until the data, the
+        scaling and offset, the background spectrum or the estimator parameters change.
+        """
+        x, y = self._get_bkg_subtracted_data()
+        key = (self._version, self._scaling, self.offset, self._bkg_key if self.bkg_spectrum is not None else None,
+               self.auto_bkg_estimator.get_parameters())
+        if key != self._auto_bkg_key:
+            try:
+                self._auto_bkg = self.auto_bkg_estimator.estimate(x, y)
+            except ValueError:
+                # no background can be fitted to spectra without an x range (e.g. of completely masked images)
+                self._auto_bkg = np.zeros(len(y))
+            self._auto_bkg_key = key
+        return self._auto_bkg
+
+    def get_background_on_grid(self):
+        """
+        Returns the background spectrum (including its scaling and offset) on the x values of this spectrum. The
+        resampled background is cached until one of the two spectra, or the scaling and offset of the background change.
+        """
+        bkg = self.bkg_spectrum
+        key = (id(bkg), bkg._version, bkg.scaling, bkg.offset, id(bkg.bkg_spectrum), self._version)
+        if key != self._bkg_key:
+            x_bkg, y_bkg = bkg.data
+            if np.array_equal(x_bkg, self._x):
+                self._bkg_on_grid = y_bkg
+            else:
+                self._bkg_on_grid = resample_spectrum(x_bkg, y_bkg, self._x)
+            self._bkg_key = key
+        return self._bkg_on_grid
+
+    def _get_bkg_subtracted_data(self):
         if self.bkg_spectrum is not None:
-            _, y_bkg = self.bkg_spectrum.data
-            return self._x, self._y * self._scaling + self.offset - y_bkg
+            return self._x, self._y * self._scaling + self.offset - self.get_background_on_grid()
         else:
             return self.original_data
 
+    @property
+    def data(self):
+        x, y = self._get_bkg_subtracted_data()
+        if self.auto_bkg_estimator is not None:
+            return x, y - self.get_auto_background()
+        return x, y
 
     @data.setter
     def data(self, (x, y)):
         self._x = x
         self._y = y
+        self._version += 1
         self.scaling = 1
         self.offset = 0
 
@@ -151,6 +265,72 @@ class Spectrum(object):
             self._scaling = value
 
 
+def convert_x_value(value, previous_unit, new_unit, wavelength):
+    """
+    Converts x values between the integration units '2th_deg', 'q_A^-1' and 'd_A'.
+    :param wavelength: wavelength in m
+    """
+    if previous_unit == '2th_deg':
+        tth = value
+    elif previous_unit == 'q_A^-1':
+        tth = np.arcsin(
+            value * 1e10 * wavelength / (4 * np.pi)) * 360 / np.pi
+    elif previous_unit == 'd_A':
+        tth = 2 * np.arcsin(wavelength / (2 * value * 1e-10)) * 180 / np.pi
+    else:
+        tth = 0
+
+    if new_unit == '2th_deg':
+        res = tth
+    elif new_unit == 'q_A^-1':
+        res = 4 * np.pi * \
+              np.sin(tth / 360 * np.pi) / \
+              wavelength / 1e10
+    elif new_unit == 'd_A':
+        res = wavelength / (2 * np.sin(tth / 360 * np.pi)) * 1e10
+    else:
+        res = 0
+    return res
+
+
+def resample_spectrum(x, y, new_x):
+    """
+    Resamples a spectrum onto new x values. If the new grid is coarser than the original one, all points within a new
+    bin are averaged, otherwise (and for empty bins) the spectrum is linearly interpolated. Outside of the original x
+    range the first or last value is used.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    new_x = np.asarray(new_x, dtype=np.float64)
+    if len(x) > 1 and x[0] > x[-1]:
+        # e.g. spectra in d-spacing
+        x = x[::-1]
+        y = y[::-1]
+    interpolated = np.interp(new_x, x, y)
+    if len(x) < 2 or len(new_x) < 2:
+        return interpolated
+
+    order = np.argsort(new_x)
+    sorted_x = new_x[order]
+    new_step = np.diff(sorted_x)
+    if np.median(new_step) <= 1.5 * np.median(np.diff(x)):
+        return interpolated
+
+    edges = np.concatenate(([sorted_x[0] - 0.5 * new_step[0]],
+                            0.5 * (sorted_x[1:] + sorted_x[:-1]),
+                            [sorted_x[-1] + 0.5 * new_step[-1]]))
+    bin_ind = np.searchsorted(edges, x, side='right') - 1
+    valid = (bin_ind >= 0) & (bin_ind < len(sorted_x))
+    counts = np.bincount(bin_ind[valid], minlength=len(sorted_x))
+    sums = np.bincount(bin_ind[valid], weights=y[valid], minlength=len(sorted_x))
+    rebinned = interpolated[order]
+    filled = counts > 0
+    rebinned[filled] = sums[filled] / counts[filled]
+    result = np.empty_like(rebinned)
+    result[order] = rebinned
+    return result
+
+
 def test():
     my_spectrum = Spectrum()
     my_spectrum.save('test.txt')
@@ -0,0 +1,143 @@
+# -*- coding: utf8 -*-
+# Dioptas - GUI program for fast processing of 2D X-ray data
+# Copyright (C) 2014  Clemens Prescher (clemens.prescher@gmail.com)
+# GSECARS, University of Chicago
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__author__ = 'Clemens Prescher'
+
+import os
+from collections import OrderedDict
+import numpy as np
+
+# number of lines which are checked for a header
+MAX_HEADER_LINES = 100
+# number of consecutive numeric lines with the same column count which mark the beginning of the data
+DATA_CHECK_LINES = 3
+CACHE_SIZE = 500
+
+_spectrum_cache = OrderedDict()
+
+
+def read_spectrum_file(filename, skiprows=None):
+    """
+    Reads the first two columns of a .xy, .chi or .dat spectrum file. Header lines (comments, text, or the number of
+    points in .chi files) are detected automatically, columns may be separated by whitespace or commas.
+    The result is cached until the modification time or size of the file changes, the returned arrays are read-only.
+
+    :param filename: name of the spectrum file
+    :param skiprows: number of header lines, None for automatic detection
+    :return: x, y
+    :raise ValueError: if the file does not contain at least two numeric columns
+    """
+    stat = os.stat(filename)
+    key = (os.path.abspath(filename), skiprows)
+    cache_entry = _spectrum_cache.get(key)
+    if cache_entry is not None and cache_entry[0] == (stat.st_mtime, stat.st_size):
+        return cache_entry[1], cache_entry[2]
+
+    with open(filename, 'rb') as spectrum_file:
+        content = spectrum_file.read()
+    x, y = parse_spectrum(content, skiprows)
+    x.flags.writeable = False
+    y.flags.writeable = False
+
+    _spectrum_cache[key] = ((stat.st_mtime, stat.st_size), x, y)
+    if len(_spectrum_cache) > CACHE_SIZE:
+        _spectrum_cache.popitem(last=False)
+    return x, y
+
+
+def clear_spectrum_cache():
+    _spectrum_cache.clear()
+
+
+def parse_spectrum(content, skiprows=None):
+    """
+    Parses the content of a spectrum file, see read_spectrum_file.
+    """
+    if '\0' in content[:1024]:
+        raise ValueError, "binary file"
+    # only the beginning of the file is split into lines for the header detection
+    num_head_lines = MAX_HEADER_LINES + DATA_CHECK_LINES + 1
+    head_lines = content.split('\n', num_head_lines)[:num_head_lines]
+    if skiprows is None:
+        header_lines, num_columns, delimiter = detect_header(head_lines)
+    else:
+        header_lines = skiprows
+        num_columns, delimiter = get_column_format(head_lines[skiprows]) if len(head_lines) > skiprows else (0, None)
+    if num_columns < 2:
+        raise ValueError, "no numeric data with at least two columns found"
+
+    body = content[sum(len(line) + 1 for line in head_lines[:header_lines]):].strip()
+    if delimiter is not None:
+        body = body.replace(delimiter, ' ')
+
+    # fast path for plain data, fromstring stops at the first value it cannot parse and rows with missing values
+    # or blank lines change the number of values, both is caught by the size check
+    if '#' not in body:
+        data = np.fromstring(body, sep=' ')
+        if data.size == num_columns * (body.count('\n') + 1):
+            data = data.reshape(-1, num_columns)
+            return np.ascontiguousarray(data[:, 0]), np.ascontiguousarray(data[:, 1])
+
+    data_lines = [line for line in body.splitlines() if line.strip() and not line.lstrip().startswith('#')]
+    data = np.genfromtxt(data_lines, invalid_raise=False)
+    if data.ndim != 2 or data.shape[1] < 2:
+        raise ValueError, "inconsistent number of columns"
+    data = data[~np.any(np.isnan(data[:, :2]), axis=1)]
+    return np.ascontiguousarray(data[:, 0]), np.ascontiguousarray(data[:, 1])
+
+
+def detect_header(lines):
+    """
+    Finds the first line after which DATA_CHECK_LINES lines (or all remaining lines) are numeric with the same number
+    of columns. Comment and empty lines within these are ignored.
+
+    :return: number of header lines, number of columns, delimiter (None for whitespace)
+    """
+    for start in xrange(min(len(lines), MAX_HEADER_LINES)):
+        num_columns, delimiter = get_column_format(lines[start])
+        if num_columns < 2:
+            continue
+        checked_lines = 0
+        for line in lines[start + 1:]:
+            if checked_lines == DATA_CHECK_LINES:
+                break
+            if not line.strip() or line.lstrip().startswith('#'):
+                continue
+            if get_column_format(line) != (num_columns, delimiter):
+                break
+            checked_lines += 1
+        else:
+            return start, num_columns, delimiter
+        if checked_lines == DATA_CHECK_LINES:
+            return start, num_columns, delimiter
+    return 0, 0, None
+
+
+def get_column_format(line):
+    """
+    :return: number of numeric columns of the line (0 if it is not numeric) and the delimiter (None for whitespace)
+    """
+    line = line.split('#')[0].strip()
+    if not line:
+        return 0, None
+    delimiter = ',' if ',' in line else None
+    try:
+        values = [float(value) for value in line.split(delimiter)]
+    except ValueError:
+        return 0, None
+    return len(values), delimiter
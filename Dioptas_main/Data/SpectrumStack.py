@@ -0,0 +1,213 @@
+# -*- coding: utf8 -*-
+# Dioptas - GUI program for fast processing of 2D X-ray data
+# Copyright (C) 2014  Clemens Prescher (clemens.prescher@gmail.com)
+# GSECARS, University of Chicago
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__author__ = 'Clemens Prescher'
+
+import numpy as np
+
+
+class SpectrumStack(object):
+    """
+    Array based container for large series of overlay spectra (e.g. a pressure or temperature series). The intensities
+    are rows of one (N, npt) matrix with per row scaling, offset and visibility arrays, so that adding, deleting and
+    plotting scales with the number of points and not with the number of Python objects.
+    As long as all spectra have the same x values only one x axis is stored. Spectra with different x values switch
+    the stack to a ragged layout with one x row per spectrum, shorter rows are padded with nan.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.common_x = None
+        self._x = None
+        self._y = np.zeros((0, 0))
+        self.names = []
+        self.scaling = np.ones(0)
+        self.offset = np.zeros(0)
+        self.show = np.ones(0, dtype=bool)
+        self._num_spectra = 0
+
+    def __len__(self):
+        return self._num_spectra
+
+    @property
+    def is_ragged(self):
+        return self._x is not None
+
+    @property
+    def y(self):
+        return self._y[:self._num_spectra]
+
+    @property
+    def x(self):
+        """
+        :return: x values (npt) for a common x axis or (N, npt) for a ragged stack
+        """
+        if self.is_ragged:
+            return self._x[:self._num_spectra]
+        return self.common_x
+
+    def append(self, x, y, name=''):
+        self.extend(x, np.asarray(y)[None, :], [name])
+
+    def extend(self, x, intensities, names=None):
+        """
+        Adds several spectra with the same x values at once.
+        :param intensities: (M, npt) array
+        :param names: list of M names
+        """
+        x = np.asarray(x, dtype=np.float64)
+        intensities = np.asarray(intensities, dtype=np.float64)
+        num_new = intensities.shape[0]
+        if names is None:
+            names = [''] * num_new
+        if self._num_spectra == 0:
+            self.clear()
+            self.common_x = x
+        elif not self.is_ragged and not np.array_equal(x, self.common_x):
+            self._make_ragged()
+
+        start = self._num_spectra
+        self._reserve(start + num_new, len(x))
+        self._y[start:start + num_new, :len(x)] = intensities
+        self._y[start:start + num_new, len(x):] = np.nan
+        if self.is_ragged:
+            self._x[start:start + num_new, :len(x)] = x
+            self._x[start:start + num_new, len(x):] = np.nan
+        self.scaling[start:start + num_new] = 1
+        self.offset[start:start + num_new] = 0
+        self.show[start:start + num_new] = True
+        self.names.extend(names)
+        self._num_spectra += num_new
+
+    def delete(self, indices):
+        """
+        Deletes the spectra with the given indices (list, array or boolean mask) in one step.
+        """
+        keep = np.ones(self._num_spectra, dtype=bool)
+        keep[indices] = False
+        num_kept = np.sum(keep)
+        self._y[:num_kept] = self.y[keep]
+        if self.is_ragged:
+            self._x[:num_kept] = self.x[keep]
+        self.scaling[:num_kept] = self.scaling[:self._num_spectra][keep]
+        self.offset[:num_kept] = self.offset[:self._num_spectra][keep]
+        self.show[:num_kept] = self.show[:self._num_spectra][keep]
+        self.names = [name for name, kept in zip(self.names, keep) if kept]
+        self._num_spectra = num_kept
+
+    def get_data(self, ind):
+        """
+        :return: x, y of one spectrum including its scaling and offset
+        """
+        x = self._x[ind] if self.is_ragged else self.common_x
+        y = self._y[ind] * self.scaling[ind] + self.offset[ind]
+        valid = ~np.isnan(y)
+        return x[valid], y[valid]
+
+    def get_x_range(self):
+        """
+        :return: minimum and maximum x of all visible spectra, None if no spectrum is visible
+        """
+        show = self.show[:self._num_spectra]
+        if not np.any(show):
+            return None
+        if self.is_ragged:
+            x = self.x[show]
+            return np.nanmin(x), np.nanmax(x)
+        return np.min(self.common_x), np.max(self.common_x)
+
+    def get_waterfall(self, spacing=0):
+        """
+        Returns all visible spectra as (M, npt) x and y arrays, every spectrum is shifted by spacing with respect to
+        the previous visible one.
+        """
+        show = self.show[:self._num_spectra]
+        shift = np.arange(np.sum(show)) * spacing
+        y = self.y[show] * self.scaling[:self._num_spectra][show, None] + \
+            (self.offset[:self._num_spectra][show] + shift)[:, None]
+        if self.is_ragged:
+            x = self.x[show]
+        else:
+            x = np.tile(self.common_x, (len(y), 1))
+        return x, y
+
+    def get_image(self, npt=None):
+        """
+        Returns the stack as image (N, npt) on an ascending, evenly spaced x axis. Stacks with such a common x axis are
+        returned directly, all others (ragged stacks, d spacings, unevenly spaced files) are interpolated onto an axis
+        with npt points covering all spectra.
+        :return: x, image
+        """
+        if not self.is_ragged and is_evenly_spaced(self.common_x):
+            return self.common_x, self.y * self.scaling[:self._num_spectra, None] + \
+                   self.offset[:self._num_spectra, None]
+        if npt is None:
+            npt = self._y.shape[1]
+        x_min, x_max = np.nanmin(self.x), np.nanmax(self.x)
+        x = np.linspace(x_min, x_max, npt)
+        image = np.empty((self._num_spectra, npt))
+        for ind in xrange(self._num_spectra):
+            spectrum_x, spectrum_y = self.get_data(ind)
+            if len(spectrum_x) == 0:
+                # e.g. completely masked frames of a spectrum store
+                image[ind] = np.nan
+                continue
+            order = np.argsort(spectrum_x)
+            image[ind] = np.interp(x, spectrum_x[order], spectrum_y[order], left=np.nan, right=np.nan)
+        return x, image
+
+    def _make_ragged(self):
+        self._x = np.empty(self._y.shape)
+        self._x[:] = self.common_x
+        self.common_x = None
+
+    def _reserve(self, num_spectra, npt):
+        """
+        Grows the arrays to hold at least num_spectra rows with npt points, the row capacity is doubled to keep
+        appending single spectra cheap.
+        """
+        capacity, row_length = self._y.shape
+        new_row_length = max(row_length, npt)
+        if num_spectra <= capacity and new_row_length == row_length:
+            return
+        new_capacity = max(num_spectra, 2 * capacity) if num_spectra > capacity else capacity
+        self._y = _resize(self._y, (new_capacity, new_row_length))
+        if self.is_ragged:
+            self._x = _resize(self._x, (new_capacity, new_row_length))
+        self.scaling = np.resize(self.scaling, new_capacity)
+        self.offset = np.resize(self.offset, new_capacity)
+        self.show = np.resize(self.show, new_capacity)
+
+
+def is_evenly_spaced(x, rtol=1e-3):
+    """
+    Checks whether x is ascending with a constant step.
+    """
+    if len(x) < 2:
+        return True
+    step = (x[-1] - x[0]) / (len(x) - 1.)
+    return step > 0 and np.allclose(np.diff(x), step, rtol=rtol, atol=0)
+
+
+def _resize(array, shape):
+    new_array = np.empty(shape)
+    new_array[:] = np.nan
+    new_array[:array.shape[0], :array.shape[1]] = array
+    return new_array
@@ -0,0 +1,154 @@
+# -*- coding: utf8 -*-
+# Dioptas - GUI program for fast processing of 2D X-ray data
+# Copyright (C) 2014  Clemens Prescher (clemens.prescher@gmail.com)
+# GSECARS, University of Chicago
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__author__ = 'Clemens Prescher'
+
+import os
+import json
+import struct
+import numpy as np
+
+SPECTRUM_STORE_VERSION = 1
+# size of the .npy headers, large enough to rewrite the shape in place when frames are appended
+NPY_HEADER_SIZE = 128
+INTENSITY_FILE = 'intensities.npy'
+FRAMES_FILE = 'frames.npy'
+X_FILE = 'x.npy'
+INFO_FILE = 'info.json'
+FRAME_DTYPE = np.dtype([('filename', 'S256'), ('mtime', '<f8'), ('sum', '<f8')])
+
+
+class SpectrumStore(object):
+    """
+    Container for a series of integrated spectra sharing one x axis. It is a folder with
+        info.json        - unit, calibration header and format version
+        x.npy            - shared x axis (npt)
+        intensities.npy  - intensity matrix (N, npt) float32
+        frames.npy       - per frame metadata (N) with source filename, its modification time and intensity sum
+    Frames are appended as they are integrated, the .npy headers are padded so that only the number of frames has to
+    be rewritten. The arrays are read back memory-mapped with numpy.load.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, INFO_FILE), 'r') as info_file:
+            info = json.load(info_file)
+        if info.get('version', 0) > SPECTRUM_STORE_VERSION:
+            raise IOError, "spectrum store version %s is not supported" % info['version']
+        self.unit = info.get('unit', '2th_deg')
+        self.calibration = info.get('calibration', '')
+        self.x = np.load(os.path.join(directory, X_FILE))
+        self.num_frames = _read_npy_shape(os.path.join(directory, FRAMES_FILE))[0]
+
+    @staticmethod
+    def create(directory, x, unit='2th_deg', calibration=''):
+        """
+        Creates a new empty store, existing store files in directory are overwritten.
+        :param calibration: calibration header (e.g. geometry.makeHeaders()), stored once for the whole series
+        """
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        x = np.asarray(x, dtype=np.float64)
+        np.save(os.path.join(directory, X_FILE), x)
+        _write_npy_file(os.path.join(directory, INTENSITY_FILE), np.dtype('<f4'), (0, len(x)))
+        _write_npy_file(os.path.join(directory, FRAMES_FILE), FRAME_DTYPE, (0,))
+        with open(os.path.join(directory, INFO_FILE), 'w') as info_file:
+            json.dump({'version': SPECTRUM_STORE_VERSION, 'unit': unit, 'calibration': calibration}, info_file)
+        return SpectrumStore(directory)
+
+    def append(self, y, filename='', mtime=None):
+        """
+        Appends a frame. y has to be given on the x axis of the store.
+        """
+        y = np.asarray(y, dtype='<f4')
+        if y.shape != self.x.shape:
+            raise ValueError, "spectrum has %d points, the store %d" % (len(y), len(self.x))
+        if mtime is None:
+            mtime = os.path.getmtime(filename) if os.path.exists(filename) else 0
+        frame = np.array([(os.path.basename(filename), mtime, np.sum(y, dtype=np.float64))], dtype=FRAME_DTYPE)
+
+        # data first, header afterwards, an interrupted append leaves a readable store
+        _append_npy_data(os.path.join(self.directory, INTENSITY_FILE), y, (self.num_frames + 1, len(self.x)))
+        _append_npy_data(os.path.join(self.directory, FRAMES_FILE), frame, (self.num_frames + 1,))
+        self.num_frames += 1
+
+    def get_intensities(self):
+        """
+        :return: memory-mapped (N, npt) intensity matrix
+        """
+        return _load_npy(os.path.join(self.directory, INTENSITY_FILE))
+
+    def get_frames(self):
+        """
+        :return: record array with the fields filename, mtime and sum
+        """
+        return _load_npy(os.path.join(self.directory, FRAMES_FILE))
+
+    def get_spectrum(self, ind):
+        return self.x, np.array(self.get_intensities()[ind], dtype=np.float64)
+
+    def __len__(self):
+        return self.num_frames
+
+
+def is_spectrum_store(directory):
+    return os.path.isfile(os.path.join(directory, INFO_FILE)) and \
+           os.path.isfile(os.path.join(directory, INTENSITY_FILE))
+
+
+def _load_npy(filename):
+    if _read_npy_shape(filename)[0] == 0:
+        # numpy can not memory-map empty arrays
+        return np.load(filename)
+    return np.load(filename, mmap_mode='r')
+
+
+def _write_npy_header(npy_file, dtype, shape):
+    header = "{'descr': %r, 'fortran_order': False, 'shape': %r, }" % (np.lib.format.dtype_to_descr(dtype),
+                                                                        tuple(shape))
+    # magic string (6), version (2) and header length (2) precede the header
+    header = header.ljust(NPY_HEADER_SIZE - 10 - 1) + '\n'
+    npy_file.seek(0)
+    npy_file.write(np.lib.format.magic(1, 0))
+    npy_file.write(struct.pack('<H', len(header)))
+    npy_file.write(header)
+
+
+def _write_npy_file(filename, dtype, shape):
+    with open(filename, 'wb') as npy_file:
+        _write_npy_header(npy_file, dtype, shape)
+
+
+def _append_npy_data(filename, data, new_shape):
+    """
+    Writes data as the last row of the new shape and updates the header. Bytes left by an interrupted append are
+    overwritten.
+    """
+    with open(filename, 'r+b') as npy_file:
+        npy_file.seek(NPY_HEADER_SIZE + (new_shape[0] - 1) * data.nbytes)
+        npy_file.write(data.tostring())
+        npy_file.truncate()
+        npy_file.flush()
+        _write_npy_header(npy_file, data.dtype, new_shape)
+
+
+def _read_npy_shape(filename):
+    with open(filename, 'rb') as npy_file:
+        np.lib.format.read_magic(npy_file)
+        shape, _, _ = np.lib.format.read_array_header_1_0(npy_file)
+    return shape
@@ -61,6 +61,7 @@ import numpy as np
 import math
 import scipy.signal as signal
 import scipy.ndimage as ndimage
+from ProcessPool import map_in_processes
 import pyfits
 
 
@@ -85,7 +86,7 @@ dilstruct[4, 4] = 0
 
 class cosmicsimage:
     def __init__(self, rawarray, pssl=0.0, gain=2.2, readnoise=10.0, sigclip=5.0, sigfrac=0.3, objlim=5.0,
-                 satlevel=50000.0, verbose=True):
+                 satlevel=50000.0, verbose=True, fast=False):
         """
 
         sigclip : increase this if you detect cosmics where there are none. Default is 5.0, a good value for earth-bound images.
@@ -95,6 +96,10 @@ class cosmicsimage:
         sigclip : laplacian-to-noise limit for cosmic ray detection
         objlim : minimum contrast between laplacian image and fine structure image. Use 5.0 if your image is undersampled, HST, ...
 
+        fast : use the fast path in lacosmiciteration(), which calculates the Laplacian of the subsampled image
+        directly from the neighbouring pixels and grows the cosmics by binary dilation instead of convolutions. The
+        result is the same as with the original implementation.
+
         satlevel : if we find agglomerations of pixels above this level, we consider it to be a saturated star and
         do not try to correct and pixels around it. A negative satlevel skips this feature.
 
@@ -125,6 +130,7 @@ class cosmicsimage:
         self.satlevel = satlevel
 
         self.verbose = verbose
+        self.fast = fast
 
         self.pssl = pssl
 
@@ -432,15 +438,18 @@ class cosmicsimage:
         if verbose:
             print "Convolving image with Laplacian kernel ..."
 
-        # We subsample, convolve, clip negative values, and rebin to original
-        # size
-        subsam = subsample(self.cleanarray)
-        conved = signal.convolve2d(
-            subsam, laplkernel, mode="same", boundary="symm")
-        cliped = conved.clip(min=0.0)
-        # cliped = np.abs(conved) # unfortunately this does not work to find
-        # holes as well ...
-        lplus = rebin2x2(cliped)
+        if self.fast:
+            lplus = laplacian_plus(self.cleanarray)
+        else:
+            # We subsample, convolve, clip negative values, and rebin to original
+            # size
+            subsam = subsample(self.cleanarray)
+            conved = signal.convolve2d(
+                subsam, laplkernel, mode="same", boundary="symm")
+            cliped = conved.clip(min=0.0)
+            # cliped = np.abs(conved) # unfortunately this does not work to find
+            # holes as well ...
+            lplus = rebin2x2(cliped)
 
         if verbose:
             print "Creating noise model ..."
@@ -521,8 +530,7 @@ class cosmicsimage:
 
         # We grow these cosmics a first time to determine the immediate
         # neighborhod  :
-        growcosmics = np.cast['bool'](
-            signal.convolve2d(np.cast['float32'](cosmics), growkernel, mode="same", boundary="symm"))
+        growcosmics = self.grow_mask(cosmics)
 
         # From this grown set, we keep those that have sp > sigmalim
         # so obviously not requiring sp/f > objlim, otherwise it would be
@@ -532,8 +540,7 @@ class cosmicsimage:
         # Now we repeat this procedure, but lower the detection limit to
         # sigmalimlow :
 
-        finalsel = np.cast['bool'](
-            signal.convolve2d(np.cast['float32'](growcosmics), growkernel, mode="same", boundary="symm"))
+        finalsel = self.grow_mask(growcosmics)
         finalsel = np.logical_and(sp > self.sigcliplow, finalsel)
 
         # Again, we have to kick out pixels on saturated stars :
@@ -564,6 +571,17 @@ class cosmicsimage:
 
         return {"niter": nbfinal, "nnew": nbnew, "itermask": finalsel, "newmask": newmask}
 
+    def grow_mask(self, mask):
+        """
+        Grows a mask by one pixel in every direction (including diagonals).
+        """
+        if self.fast:
+            # the symmetric boundary of the convolution only repeats edge pixels, which is equal to a dilation
+            # with a False border
+            return ndimage.binary_dilation(mask, structure=growkernel)
+        return np.cast['bool'](
+            signal.convolve2d(np.cast['float32'](mask), growkernel, mode="same", boundary="symm"))
+
     def findholes(self, verbose=True):
         """
         Detects "negative cosmics" in the cleanarray and adds them to the mask.
@@ -667,6 +685,66 @@ class cosmicsimage:
 #   pass
 
 
+def lacosmic_tiled(rawarray, iterations=2, tile_size=512, halo=16, processes=None, **kwargs):
+    """
+    Runs L.A.Cosmic iterations (each followed by clean()) on overlapping tiles of the image in a process pool and
+    stitches the resulting cosmic masks together.
+
+    One iteration needs the pixels within 6 pixels for the detection and clean() another 2, so each pixel of the
+    mask depends on at most 8 * iterations neighbouring pixels. With a halo at least this large the result is
+    identical to running cosmicsimage on the full array.
+
+    :param iterations: number of L.A.Cosmic iterations
+    :param tile_size: edge length of the tile cores
+    :param halo: number of pixels added on each side of a tile core
+    :param processes: number of worker processes, None uses the shared process pool, 1 runs everything in this
+                      process (see ProcessPool.map_in_processes)
+    :param kwargs: further parameters for cosmicsimage (sigclip, objlim, gain, ...)
+    :return: boolean mask of the cosmic ray affected pixels
+    """
+    if halo < 8 * iterations:
+        raise ValueError, "halo has to be at least 8 pixels per iteration"
+    rawarray = np.asarray(rawarray)
+    kwargs['verbose'] = False
+    # the background level is only used for filling huge cosmics and needs to be the one of the full image
+    backgroundlevel = np.median(rawarray.ravel()) + kwargs.get('pssl', 0.0)
+
+    jobs = []
+    core_slices = []
+    for row_start in xrange(0, rawarray.shape[0], tile_size):
+        for col_start in xrange(0, rawarray.shape[1], tile_size):
+            row_end = min(row_start + tile_size, rawarray.shape[0])
+            col_end = min(col_start + tile_size, rawarray.shape[1])
+            tile_row_start = max(row_start - halo, 0)
+            tile_col_start = max(col_start - halo, 0)
+            tile = rawarray[tile_row_start:min(row_end + halo, rawarray.shape[0]),
+                            tile_col_start:min(col_end + halo, rawarray.shape[1])]
+            core_in_tile = (slice(row_start - tile_row_start, row_end - tile_row_start),
+                            slice(col_start - tile_col_start, col_end - tile_col_start))
+            jobs.append((tile, core_in_tile, iterations, backgroundlevel, kwargs))
+            core_slices.append((slice(row_start, row_end), slice(col_start, col_end)))
+
+    tile_masks = map_in_processes(_lacosmic_tile, jobs, processes)
+
+    mask = np.zeros(rawarray.shape, dtype=bool)
+    for core_slice, tile_mask in zip(core_slices, tile_masks):
+        mask[core_slice] = tile_mask
+    return mask
+
+
+def _lacosmic_tile(job):
+    """
+    Worker function for lacosmic_tiled, needs to be on module level to be usable by multiprocessing.
+    """
+    tile, core_in_tile, iterations, backgroundlevel, kwargs = job
+    cosmic = cosmicsimage(tile, **kwargs)
+    cosmic.backgroundlevel = backgroundlevel
+    for _ in xrange(iterations):
+        cosmic.lacosmiciteration()
+        cosmic.clean()
+    return cosmic.mask[core_in_tile]
+
+
 # FITS import - export
 def fromfits(infilename, hdu=0, verbose=True):
     """
@@ -744,6 +822,25 @@ def subsample(a):  # this is more a generic function then a method ...
     return a[tuple(indices)]
 
 
+def laplacian_plus(a):
+    """
+    Returns the same as rebin2x2(convolve2d(subsample(a), laplkernel, mode="same", boundary="symm").clip(min=0.0))
+    without creating the 2x2 subsampled array.
+    Each of the 4 subpixels of a pixel has one vertical and one horizontal neighbour which belongs to the pixel itself,
+    the other two are the pixels above or below and left or right, respectively. The symmetric boundary of the
+    subsampled array equals repeating the edge pixels of a.
+    """
+    padded = np.pad(np.asarray(a, dtype=np.float64), 1, mode='edge')
+    center = padded[1:-1, 1:-1]
+    vertical = (center - padded[:-2, 1:-1], center - padded[2:, 1:-1])
+    horizontal = (center - padded[1:-1, :-2], center - padded[1:-1, 2:])
+    lplus = np.zeros(center.shape)
+    for vertical_diff in vertical:
+        for horizontal_diff in horizontal:
+            lplus += (vertical_diff + horizontal_diff).clip(min=0.0)
+    return lplus / 4.0
+
+
 def rebin(a, newshape):
     """
     Auxiliary function to rebin an ndarray a.
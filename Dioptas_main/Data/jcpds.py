@@ -16,37 +16,137 @@ Modifications:
         - changed np function to numpy versions,
         - using scipy optimize for solving the inverse Birch-Murnaghan problem
         - fixed a bug which was causing a gamma0 to be 0 for cubic unit cell
+    2014 Clemens Prescher
+        - replaced the scipy optimize solver by a vectorized Newton solver of the
+          Birch-Murnaghan equation, optional precomputed V(P, T) tables
 
 """
 import string
 import numpy as np
-try:
-    from scipy.optimize import minimize
-except ImportError:
-    from scipy.optimize import fmin_bfgs as minimize
 import os
 
 
-class jcpds_reflection:
+# Reflections are stored in a numpy record array with one entry per reflection:
+#    h, k, l:    Miller indices of the reflection
+#    d0:         Zero-pressure lattice spacing
+#    d:          Lattice spacing at P and T
+#    intensity:  Relative intensity to most intense reflection for this material
+reflection_dtype = np.dtype([('h', np.int32), ('k', np.int32), ('l', np.int32),
+                             ('d0', np.float64), ('d', np.float64), ('intensity', np.float64)])
+
+
+def create_reflections(reflections=()):
     """
-    Class that defines a reflection.
-    Attributes:
-       d0:     Zero-pressure lattice spacing
-       d:      Lattice spacing at P and T
-       inten:  Relative intensity to most intense reflection for this material
-       h:      H index for this reflection
-       k:      K index for this reflection
-       l:      L index for this reflection
+    Creates the reflection record array from a sequence of (h, k, l, d0, d, intensity) tuples.
+    """
+    return np.array(list(reflections), dtype=reflection_dtype).view(np.recarray)
+
 
+def bm3_pressure(v0_v, k0, k0p):
     """
+    Returns the pressure of the third order Birch-Murnaghan equation of state.
 
-    def __init__(self):
-        self.d0 = 0.
-        self.d = 0.
-        self.intensity = 0.
-        self.h = 0.
-        self.k = 0.
-        self.l = 0.
+    Inputs:
+       v0_v:  The ratio of the zero pressure volume to the high pressure volume
+       k0:    Bulk modulus in GPa
+       k0p:   Pressure derivative of the bulk modulus
+    All inputs can be numpy arrays.
+    """
+    x = np.asarray(v0_v, dtype=np.float64) ** (1. / 3.)
+    return 1.5 * k0 * (x ** 7 - x ** 5) * (1 + 0.75 * (k0p - 4.) * (x ** 2 - 1.0))
+
+
+def bm3_inverse_volume(pressure, k0, k0p, tolerance=1e-12, max_iterations=50):
+    """
+    Solves the third order Birch-Murnaghan equation of state for V0/V.
+
+    Inputs:
+       pressure:  Pressure in GPa
+       k0:        Bulk modulus in GPa
+       k0p:       Pressure derivative of the bulk modulus
+    All inputs can be numpy arrays, which are broadcasted against each other.
+
+    Outputs:
+       V0/V with the broadcasted shape of the inputs.
+
+    Procedure:
+       Newton iteration on f = (V0/V)^(1/3), vectorized over all pressures.
+       The start values are taken from the Murnaghan equation of state,
+       which is already close to the Birch-Murnaghan solution. Steps are
+       limited to 10% of f, which keeps the iteration on the branch
+       connected to V0/V = 1 for K0' < 4, where the equation of state is
+       not monotonic. Pressures beyond the extremum of such an equation of
+       state have no solution, V0/V of the extremum is returned for them.
+    """
+    pressure, k0, k0p = [np.array(value, dtype=np.float64) for value in np.broadcast_arrays(pressure, k0, k0p)]
+    murnaghan_k0p = np.where(k0p > 0, k0p, 4.)
+    murnaghan_base = np.maximum(1 + murnaghan_k0p * pressure / k0, 0.5)
+    f = murnaghan_base ** (1. / (3 * murnaghan_k0p))
+    c = 0.75 * (k0p - 4.)
+    # only the not yet converged values are iterated
+    active = np.flatnonzero(np.ones(f.shape, dtype=bool))
+    f_flat, k0_flat, c_flat, pressure_flat = f.ravel(), k0.ravel(), c.ravel(), pressure.ravel()
+    for _ in xrange(max_iterations):
+        f_active = f_flat[active]
+        k0_active = k0_flat[active]
+        c_active = c_flat[active]
+        f2 = f_active * f_active
+        f4 = f2 * f2
+        f_diff = f4 * f_active * (f2 - 1.)
+        bracket = 1 + c_active * (f2 - 1.)
+        residual = 1.5 * k0_active * f_diff * bracket - pressure_flat[active]
+        derivative = 1.5 * k0_active * ((7 * f2 - 5) * f4 * bracket + f_diff * 2 * c_active * f_active)
+        step = np.clip(residual / derivative, -0.1 * f_active, 0.1 * f_active)
+        f_flat[active] = f_active - step
+        active = active[~(np.abs(step) <= tolerance * f_active)]
+        if len(active) == 0:
+            break
+    f = f_flat.reshape(f.shape)
+
+    unsolved = np.abs(bm3_pressure(f ** 3, k0, k0p) - pressure) > 1e-6 * np.maximum(np.abs(pressure), 1.)
+    if np.any(unsolved):
+        f[unsolved] = _bm3_extremum(pressure[unsolved], k0[unsolved], k0p[unsolved])
+    return f ** 3
+
+
+def compute_volumes(pressures, temperatures, v0, k0, k0p0, dk0pdt=0., alpha_t0=0., d_alpha_dt=0.):
+    """
+    Computes unit cell volumes from the equation of state parameters (see jcpds.compute_volume for the procedure).
+    All inputs can be numpy arrays, which are broadcasted against each other, e.g. pressures as column and the
+    parameters of several phases as row. Temperatures of 0 K are treated as 298 K.
+    """
+    pressures, temperatures, v0, k0, k0p0, dk0pdt, alpha_t0, d_alpha_dt = \
+        np.broadcast_arrays(*[np.asarray(value, dtype=np.float64) for value in
+                              (pressures, temperatures, v0, k0, k0p0, dk0pdt, alpha_t0, d_alpha_dt)])
+    temperatures = np.where(temperatures == 0, 298., temperatures)
+    alpha_t = alpha_t0 + d_alpha_dt * (temperatures - 298.)
+    k0p = k0p0 + dk0pdt * (temperatures - 298.)
+
+    volumes = np.array(v0 * (1 + alpha_t * (temperatures - 298.)))
+    compressed = pressures != 0.
+    volumes[compressed & (k0 <= 0.)] = v0[compressed & (k0 <= 0.)]
+    compressed &= k0 > 0.
+    if np.any(compressed):
+        mod_pressures = pressures[compressed] - alpha_t[compressed] * k0[compressed] * (temperatures[compressed] - 298.)
+        volumes[compressed] = v0[compressed] / bm3_inverse_volume(mod_pressures, k0[compressed], k0p[compressed])
+    return volumes
+
+
+def _bm3_extremum(pressure, k0, k0p):
+    """
+    Returns f = (V0/V)^(1/3) of the pressure maximum (positive pressures) or minimum (negative pressures) of the
+    monotonic branch of the Birch-Murnaghan equation of state around V0/V = 1.
+    """
+    f_grid = np.linspace(0.5, 2., 3001)
+    one_ind = 1000
+    pressure_grid = bm3_pressure(f_grid[np.newaxis, :] ** 3, k0[:, np.newaxis], k0p[:, np.newaxis])
+    rising = np.diff(pressure_grid, axis=1) > 0
+    # first falling step above and below V0/V = 1, the end of the grid if there is none
+    upper = np.where(np.any(~rising[:, one_ind:], axis=1), np.argmin(rising[:, one_ind:], axis=1) + one_ind,
+                     len(f_grid) - 1)
+    lower = np.where(np.any(~rising[:, :one_ind], axis=1),
+                     one_ind - np.argmin(rising[:, one_ind - 1::-1], axis=1), 0)
+    return np.where(pressure > 0, f_grid[upper], f_grid[lower])
 
 
 class jcpds:
@@ -80,7 +180,8 @@ class jcpds:
         self.v = 0.
         self.pressure = 0.
         self.temperature = 0.
-        self.reflections = []
+        self.reflections = create_reflections()
+        self.volume_table = None
 
     def read_file(self, filename):
         """
@@ -165,7 +266,8 @@ class jcpds:
         version = 0.
         self.comments = []
         nd = 0
-        self.reflections = []
+        reflections = []
+        self.volume_table = None
 
         # Determine what version JCPDS file this is
         # In current files have the first line starts with the string VERSION:
@@ -216,13 +318,7 @@ class jcpds:
                 elif (tag == 'DIHKL:'):
                     dtemp = value.split()
                     dtemp = map(float, dtemp)
-                    reflection = jcpds_reflection()
-                    reflection.d0 = dtemp[0]
-                    reflection.intensity = dtemp[1]
-                    reflection.h = int(dtemp[2])
-                    reflection.k = int(dtemp[3])
-                    reflection.l = int(dtemp[4])
-                    self.reflections.append(reflection)
+                    reflections.append((int(dtemp[2]), int(dtemp[3]), int(dtemp[4]), dtemp[0], 0., dtemp[1]))
         else:
             # This is an old format JCPDS file
             self.version = 1.
@@ -251,15 +347,10 @@ class jcpds:
                 if (line == ''): break
                 dtemp = line.split()
                 dtemp = map(float, dtemp)
-                reflection = jcpds_reflection()
-                reflection.d0 = dtemp[0]
-                reflection.intensity = dtemp[1]
-                reflection.h = int(dtemp[2])
-                reflection.k = int(dtemp[3])
-                reflection.l = int(dtemp[4])
-                self.reflections.append(reflection)
+                reflections.append((int(dtemp[2]), int(dtemp[3]), int(dtemp[4]), dtemp[0], 0., dtemp[1]))
 
         fp.close()
+        self.reflections = create_reflections(reflections)
 
         self.compute_v0()
         self.a = self.a0
@@ -272,12 +363,11 @@ class jcpds:
         # Compute D spacings, make sure they are consistent with the input values
         self.compute_d()
         reflections = self.get_reflections()
-        for r in reflections:
-            diff = abs(r.d0 - r.d) / r.d0
-            if (diff > .001):
-                print 'Reflection ', r.h, r.k, r.l, \
-                    ': calculated D ', r.d, \
-                    ') differs by more than 0.1% from input D (', r.d0, ')'
+        diff = np.abs(reflections.d0 - reflections.d) / reflections.d0
+        for r in reflections[diff > .001]:
+            print 'Reflection ', r.h, r.k, r.l, \
+                ': calculated D ', r.d, \
+                ') differs by more than 0.1% from input D (', r.d0, ')'
 
 
     def write_file(self, file):
@@ -318,7 +408,7 @@ class jcpds:
         fp.writeline('DALPHADT: ' + str(self.d_alpha_dt))
         reflections = self.get_reflections()
         for r in reflections:
-            fp.writeline('DIHKL:    ', str(r.d0), str(r.inten),
+            fp.writeline('DIHKL:    ', str(r.d0), str(r.intensity),
                          str(r.h), str(r.k), str(r.l))
         fp.close()
 
@@ -407,8 +497,9 @@ class jcpds:
               2) Computes volume at zero-pressure and the specified temperature
                  if ALPHAT0 is non-zero.
               3) Computes the volume at the specified pressure if K0 is non-zero.
-                 The routine uses the IDL function FX_ROOT to solve the third
-                 order Birch-Murnaghan equation of state.
+                 The routine uses bm3_inverse_volume to solve the third
+                 order Birch-Murnaghan equation of state, or interpolates the
+                 volume table if one was created with create_volume_table.
 
         Example:
            Compute the unit cell volume of alumina at 100 GPa and 2500 K.
@@ -433,26 +524,104 @@ class jcpds:
         self.alpha_t = self.alpha_t0 + self.d_alpha_dt * (temperature - 298.)
         self.k0p = self.k0p0 + self.dk0pdt * (temperature - 298.)
 
-        if (pressure == 0.):
-            self.v = self.v0 * (1 + self.alpha_t * (temperature - 298.))
+        if pressure != 0. and self.k0 <= 0.:
+            print 'K0 is zero, computing zero pressure volume'
+
+        if self.volume_table_contains(pressure, temperature):
+            self.v = self.get_volume_from_table(pressure, temperature)
         else:
-            if (self.k0 <= 0.):
-                print 'K0 is zero, computing zero pressure volume'
-                self.v = self.v0
-            else:
-                self.mod_pressure = pressure - \
-                                    self.alpha_t * self.k0 * (temperature - 298.)
-                res = minimize(self.bm3_inverse, 1.)
-                if "x" in dir(res):
-                    res = res.x
-                else:
-                    res = res[0]
-                self.v = self.v0 / np.float(res)
+            self.v = float(self.compute_volumes(pressure, temperature))
+
+    def compute_volumes(self, pressures, temperatures=298.):
+        """
+        Computes the unit cell volumes for arrays of pressures and temperatures
+        at once, without changing the state of the JCPDS object.
+
+        Inputs:
+           pressures:     Pressures in GPa (scalar or array)
+           temperatures:  Temperatures in K (scalar or array, broadcastable
+                          against pressures). 0 K is treated as 298 K.
+
+        Outputs:
+           Array of unit cell volumes with the broadcasted shape of the inputs.
+        """
+        return compute_volumes(pressures, temperatures, self.v0, self.k0, self.k0p0, self.dk0pdt,
+                               self.alpha_t0, self.d_alpha_dt)
+
+    def get_pressure(self, volume, temperature=298.):
+        """
+        Returns the pressure at which the unit cell has the given volume, the inverse of compute_volume for non zero
+        pressures. Volume and temperature can be numpy arrays.
+        """
+        temperature = np.where(np.asarray(temperature) == 0, 298., temperature)
+        alpha_t = self.alpha_t0 + self.d_alpha_dt * (temperature - 298.)
+        k0p = self.k0p0 + self.dk0pdt * (temperature - 298.)
+        return bm3_pressure(self.v0 / np.asarray(volume, dtype=np.float64), self.k0, k0p) + \
+               alpha_t * self.k0 * (temperature - 298.)
+
+    def get_d_spacings(self, pressures, temperatures=298.):
+        """
+        Computes the D spacings of all reflections for arrays of pressures and temperatures, without changing the
+        state of the JCPDS object.
+
+        Outputs:
+           Array with the broadcasted shape of pressures and temperatures plus one last axis for the reflections.
+        """
+        return self.get_d_spacings_for_volume(self.compute_volumes(pressures, temperatures))
+
+    def get_d_spacings_for_volume(self, volumes):
+        """
+        Returns the D spacings of all reflections for unit cell volumes (scalar or array, the reflections are the last
+        axis of the result).
+        """
+        ratios = (np.asarray(volumes, dtype=np.float64) / self.v0) ** (1.0 / 3.0)
+        # the current D spacings scale with the current lattice parameter
+        d_spacings = self.reflections.d * (self.a0 / self.a)
+        return ratios[..., np.newaxis] * d_spacings
+
+    def create_volume_table(self, pressures, temperatures=(298.,)):
+        """
+        Precomputes the unit cell volumes on a grid of pressures and temperatures. Subsequent calls to
+        compute_volume (and therefore compute_d) within the grid interpolate the table instead of solving
+        the equation of state.
+
+        Inputs:
+           pressures:     Ascending pressures in GPa
+           temperatures:  Ascending temperatures in K, with a single temperature
+                          the table is only used for exactly this temperature.
+        """
+        pressures = np.asarray(pressures, dtype=np.float64)
+        temperatures = np.asarray(temperatures, dtype=np.float64)
+        volumes = self.compute_volumes(pressures[:, np.newaxis], temperatures[np.newaxis, :])
+        self.volume_table = (pressures, temperatures, volumes)
+
+    def clear_volume_table(self):
+        self.volume_table = None
+
+    def volume_table_contains(self, pressure, temperature):
+        if self.volume_table is None:
+            return False
+        pressures, temperatures, _ = self.volume_table
+        return pressures[0] <= pressure <= pressures[-1] and temperatures[0] <= temperature <= temperatures[-1]
+
+    def get_volume_from_table(self, pressure, temperature):
+        """
+        Returns the unit cell volume bilinearly interpolated from the volume table, the pressure and temperature
+        have to be within the table (see volume_table_contains).
+        """
+        pressures, temperatures, volumes = self.volume_table
+        if len(temperatures) == 1:
+            return float(np.interp(pressure, pressures, volumes[:, 0]))
+        t_ind = min(np.searchsorted(temperatures, temperature, side='right') - 1, len(temperatures) - 2)
+        t_fraction = (temperature - temperatures[t_ind]) / (temperatures[t_ind + 1] - temperatures[t_ind])
+        v_low = np.interp(pressure, pressures, volumes[:, t_ind])
+        v_high = np.interp(pressure, pressures, volumes[:, t_ind + 1])
+        return float(v_low + t_fraction * (v_high - v_low))
 
     def bm3_inverse(self, v0_v):
         """
-        Returns the value of the third order Birch-Murnaghan equation minus
-        pressure.  It is used to solve for V0/V for a given
+        Returns the squared value of the third order Birch-Murnaghan equation minus
+        pressure. Not used by compute_volume anymore, see bm3_inverse_volume.  It is used to solve for V0/V for a given
            P, K0 and K0'.
 
         Inputs:
@@ -498,14 +667,14 @@ class jcpds:
               temperature is assumed to be 298K, i.e. room temperature.
 
         Outputs:
-           None.  The D spacing information in the JCPDS object is calculated.
+           The reflection record array, whose d field is calculated.
 
         Procedure:
             This procedure first calls jcpds.compute_volume().
             It then assumes that each lattice dimension fractionally changes by
             the cube root of the fractional change in the volume.
-            Using the equations for the each symmetry class it then computes the
-            change in D spacing of each reflection.
+            The D spacings of all reflections are then computed at once from the
+            reciprocal metric tensor of the unit cell.
 
         Example:
            Compute the D spacings of alumina at 100 GPa and 2500 K.
@@ -528,59 +697,37 @@ class jcpds:
         self.b = self.b0 * ratio
         self.c = self.c0 * ratio
 
-        a = self.a
-        b = self.b
-        c = self.c
+        if self.symmetry not in ('CUBIC', 'TETRAGONAL', 'ORTHORHOMBIC', 'HEXAGONAL', 'RHOMBOHEDRAL',
+                                 'MONOCLINIC', 'TRICLINIC'):
+            print 'Unknown crystal symmetry = ' + self.symmetry
+            return self.reflections
+
+        # 1/d^2 = hkl . G* . hkl, with the reciprocal metric tensor G* being the inverse of the metric tensor of the
+        # (already symmetry constrained, see compute_v0) unit cell. This is valid for all crystal systems.
+        hkl = np.column_stack((self.reflections.h, self.reflections.k, self.reflections.l)).astype(np.float64)
+        d2inv = np.einsum('ij,jk,ik->i', hkl, self.get_reciprocal_metric_tensor(), hkl)
+        self.reflections.d = 1. / np.sqrt(d2inv)
+        return self.reflections
+
+    def get_reciprocal_metric_tensor(self):
+        """
+        Returns the reciprocal metric tensor G* (3x3) of the current unit cell, 1/d^2 of a reflection is hkl . G* . hkl
+        """
         dtor = np.pi / 180.
-        alpha = self.alpha * dtor
-        beta = self.beta * dtor
-        gamma = self.gamma * dtor
-        refl = self.get_reflections()
-        for r in refl:
-            h = float(r.h)
-            k = float(r.k)
-            l = float(r.l)
-            if (self.symmetry == 'CUBIC'):
-                d2inv = (h ** 2 + k ** 2 + l ** 2) / a ** 2
-            elif (self.symmetry == 'TETRAGONAL'):
-                d2inv = (h ** 2 + k ** 2) / a ** 2 + l ** 2 / c ** 2
-            elif (self.symmetry == 'ORTHORHOMBIC'):
-                d2inv = h ** 2 / a ** 2 + k ** 2 / b ** 2 + l ** 2 / c ** 2
-            elif (self.symmetry == 'HEXAGONAL'):
-                d2inv = (h ** 2 + h * k + k ** 2) * 4. / 3. / a ** 2 + l ** 2 / c ** 2
-            elif (self.symmetry == 'RHOMBOHEDRAL'):
-                d2inv = (((1. + np.cos(alpha)) * ((h ** 2 + k ** 2 + l ** 2) -
-                                                  (1 - np.tan(0.5 * alpha) ** 2) * (h * k + k * l + l * h))) /
-                         (a ** 2 * (1 + np.cos(alpha) - 2 * np.cos(alpha) ** 2)))
-            elif (self.symmetry == 'MONOCLINIC'):
-                d2inv = (h ** 2 / np.sin(beta) ** 2 / a ** 2 +
-                         k ** 2 / b ** 2 +
-                         l ** 2 / np.sin(beta) ** 2 / c ** 2 +
-                         2 * h * l * np.cos(beta) / (a * c * np.sin(beta) ** 2))
-            elif (self.symmetry == 'TRICLINIC'):
-                V = (a ** 2 * b ** 2 * c ** 2 *
-                     (1. - np.cos(alpha) ** 2 - np.cos(beta) ** 2 -
-                      np.cos(gamma) ** 2 +
-                      2 * np.cos(alpha) * np.cos(beta) * np.cos(gamma)))
-                s11 = b ** 2 * c ** 2 * np.sin(alpha) ** 2
-                s22 = a ** 2 * c ** 2 * np.sin(beta) ** 2
-                s33 = a ** 2 * b ** 2 * np.sin(gamma) ** 2
-                s12 = a * b * c ** 2 * (np.cos(alpha) * np.cos(beta) -
-                                        np.cos(gamma))
-                s23 = a ** 2 * b * c * (np.cos(beta) * np.cos(gamma) -
-                                        np.cos(alpha))
-                s31 = a * b ** 2 * c * (np.cos(gamma) * np.cos(alpha) -
-                                        np.cos(beta))
-                d2inv = (s11 * h ** 2 + s22 * k ** 2 + s33 * l ** 2 +
-                         2. * s12 * h * k + 2. * s23 * k * l + 2. * s31 * l * h) / V ** 2
-            else:
-                print 'Unknown crystal symmetry = ' + self.symmetry
-            r.d = np.sqrt(1. / d2inv)
+        cos_alpha = np.cos(self.alpha * dtor)
+        cos_beta = np.cos(self.beta * dtor)
+        cos_gamma = np.cos(self.gamma * dtor)
+        a, b, c = self.a, self.b, self.c
+        metric_tensor = np.array([[a * a, a * b * cos_gamma, a * c * cos_beta],
+                                  [a * b * cos_gamma, b * b, b * c * cos_alpha],
+                                  [a * c * cos_beta, b * c * cos_alpha, c * c]])
+        return np.linalg.inv(metric_tensor)
 
     def get_reflections(self):
         """
         Returns the information for each reflection for the material.
-        This information is an array of elements of class jcpds_reflection
+        This information is a record array with the fields h, k, l, d0, d and intensity
+        (see reflection_dtype), the fields can also be accessed as attributes, e.g. r.d
         """
         return self.reflections
 
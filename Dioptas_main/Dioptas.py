@@ -23,10 +23,13 @@
 
 __author__ = 'Clemens Prescher'
 import sys
+import multiprocessing
 from PyQt4 import QtGui
 from Controller.MainController import MainController
 
 if __name__ == "__main__":
+    # the worker processes of frozen windows builds would otherwise start the GUI again
+    multiprocessing.freeze_support()
     app = QtGui.QApplication(sys.argv)
     from sys import platform as _platform
 
@@ -0,0 +1,99 @@
+# -*- coding: utf8 -*-
+# Dioptas - GUI program for fast processing of 2D X-ray data
+# Copyright (C) 2014  Clemens Prescher (clemens.prescher@gmail.com)
+# GSECARS, University of Chicago
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+View dependent decimation of curves. A MinMaxPyramid stores the minimum and maximum of blocks of 2, 4, 8, ... points
+of a curve. For a visible x range it returns the finest level with at most one block per screen pixel, every block is
+drawn as a vertical line from its minimum to its maximum. Peaks therefore keep their full
+height at every zoom level, while only about two points per pixel are sent to the plot.
+"""
+
+__author__ = 'Clemens Prescher'
+
+import numpy as np
+
+
+class MinMaxPyramid(object):
+    def __init__(self, x, y):
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        # the search for the visible range needs ascending x (spectra in d-spacing are descending)
+        if len(x) > 1 and x[0] > x[-1]:
+            x = x[::-1]
+            y = y[::-1]
+        self.x = x
+        self.y = y
+        self.x_range = (x[0], x[-1]) if len(x) else (0, 0)
+        self._create_levels()
+
+    def _create_levels(self):
+        """
+        Level k contains the minima and maxima of blocks of 2^k points, level 0 is the curve itself.
+        """
+        self.mins = [self.y]
+        self.maxs = [self.y]
+        while len(self.mins[-1]) > 1:
+            mins = self.mins[-1]
+            maxs = self.maxs[-1]
+            num_pairs = len(mins) // 2
+            new_mins = np.fmin(mins[0:2 * num_pairs:2], mins[1:2 * num_pairs:2])
+            new_maxs = np.fmax(maxs[0:2 * num_pairs:2], maxs[1:2 * num_pairs:2])
+            if len(mins) % 2:
+                new_mins = np.append(new_mins, mins[-1])
+                new_maxs = np.append(new_maxs, maxs[-1])
+            self.mins.append(new_mins)
+            self.maxs.append(new_maxs)
+        # the top level holds the extrema of the whole curve
+        self.y_range = (self.mins[-1][0], self.maxs[-1][0]) if len(self.y) else (0, 0)
+
+    def get_data(self, x_min=None, x_max=None, num_pixels=None):
+        """
+        Returns the curve within [x_min, x_max] with about 2 * num_pixels points. The first and last point of the whole
+        curve are always included, so that the data bounds of the returned curve are the ones of the full curve.
+        :param num_pixels: width of the visible range in pixels, None returns the full curve
+        """
+        num_points = len(self.x)
+        if num_pixels is None or num_points <= 2 * num_pixels:
+            return self.x, self.y
+        if x_min is None:
+            x_min, x_max = self.x_range
+        # one point outside of the visible range on each side, so that the curve continues to the border
+        start = max(np.searchsorted(self.x, x_min, side='left') - 1, 0)
+        end = min(np.searchsorted(self.x, x_max, side='right') + 1, num_points)
+        num_visible = end - start
+        level = int(np.ceil(np.log2(max(num_visible / float(num_pixels), 1))))
+        if level == 0:
+            x = self.x[start:end]
+            y = self.y[start:end]
+        else:
+            level = min(level, len(self.mins) - 1)
+            block_size = 2 ** level
+            block_start = start // block_size
+            block_end = min((end - 1) // block_size + 1, len(self.mins[level]))
+            x = np.repeat(self.x[block_start * block_size:block_end * block_size:block_size], 2)
+            y = np.empty(len(x))
+            y[0::2] = self.mins[level][block_start:block_end]
+            y[1::2] = self.maxs[level][block_start:block_end]
+
+        if x[0] != self.x[0]:
+            x = np.concatenate(([self.x[0]], x))
+            y = np.concatenate(([self.y[0]], y))
+        if x[-1] != self.x[-1]:
+            x = np.append(x, self.x[-1])
+            y = np.append(y, self.y[-1])
+        return x, y
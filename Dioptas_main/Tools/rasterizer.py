@@ -0,0 +1,251 @@
+# -*- coding: utf8 -*-
+# Dioptas - GUI program for fast processing of 2D X-ray data
+# Copyright (C) 2014  Clemens Prescher (clemens.prescher@gmail.com)
+# GSECARS, University of Chicago
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Scanline rasterization of mask shapes. Every shape is converted into horizontal pixel spans which are only evaluated
+within its bounding box. If the compiled rasterizer_ extension is available (build it with the setup.py in this
+folder) it is used for C-contiguous boolean masks, otherwise the spans are filled with numpy.
+
+Pixel rules (pixel centers are at integer coordinates):
+    polygon: even-odd rule, a pixel on a left edge is inside, a pixel on a right edge is outside
+    ellipse: ((r - center_row) / row_radius)^2 + ((c - center_col) / col_radius)^2 < 1
+    annulus: inner_radius <= distance < outer_radius
+    stroke:  union of circles along the polyline, sampled every pixel
+"""
+
+__author__ = 'Clemens Prescher'
+
+import numpy as np
+
+try:
+    import rasterizer_
+except ImportError:
+    rasterizer_ = None
+
+EPS = 1e-12
+
+
+def fill_polygon(mask, rows, cols, value=True):
+    """
+    Fills a polygon with the given vertex coordinates into the 2d mask array (in place).
+    """
+    rows = np.ascontiguousarray(rows, dtype=np.float64).ravel()
+    cols = np.ascontiguousarray(cols, dtype=np.float64).ravel()
+    if len(rows) < 3:
+        return
+    compiled_mask = _get_compiled_mask(mask)
+    if compiled_mask is not None:
+        rasterizer_.fill_polygon(compiled_mask, rows, cols, int(bool(value)))
+        return
+
+    row_start = max(int(np.floor(rows.min())), 0)
+    row_end = min(int(np.ceil(rows.max())) + 1, mask.shape[0])
+    if row_end <= row_start:
+        return
+    y = np.arange(row_start, row_end, dtype=np.float64)[:, None]
+
+    rows_j = np.roll(rows, 1)
+    cols_j = np.roll(cols, 1)
+    crossing = (rows > y) != (rows_j > y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x = (cols_j - cols) * (y - rows) / (rows_j - rows) + cols
+    x = np.sort(np.where(crossing, x, np.nan), axis=1)
+    # rows always have an even number of crossings, missing pairs are nan and are removed in _fill_spans
+    num_pairs = x.shape[1] // 2
+    starts = x[:, 0:2 * num_pairs:2]
+    ends = x[:, 1:2 * num_pairs:2]
+    span_rows = np.repeat(y.astype(int), num_pairs, axis=1)
+    _fill_spans(mask, span_rows.ravel(), starts.ravel(), ends.ravel(), value)
+
+
+def fill_ellipse(mask, center_row, center_col, row_radius, col_radius, value=True):
+    """
+    Fills an axis aligned ellipse into the 2d mask array (in place).
+    """
+    if row_radius <= 0 or col_radius <= 0:
+        return
+    compiled_mask = _get_compiled_mask(mask)
+    if compiled_mask is not None:
+        rasterizer_.fill_ellipse(compiled_mask, center_row, center_col, row_radius, col_radius, int(bool(value)))
+        return
+
+    rows = _get_row_range(center_row, row_radius, mask.shape[0])
+    dy = (rows - center_row) / float(row_radius)
+    valid = dy * dy < 1
+    rows = rows[valid]
+    half_width = col_radius * np.sqrt(1 - dy[valid] ** 2)
+    _fill_spans(mask, rows, center_col - half_width + EPS, center_col + half_width, value)
+
+
+def fill_annulus(mask, center_row, center_col, inner_radius, outer_radius, value=True):
+    """
+    Fills a circular ring into the 2d mask array (in place).
+    """
+    if outer_radius <= 0:
+        return
+    compiled_mask = _get_compiled_mask(mask)
+    if compiled_mask is not None:
+        rasterizer_.fill_annulus(compiled_mask, center_row, center_col, inner_radius, outer_radius,
+                                 int(bool(value)))
+        return
+
+    rows = _get_row_range(center_row, outer_radius, mask.shape[0])
+    dy2 = (rows - center_row) ** 2
+    valid = dy2 < outer_radius ** 2
+    rows = rows[valid]
+    dy2 = dy2[valid]
+    outer_half_width = np.sqrt(outer_radius ** 2 - dy2)
+    inner_half_width = np.sqrt(np.clip(inner_radius ** 2 - dy2, 0, None))
+    has_hole = dy2 < inner_radius ** 2
+
+    # rows outside of the hole get one span from the outer border to the outer border, rows crossing the hole get
+    # a left and a right span
+    left_ends = np.where(has_hole, center_col - inner_half_width + EPS, center_col + outer_half_width)
+    starts = np.concatenate((center_col - outer_half_width + EPS, center_col + inner_half_width[has_hole]))
+    ends = np.concatenate((left_ends, center_col + outer_half_width[has_hole]))
+    _fill_spans(mask, np.concatenate((rows, rows[has_hole])), starts, ends, value)
+
+
+def fill_rectangle(mask, row1, col1, row2, col2, value=True):
+    """
+    Fills all pixels with row1 <= r < row2 and col1 <= c < col2, the corners are rounded to the next pixel.
+    """
+    mask[get_rectangle_region(row1, col1, row2, col2, mask.shape)] = value
+
+
+def fill_stroke(mask, rows, cols, radius, value=True):
+    """
+    Fills a brush stroke with the given radius along the polyline through the given points (in place).
+    """
+    if radius <= 0:
+        return
+    rows, cols = interpolate_stroke(rows, cols)
+    if len(rows) == 0:
+        return
+    compiled_mask = _get_compiled_mask(mask)
+    if compiled_mask is not None:
+        rasterizer_.fill_discs(compiled_mask, rows, cols, radius, int(bool(value)))
+        return
+
+    offsets = np.arange(-int(np.ceil(radius)) - 1, int(np.ceil(radius)) + 2)
+    disc_rows = np.floor(rows).astype(int)[:, None] + offsets
+    dy2 = (disc_rows - rows[:, None]) ** 2
+    valid = (dy2 < radius ** 2) & (disc_rows >= 0) & (disc_rows < mask.shape[0])
+    half_width = np.sqrt(radius ** 2 - dy2[valid])
+    disc_cols = np.repeat(cols[:, None], len(offsets), axis=1)[valid]
+    _fill_spans(mask, disc_rows[valid], disc_cols - half_width + EPS, disc_cols + half_width, value)
+
+
+def interpolate_stroke(rows, cols, step=1.0):
+    """
+    Inserts points along the polyline, so that consecutive points are at most step pixels apart.
+    """
+    rows = np.asarray(rows, dtype=np.float64).ravel()
+    cols = np.asarray(cols, dtype=np.float64).ravel()
+    if len(rows) < 2:
+        return np.ascontiguousarray(rows), np.ascontiguousarray(cols)
+    segment_length = np.sqrt(np.diff(rows) ** 2 + np.diff(cols) ** 2)
+    num_steps = np.maximum(np.ceil(segment_length / step).astype(int), 1)
+    segment_ind = np.repeat(np.arange(len(num_steps)), num_steps)
+    fraction = (np.arange(len(segment_ind)) - np.repeat(np.cumsum(num_steps) - num_steps, num_steps)) / \
+               np.repeat(num_steps, num_steps).astype(np.float64)
+    new_rows = rows[segment_ind] + fraction * (rows[segment_ind + 1] - rows[segment_ind])
+    new_cols = cols[segment_ind] + fraction * (cols[segment_ind + 1] - cols[segment_ind])
+    return np.append(new_rows, rows[-1]), np.append(new_cols, cols[-1])
+
+
+def get_polygon_region(rows, cols, shape):
+    """
+    Returns the slices of the mask which can be modified by fill_polygon.
+    """
+    if len(rows) == 0:
+        return slice(0, 0), slice(0, 0)
+    return _get_region(np.min(rows), np.max(rows), np.min(cols), np.max(cols), shape)
+
+
+def get_ellipse_region(center_row, center_col, row_radius, col_radius, shape):
+    """
+    Returns the slices of the mask which can be modified by fill_ellipse or fill_annulus.
+    """
+    return _get_region(center_row - row_radius, center_row + row_radius,
+                       center_col - col_radius, center_col + col_radius, shape)
+
+
+def get_stroke_region(rows, cols, radius, shape):
+    """
+    Returns the slices of the mask which can be modified by fill_stroke.
+    """
+    if len(rows) == 0:
+        return slice(0, 0), slice(0, 0)
+    return _get_region(np.min(rows) - radius, np.max(rows) + radius,
+                       np.min(cols) - radius, np.max(cols) + radius, shape)
+
+
+def get_rectangle_region(row1, col1, row2, col2, shape):
+    row1, row2 = sorted((int(np.round(row1)), int(np.round(row2))))
+    col1, col2 = sorted((int(np.round(col1)), int(np.round(col2))))
+    return (slice(min(max(row1, 0), shape[0]), min(max(row2, 0), shape[0])),
+            slice(min(max(col1, 0), shape[1]), min(max(col2, 0), shape[1])))
+
+
+def _get_region(row_min, row_max, col_min, col_max, shape):
+    row_start = min(max(int(np.floor(row_min)), 0), shape[0])
+    row_end = min(max(int(np.ceil(row_max)) + 1, row_start), shape[0])
+    col_start = min(max(int(np.floor(col_min)), 0), shape[1])
+    col_end = min(max(int(np.ceil(col_max)) + 1, col_start), shape[1])
+    return slice(row_start, row_end), slice(col_start, col_end)
+
+
+def _get_row_range(center, radius, num_rows):
+    row_start = max(int(np.floor(center - radius)), 0)
+    row_end = min(int(np.ceil(center + radius)) + 1, num_rows)
+    return np.arange(row_start, row_end, dtype=np.float64)
+
+
+def _get_compiled_mask(mask):
+    if rasterizer_ is not None and mask.dtype == np.bool and mask.flags.c_contiguous and mask.flags.writeable:
+        return mask.view(np.uint8)
+    return None
+
+
+def _fill_spans(mask, rows, starts, ends, value):
+    """
+    Fills all pixels with start <= c < end in the given rows. Spans may overlap, spans with nan borders are ignored.
+    The spans are combined into one boolean array covering their bounding box by a running sum over start (+1) and
+    end (-1) markers, so that the mask is written only once.
+    """
+    valid = ~(np.isnan(starts) | np.isnan(ends))
+    rows = np.asarray(rows, dtype=int)[valid]
+    col_starts = np.clip(np.ceil(starts[valid]), 0, mask.shape[1]).astype(int)
+    col_ends = np.clip(np.ceil(ends[valid]), 0, mask.shape[1]).astype(int)
+    valid = col_ends > col_starts
+    if not np.any(valid):
+        return
+    rows = rows[valid]
+    col_starts = col_starts[valid]
+    col_ends = col_ends[valid]
+
+    row_min = rows.min()
+    col_min = col_starts.min()
+    num_rows = rows.max() - row_min + 1
+    num_cols = col_ends.max() - col_min + 1
+    row_offset = (rows - row_min) * num_cols
+    markers = np.bincount(row_offset + col_starts - col_min, minlength=num_rows * num_cols) - \
+              np.bincount(row_offset + col_ends - col_min, minlength=num_rows * num_cols)
+    inside = np.cumsum(markers.reshape(num_rows, num_cols)[:, :-1], axis=1) > 0
+    mask[row_min:row_min + num_rows, col_min:col_min + num_cols - 1][inside] = value
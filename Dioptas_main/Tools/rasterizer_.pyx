@@ -0,0 +1,171 @@
+# -*- coding: utf8 -*-
+# Dioptas - GUI program for fast processing of 2D X-ray data
+# Copyright (C) 2014  Clemens Prescher (clemens.prescher@gmail.com)
+# GSECARS, University of Chicago
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# Compiled scanline rasterization of mask shapes. The mask has to be a C-contiguous uint8 array (a bool mask viewed
+# as uint8). Only the rows and columns within the bounding box of a shape are visited. The pixel rules are the same
+# as in the pure numpy fallback in rasterizer.py.
+
+import numpy as np
+cimport numpy as np
+cimport cython
+
+cdef extern from "math.h":
+    double sqrt(double val)
+    double ceil(double val)
+    double floor(double val)
+
+
+cdef double EPS = 1e-12
+
+
+cdef inline int int_max(int a, int b): return a if a > b else b
+
+cdef inline int int_min(int a, int b): return a if a < b else b
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef inline void fill_span(np.uint8_t[:, ::1] mask, int row, double start, double end, np.uint8_t value):
+    """
+    Fills all columns c of row with start <= c < end.
+    """
+    cdef int col
+    cdef int col_start = int_max(<int> ceil(start), 0)
+    cdef int col_end = int_min(<int> ceil(end), mask.shape[1])
+    for col in range(col_start, col_end):
+        mask[row, col] = value
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def fill_polygon(np.uint8_t[:, ::1] mask, double[::1] rows, double[::1] cols, np.uint8_t value):
+    """
+    Even-odd scanline fill of a polygon given by its vertices. A pixel is inside if a ray in positive column
+    direction crosses the polygon edges an odd number of times.
+    """
+    cdef int num_vertices = rows.shape[0]
+    cdef int i, j, k, row, row_start, row_end, num_crossings
+    cdef double y, x, row_min, row_max
+    cdef double[::1] crossings = np.empty(num_vertices, dtype=np.float64)
+
+    if num_vertices < 3:
+        return
+
+    row_min = rows[0]
+    row_max = rows[0]
+    for i in range(num_vertices):
+        if rows[i] < row_min:
+            row_min = rows[i]
+        if rows[i] > row_max:
+            row_max = rows[i]
+    row_start = int_max(<int> floor(row_min), 0)
+    row_end = int_min(<int> ceil(row_max) + 1, mask.shape[0])
+
+    for row in range(row_start, row_end):
+        y = row
+        num_crossings = 0
+        j = num_vertices - 1
+        for i in range(num_vertices):
+            if (rows[i] > y) != (rows[j] > y):
+                crossings[num_crossings] = (cols[j] - cols[i]) * (y - rows[i]) / (rows[j] - rows[i]) + cols[i]
+                num_crossings += 1
+            j = i
+
+        # insertion sort, the number of crossings per row is small
+        for i in range(1, num_crossings):
+            x = crossings[i]
+            k = i - 1
+            while k >= 0 and crossings[k] > x:
+                crossings[k + 1] = crossings[k]
+                k -= 1
+            crossings[k + 1] = x
+
+        for i in range(0, num_crossings - 1, 2):
+            fill_span(mask, row, crossings[i], crossings[i + 1], value)
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+cdef void _fill_ellipse(np.uint8_t[:, ::1] mask, double center_row, double center_col, double row_radius,
+                        double col_radius, np.uint8_t value):
+    cdef int row, row_start, row_end
+    cdef double dy, half_width
+
+    if row_radius <= 0 or col_radius <= 0:
+        return
+
+    row_start = int_max(<int> floor(center_row - row_radius), 0)
+    row_end = int_min(<int> ceil(center_row + row_radius) + 1, mask.shape[0])
+    for row in range(row_start, row_end):
+        dy = (row - center_row) / row_radius
+        if dy * dy >= 1:
+            continue
+        half_width = col_radius * sqrt(1 - dy * dy)
+        # the start is shifted by a tiny amount, a pixel exactly on the border would otherwise be included by ceil
+        fill_span(mask, row, center_col - half_width + EPS, center_col + half_width, value)
+
+
+def fill_ellipse(np.uint8_t[:, ::1] mask, double center_row, double center_col, double row_radius,
+                 double col_radius, np.uint8_t value):
+    """
+    Fills all pixels with ((r - center_row) / row_radius)^2 + ((c - center_col) / col_radius)^2 < 1.
+    """
+    _fill_ellipse(mask, center_row, center_col, row_radius, col_radius, value)
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def fill_annulus(np.uint8_t[:, ::1] mask, double center_row, double center_col, double inner_radius,
+                 double outer_radius, np.uint8_t value):
+    """
+    Fills all pixels with inner_radius <= distance to center < outer_radius.
+    """
+    cdef int row, row_start, row_end
+    cdef double dy2, outer_half_width, inner_half_width
+
+    if outer_radius <= 0:
+        return
+
+    row_start = int_max(<int> floor(center_row - outer_radius), 0)
+    row_end = int_min(<int> ceil(center_row + outer_radius) + 1, mask.shape[0])
+    for row in range(row_start, row_end):
+        dy2 = (row - center_row) * (row - center_row)
+        if dy2 >= outer_radius * outer_radius:
+            continue
+        outer_half_width = sqrt(outer_radius * outer_radius - dy2)
+        if dy2 >= inner_radius * inner_radius:
+            fill_span(mask, row, center_col - outer_half_width + EPS, center_col + outer_half_width, value)
+        else:
+            inner_half_width = sqrt(inner_radius * inner_radius - dy2)
+            fill_span(mask, row, center_col - outer_half_width + EPS, center_col - inner_half_width + EPS,
+                      value)
+            fill_span(mask, row, center_col + inner_half_width, center_col + outer_half_width, value)
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def fill_discs(np.uint8_t[:, ::1] mask, double[::1] rows, double[::1] cols, double radius, np.uint8_t value):
+    """
+    Fills circles with the given radius around all given points (used for brush strokes).
+    """
+    cdef int i
+    for i in range(rows.shape[0]):
+        _fill_ellipse(mask, rows[i], cols[i], radius, radius, value)
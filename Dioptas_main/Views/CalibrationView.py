@@ -23,6 +23,7 @@ from PyQt4 import QtGui, QtCore
 from UiFiles.CalibrationUI import Ui_XrsCalibrationWidget
 from ImgView import MaskImgView, CalibrationCakeView
 from SpectrumView import SpectrumView
+from ResidualView import ResidualView
 from Data.HelperModule import SignalFrequencyLimiter
 import numpy as np
 import pyqtgraph as pg
@@ -37,10 +38,20 @@ class CalibrationView(QtGui.QWidget, Ui_XrsCalibrationWidget):
         self.img_view = MaskImgView(self.img_pg_layout)
         self.cake_view = CalibrationCakeView(self.cake_pg_layout)
         self.spectrum_view = SpectrumView(self.spectrum_pg_layout)
+        self.create_residual_tab()
 
         self.set_validator()
         self.set_cb_style()
 
+    def create_residual_tab(self):
+        self.residual_tab = QtGui.QWidget()
+        self.residual_pg_layout = pg.GraphicsLayoutWidget(self.residual_tab)
+        layout = QtGui.QHBoxLayout(self.residual_tab)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.residual_pg_layout)
+        self.tab_widget.addTab(self.residual_tab, 'Residuals')
+        self.residual_view = ResidualView(self.residual_pg_layout)
+
     def set_validator(self):
         self.f2_center_x_txt.setValidator(QtGui.QDoubleValidator())
         self.f2_center_y_txt.setValidator(QtGui.QDoubleValidator())
@@ -174,6 +174,22 @@ class LegendItem(GraphicsWidget, GraphicsWidgetAnchor):
                 self.updateSize()
                 del self.hiddenFlag[ind]
 
+    def removeItems(self, start_ind=0):
+        """
+        Removes all items from start_ind on in one step.
+        """
+        for ind in range(start_ind, len(self.legendItems)):
+            sample, label = self.legendItems[ind]
+            if not self.hiddenFlag[ind]:
+                self.layout.removeItem(sample)
+                self.layout.removeItem(label)
+            sample.close()
+            label.close()
+        del self.legendItems[start_ind:]
+        del self.plotItems[start_ind:]
+        del self.hiddenFlag[start_ind:]
+        self.updateSize()
+
     def hideItem(self,ind):
         sample_item, label_item = self.legendItems[ind]
         if not self.hiddenFlag[ind]:
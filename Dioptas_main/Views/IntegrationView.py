@@ -22,6 +22,7 @@ from PyQt4 import QtGui, QtCore
 from UiFiles.IntegrationUI import Ui_xrs_integration_widget
 from ImgView import IntegrationImgView
 from SpectrumView import SpectrumView
+from SeriesView import SeriesView
 from functools import partial
 import numpy as np
 import pyqtgraph as pg
@@ -49,6 +50,11 @@ class IntegrationView(QtGui.QWidget, Ui_xrs_integration_widget):
         self.spectrum_view = SpectrumView(self.spectrum_pg_layout)
         self.spectrum_pg_layout.ci.layout.setContentsMargins(10, 10, 0, 10)
         self.set_validator()
+        self.create_spectrum_store_widgets()
+        self.create_auto_background_widgets()
+        self.create_overlay_stack_widgets()
+        self.create_series_widgets()
+        self.create_phase_fit_widgets()
 
         self.overlay_tw.cellChanged.connect(self.overlay_label_editingFinished)
         self.overlay_show_cbs = []
@@ -65,6 +71,94 @@ class IntegrationView(QtGui.QWidget, Ui_xrs_integration_widget):
         header_view.hide()
 
 
+    def create_spectrum_store_widgets(self):
+        self.spec_store_cb = QtGui.QCheckBox('single file', self.groupBox_2)
+        self.spec_store_cb.setToolTip('Integrating multiple images writes all spectra into one binary container '
+                                      'folder instead of one .chi file per image')
+        self.horizontalLayout.addWidget(self.spec_store_cb)
+
+    def create_auto_background_widgets(self):
+        self.auto_bkg_gb = QtGui.QGroupBox('Automatic background', self.tab_5)
+        self.auto_bkg_gb.setCheckable(True)
+        self.auto_bkg_gb.setChecked(False)
+        layout = QtGui.QGridLayout(self.auto_bkg_gb)
+        self.auto_bkg_method_cb = QtGui.QComboBox(self.auto_bkg_gb)
+        self.auto_bkg_method_cb.addItems(['snip', 'chebyshev'])
+        self.auto_bkg_width_sb = QtGui.QSpinBox(self.auto_bkg_gb)
+        self.auto_bkg_width_sb.setRange(1, 1000)
+        self.auto_bkg_width_sb.setValue(50)
+        self.auto_bkg_width_sb.setToolTip('largest peak width in points (snip)')
+        self.auto_bkg_order_sb = QtGui.QSpinBox(self.auto_bkg_gb)
+        self.auto_bkg_order_sb.setRange(0, 30)
+        self.auto_bkg_order_sb.setValue(6)
+        self.auto_bkg_order_sb.setToolTip('polynomial order (chebyshev)')
+        layout.addWidget(QtGui.QLabel('Method:'), 0, 0)
+        layout.addWidget(self.auto_bkg_method_cb, 0, 1)
+        layout.addWidget(QtGui.QLabel('Width:'), 1, 0)
+        layout.addWidget(self.auto_bkg_width_sb, 1, 1)
+        layout.addWidget(QtGui.QLabel('Order:'), 2, 0)
+        layout.addWidget(self.auto_bkg_order_sb, 2, 1)
+
+        tab_layout = QtGui.QVBoxLayout(self.tab_5)
+        tab_layout.addWidget(self.auto_bkg_gb)
+        tab_layout.addStretch(1)
+
+    def create_overlay_stack_widgets(self):
+        self.overlay_stack_gb = QtGui.QGroupBox('Series', self.overlay_tab)
+        layout = QtGui.QHBoxLayout(self.overlay_stack_gb)
+        self.overlay_stack_load_btn = QtGui.QPushButton('Load', self.overlay_stack_gb)
+        self.overlay_stack_load_btn.setToolTip('Loads many spectrum files or a single file spectrum store as one '
+                                               'overlay series')
+        self.overlay_stack_clear_btn = QtGui.QPushButton('Clear', self.overlay_stack_gb)
+        self.overlay_stack_mode_cb = QtGui.QComboBox(self.overlay_stack_gb)
+        self.overlay_stack_mode_cb.addItems(['waterfall', 'heat map'])
+        self.overlay_stack_spacing_sb = QtGui.QDoubleSpinBox(self.overlay_stack_gb)
+        self.overlay_stack_spacing_sb.setRange(0, 999999999.0)
+        self.overlay_stack_spacing_sb.setDecimals(1)
+        self.overlay_stack_spacing_sb.setSingleStep(10)
+        self.overlay_stack_spacing_sb.setToolTip('waterfall offset between consecutive spectra')
+        self.overlay_stack_lbl = QtGui.QLabel('', self.overlay_stack_gb)
+        layout.addWidget(self.overlay_stack_load_btn)
+        layout.addWidget(self.overlay_stack_clear_btn)
+        layout.addWidget(self.overlay_stack_mode_cb)
+        layout.addWidget(self.overlay_stack_spacing_sb)
+        layout.addWidget(self.overlay_stack_lbl)
+        layout.addStretch(1)
+        self.verticalLayout_6.addWidget(self.overlay_stack_gb)
+
+    def create_series_widgets(self):
+        self.series_tab = QtGui.QWidget()
+        layout = QtGui.QVBoxLayout(self.series_tab)
+        layout.setSpacing(5)
+        layout.setMargin(5)
+        button_layout = QtGui.QHBoxLayout()
+        self.series_clear_btn = QtGui.QPushButton('Clear', self.series_tab)
+        self.series_lbl = QtGui.QLabel('', self.series_tab)
+        button_layout.addWidget(self.series_clear_btn)
+        button_layout.addWidget(self.series_lbl)
+        button_layout.addStretch(1)
+        layout.addLayout(button_layout)
+        self.series_pg_layout = pg.GraphicsLayoutWidget(self.series_tab)
+        layout.addWidget(self.series_pg_layout)
+        self.series_view = SeriesView(self.series_pg_layout)
+        self.tabWidget.insertTab(self.tabWidget.indexOf(self.tab_5), self.series_tab, 'Series')
+
+    def create_phase_fit_widgets(self):
+        layout = QtGui.QHBoxLayout()
+        self.phase_fit_btn = QtGui.QPushButton('Fit P', self.phase_tab)
+        self.phase_fit_btn.setToolTip('Fits the pressure of the selected phase to the peaks next to its lines')
+        self.phase_fit_temperature_cb = QtGui.QCheckBox('T', self.phase_tab)
+        self.phase_fit_temperature_cb.setToolTip('Fits the temperature at the current pressure instead')
+        self.phase_fit_series_btn = QtGui.QPushButton('Fit series', self.phase_tab)
+        self.phase_fit_series_btn.setToolTip('Fits the pressure of the selected phase to all spectra of the series')
+        self.phase_fit_lbl = QtGui.QLabel('', self.phase_tab)
+        layout.addWidget(self.phase_fit_btn)
+        layout.addWidget(self.phase_fit_temperature_cb)
+        layout.addWidget(self.phase_fit_series_btn)
+        layout.addStretch(1)
+        self.gridLayout_2.addLayout(layout, 4, 0, 1, 4)
+        self.gridLayout_2.addWidget(self.phase_fit_lbl, 5, 0, 1, 4)
+
     def set_validator(self):
         self.phase_pressure_step_txt.setValidator(QtGui.QDoubleValidator())
         self.phase_temperature_step_txt.setValidator(QtGui.QDoubleValidator())
@@ -136,6 +230,13 @@ class IntegrationView(QtGui.QWidget, Ui_xrs_integration_widget):
         else:
             self.select_overlay(self.overlay_tw.rowCount()-1)
 
+    def clear_overlays(self):
+        self.overlay_tw.blockSignals(True)
+        self.overlay_tw.setRowCount(0)
+        self.overlay_tw.blockSignals(False)
+        self.overlay_show_cbs = []
+        self.overlay_color_btns = []
+
     def overlay_color_btn_click(self, button):
         self.overlay_color_btn_clicked.emit(self.overlay_color_btns.index(button), button)
 
@@ -32,8 +32,100 @@ class MaskView(QtGui.QWidget, Ui_xrs_mask_widget):
         self.setupUi(self)
         #self.splitter.setStretchFactor(0, 1)
         self.img_view = MaskImgView(self.img_pg_layout)
+        self.create_range_mask_widgets()
+        self.create_layer_widgets()
         self.set_validator()
 
+    def create_range_mask_widgets(self):
+        self.range_layout = QtGui.QGridLayout()
+        self.range_layout.setSpacing(8)
+        self.range_unit_cb = QtGui.QComboBox(self.widget)
+        self.range_unit_cb.addItems([u'2θ (°)', u'Q (1/A)'])
+        self.range_min_txt = QtGui.QLineEdit(self.widget)
+        self.range_max_txt = QtGui.QLineEdit(self.widget)
+        self.range_chi_min_txt = QtGui.QLineEdit(self.widget)
+        self.range_chi_max_txt = QtGui.QLineEdit(self.widget)
+        self.range_chi_min_txt.setPlaceholderText(u'χ min (°)')
+        self.range_chi_max_txt.setPlaceholderText(u'χ max (°)')
+        for txt in [self.range_min_txt, self.range_max_txt, self.range_chi_min_txt, self.range_chi_max_txt]:
+            txt.setAlignment(QtCore.Qt.AlignRight | QtCore.Qt.AlignTrailing | QtCore.Qt.AlignVCenter)
+        self.range_mask_btn = QtGui.QPushButton('Mask Range', self.widget)
+        self.range_mask_btn.setFlat(True)
+        self.range_clear_btn = QtGui.QPushButton('Clear Ranges', self.widget)
+        self.range_clear_btn.setFlat(True)
+
+        self.range_layout.addWidget(self.range_unit_cb, 0, 0, 1, 2)
+        self.range_layout.addWidget(self.range_min_txt, 1, 0, 1, 1)
+        self.range_layout.addWidget(self.range_max_txt, 1, 1, 1, 1)
+        self.range_layout.addWidget(self.range_chi_min_txt, 2, 0, 1, 1)
+        self.range_layout.addWidget(self.range_chi_max_txt, 2, 1, 1, 1)
+        self.range_layout.addWidget(self.range_mask_btn, 3, 0, 1, 1)
+        self.range_layout.addWidget(self.range_clear_btn, 3, 1, 1, 1)
+
+        range_line = QtGui.QFrame(self.widget)
+        range_line.setFrameShape(QtGui.QFrame.HLine)
+        range_line.setFrameShadow(QtGui.QFrame.Sunken)
+        # insert below the threshold and cosmic removal section
+        self.verticalLayout_2.insertWidget(5, range_line)
+        self.verticalLayout_2.insertLayout(6, self.range_layout)
+
+    def create_layer_widgets(self):
+        self.layer_layout = QtGui.QGridLayout()
+        self.layer_layout.setSpacing(8)
+        self.layer_list = QtGui.QListWidget(self.widget)
+        self.layer_list.setMaximumHeight(100)
+        self.load_layer_btn = QtGui.QPushButton('Load Layer', self.widget)
+        self.load_layer_btn.setFlat(True)
+        self.remove_layer_btn = QtGui.QPushButton('Remove Layer', self.widget)
+        self.remove_layer_btn.setFlat(True)
+        self.detector_mask_btn = QtGui.QPushButton('Detector Mask from Image Series', self.widget)
+        self.detector_mask_btn.setFlat(True)
+        self.detector_mask_btn.setToolTip('Masks dead pixels, hot pixels and panel gaps found in all images of a folder')
+        self.layer_layout.addWidget(self.layer_list, 0, 0, 1, 2)
+        self.layer_layout.addWidget(self.load_layer_btn, 1, 0, 1, 1)
+        self.layer_layout.addWidget(self.remove_layer_btn, 1, 1, 1, 1)
+        self.layer_layout.addWidget(self.detector_mask_btn, 2, 0, 1, 2)
+
+        layer_line = QtGui.QFrame(self.widget)
+        layer_line.setFrameShape(QtGui.QFrame.HLine)
+        layer_line.setFrameShadow(QtGui.QFrame.Sunken)
+        # insert below the 2theta/Q range section
+        self.verticalLayout_2.insertWidget(7, layer_line)
+        self.verticalLayout_2.insertLayout(8, self.layer_layout)
+
+    def set_layers(self, names, visibilities):
+        """
+        Updates the layer list with checkable items for the given layer names.
+        """
+        self.layer_list.blockSignals(True)
+        current_row = self.layer_list.currentRow()
+        self.layer_list.clear()
+        for name, visible in zip(names, visibilities):
+            item = QtGui.QListWidgetItem(name, self.layer_list)
+            item.setFlags(item.flags() | QtCore.Qt.ItemIsUserCheckable)
+            item.setCheckState(QtCore.Qt.Checked if visible else QtCore.Qt.Unchecked)
+        if 0 <= current_row < self.layer_list.count():
+            self.layer_list.setCurrentRow(current_row)
+        self.layer_list.blockSignals(False)
+
+    def get_range_mask_parameter(self):
+        """
+        :return: unit ('2th_deg' or 'q_A^-1'), min, max, chi_min, chi_max (chi values are None if not given)
+        """
+        unit = ['2th_deg', 'q_A^-1'][self.range_unit_cb.currentIndex()]
+        chi_min = str(self.range_chi_min_txt.text())
+        chi_max = str(self.range_chi_max_txt.text())
+        if chi_min == '' or chi_max == '':
+            chi_min = chi_max = None
+        else:
+            chi_min = float(chi_min)
+            chi_max = float(chi_max)
+        return unit, float(self.range_min_txt.text()), float(self.range_max_txt.text()), chi_min, chi_max
+
     def set_validator(self):
         self.above_thresh_txt.setValidator(QtGui.QIntValidator())
         self.below_thresh_txt.setValidator(QtGui.QIntValidator())
+        self.range_min_txt.setValidator(QtGui.QDoubleValidator())
+        self.range_max_txt.setValidator(QtGui.QDoubleValidator())
+        self.range_chi_min_txt.setValidator(QtGui.QDoubleValidator())
+        self.range_chi_max_txt.setValidator(QtGui.QDoubleValidator())
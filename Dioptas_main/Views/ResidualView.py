@@ -0,0 +1,74 @@
+# -*- coding: utf8 -*-
+# Dioptas - GUI program for fast processing of 2D X-ray data
+# Copyright (C) 2014  Clemens Prescher (clemens.prescher@gmail.com)
+# GSECARS, University of Chicago
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__author__ = 'Clemens Prescher'
+
+import pyqtgraph as pg
+import numpy as np
+from PyQt4 import QtCore
+from Data.HelperModule import calculate_color
+
+
+class ResidualView(QtCore.QObject):
+    """
+    Shows the 2theta residuals of the calibration points versus azimuth, one color per calibrant ring. Ring
+    positions estimated from the cake image are shown as lines in the same color.
+    """
+
+    def __init__(self, pg_layout):
+        super(ResidualView, self).__init__()
+        self.pg_layout = pg_layout
+        self.plot = self.pg_layout.addPlot()
+        self.plot.setLabel('bottom', u'χ', u'°')
+        self.plot.setLabel('left', u'Δ2θ', u'°')
+        self.plot.addLine(y=0, pen=pg.mkPen(color=(255, 255, 255), style=QtCore.Qt.DashLine))
+        self.statistics_txt = pg.TextItem(anchor=(0, 0))
+        self.plot.addItem(self.statistics_txt)
+        self.point_items = []
+        self.cake_items = []
+
+    def plot_residuals(self, residuals, statistics=None):
+        for item in self.point_items:
+            self.plot.removeItem(item)
+        self.point_items = []
+        for ring_ind, (chi, residual) in residuals.iteritems():
+            item = pg.ScatterPlotItem(chi, residual, size=4, pen=None,
+                                      brush=pg.mkBrush(calculate_color(ring_ind)))
+            self.plot.addItem(item)
+            self.point_items.append(item)
+        if statistics is not None and statistics:
+            self.statistics_txt.setText(u'rms: %.5f°  max: %.5f°  points: %d' %
+                                        (statistics['rms'], statistics['max'], statistics['num_points']))
+        else:
+            self.statistics_txt.setText('')
+        self.update_text_position()
+
+    def plot_cake_residuals(self, cake_residuals):
+        for item in self.cake_items:
+            self.plot.removeItem(item)
+        self.cake_items = []
+        for ring_ind, (azi, residual) in cake_residuals.iteritems():
+            item = pg.PlotDataItem(azi, residual, pen=pg.mkPen(color=calculate_color(ring_ind)))
+            self.plot.addItem(item)
+            self.cake_items.append(item)
+        self.update_text_position()
+
+    def update_text_position(self):
+        self.plot.vb.autoRange()
+        view_range = self.plot.vb.viewRange()
+        self.statistics_txt.setPos(view_range[0][0], view_range[1][1])
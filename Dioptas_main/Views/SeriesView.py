@@ -0,0 +1,138 @@
+# -*- coding: utf8 -*-
+# Dioptas - GUI program for fast processing of 2D X-ray data
+#     Copyright (C) 2014  Clemens Prescher (clemens.prescher@gmail.com)
+#     GSECARS, University of Chicago
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+__author__ = 'Clemens Prescher'
+
+import pyqtgraph as pg
+import numpy as np
+from PyQt4 import QtCore
+
+
+class SeriesView(QtCore.QObject):
+    """
+    Shows the spectra of an image series as image (x horizontal, frame index vertical) with a trace of the intensity
+    at the x cursor over all frames below.
+    """
+    frame_clicked = QtCore.pyqtSignal(int)
+    x_cursor_moved = QtCore.pyqtSignal(float)
+    frame_range_changed = QtCore.pyqtSignal(float, float)
+
+    def __init__(self, pg_layout):
+        super(SeriesView, self).__init__()
+        self.pg_layout = pg_layout
+        self.create_graphics()
+        self.create_cursors()
+        self.num_frames = 0
+
+    def create_graphics(self):
+        self.series_plot = self.pg_layout.addPlot(0, 0, labels={'left': 'Frame', 'bottom': u'2θ'})
+        self.series_img_item = pg.ImageItem()
+        self.series_plot.addItem(self.series_img_item)
+        self.series_plot.invertY(True)
+        self.series_histogram_LUT = pg.HistogramLUTItem(self.series_img_item)
+        self.pg_layout.addItem(self.series_histogram_LUT, 0, 1)
+
+        self.trace_plot = self.pg_layout.addPlot(1, 0, labels={'left': 'Intensity', 'bottom': 'Frame'})
+        self.trace_item = pg.PlotDataItem(pen=pg.mkPen(color=(255, 255, 255), width=1.5))
+        self.trace_plot.addItem(self.trace_item)
+        self.pg_layout.ci.layout.setRowStretchFactor(0, 3)
+        self.pg_layout.ci.layout.setRowStretchFactor(1, 1)
+
+        self.pressure_plot = self.pg_layout.addPlot(2, 0, labels={'left': 'P (GPa)', 'bottom': 'Frame'})
+        self.pressure_item = pg.PlotDataItem(pen=None, symbol='o', symbolSize=4,
+                                             symbolPen=None, symbolBrush=(255, 200, 0))
+        self.pressure_plot.addItem(self.pressure_item)
+        self.pressure_plot.setXLink(self.trace_plot)
+        self.pressure_plot.hide()
+
+        self.series_plot.vb.sigYRangeChanged.connect(self.y_range_changed)
+        self.series_img_item.mouseClickEvent = self.img_mouse_click_event
+
+    def create_cursors(self):
+        self.frame_line = pg.InfiniteLine(angle=0, pen=pg.mkPen(color=(0, 255, 0), width=1.5))
+        self.series_plot.addItem(self.frame_line)
+        self.x_line = pg.InfiniteLine(angle=90, movable=True, pen=pg.mkPen(color=(255, 0, 0), width=1.5))
+        self.series_plot.addItem(self.x_line)
+        self.x_line.sigPositionChanged.connect(self.x_line_moved)
+        self.trace_frame_line = pg.InfiniteLine(pen=pg.mkPen(color=(0, 255, 0), width=1.5))
+        self.trace_plot.addItem(self.trace_frame_line)
+
+    def plot_image(self, image, x_min, x_max, frame_start, frame_end, auto_levels=False):
+        """
+        :param image: (frames, bins) image, which may be downsampled
+        :param x_min, x_max: x range covered by the bins
+        :param frame_start, frame_end: frame range covered by the rows
+        """
+        self.series_img_item.setImage(np.nan_to_num(image).T, autoLevels=auto_levels)
+        self.series_img_item.setRect(QtCore.QRectF(x_min, frame_start, x_max - x_min, frame_end - frame_start))
+
+    def set_num_frames(self, num_frames):
+        self.num_frames = num_frames
+
+    def set_unit_label(self, label, unit=''):
+        self.series_plot.setLabel('bottom', label, unit)
+
+    def plot_trace(self, intensities):
+        self.trace_item.setData(np.arange(len(intensities)), np.nan_to_num(intensities))
+
+    def plot_pressures(self, pressures):
+        """
+        Shows fitted pressures over the frame index, frames where the fit failed are nan.
+        """
+        frames = np.arange(len(pressures))
+        fitted = np.isfinite(pressures)
+        self.pressure_item.setData(frames[fitted], pressures[fitted])
+        self.pressure_plot.show()
+
+    def clear_pressures(self):
+        self.pressure_item.setData([], [])
+        self.pressure_plot.hide()
+
+    def set_frame_cursor(self, ind):
+        self.frame_line.setPos(ind + 0.5)
+        self.trace_frame_line.setPos(ind)
+
+    def get_x_cursor(self):
+        return self.x_line.value()
+
+    def set_x_cursor(self, x):
+        self.x_line.blockSignals(True)
+        self.x_line.setPos(x)
+        self.x_line.blockSignals(False)
+
+    def get_frame_range(self):
+        """
+        :return: visible frame range, None if the view is auto ranged
+        """
+        if self.series_plot.vb.autoRangeEnabled()[1]:
+            return None
+        return self.series_plot.vb.viewRange()[1]
+
+    def x_line_moved(self):
+        self.x_cursor_moved.emit(self.x_line.value())
+
+    def y_range_changed(self, view_box, y_range):
+        self.frame_range_changed.emit(y_range[0], y_range[1])
+
+    def img_mouse_click_event(self, ev):
+        if ev.button() == QtCore.Qt.LeftButton:
+            pos = self.series_plot.vb.mapSceneToView(ev.scenePos())
+            ind = int(np.floor(pos.y()))
+            if 0 <= ind < self.num_frames:
+                self.frame_clicked.emit(ind)
+            ev.accept()
@@ -22,6 +22,7 @@ import pyqtgraph as pg
 from Views.ExLegendItem import LegendItem
 import numpy as np
 from Data.HelperModule import calculate_color
+from Tools.decimation import MinMaxPyramid
 from PyQt4 import QtCore, QtGui
 from pyqtgraph.exporters.ImageExporter import ImageExporter
 from pyqtgraph.exporters.SVGExporter import SVGExporter
@@ -44,8 +45,12 @@ class SpectrumView(QtCore.QObject):
         self.phases = []
         self.phases_vlines = []
         self.overlays = []
+        self.overlay_pyramids = []
         self.overlay_names = []
         self.overlay_show = []
+        self.plot_item_pyramid = None
+        self.overlay_stack_item = None
+        self.overlay_stack_x_range = None
 
     def create_graphics(self):
         self.spectrum_plot = self.pg_layout.addPlot(labels={'left': 'Intensity', 'bottom': '2 Theta'})
@@ -53,6 +58,8 @@ class SpectrumView(QtCore.QObject):
         self.view_box = self.spectrum_plot.vb
         self.legend = LegendItem(horSpacing=20, box=False, verSpacing=-3)
         self.phases_legend = LegendItem(horSpacing=20, box=False, verSpacing=-3)
+        self.view_box.sigXRangeChanged.connect(self.update_decimation)
+        self.view_box.sigResized.connect(self.update_decimation)
 
 
     def create_main_plot(self):
@@ -77,7 +84,8 @@ class SpectrumView(QtCore.QObject):
         return self.pos_line.value()
 
     def plot_data(self, x, y, name=None):
-        self.plot_item.setData(x, y)
+        self.plot_item_pyramid = MinMaxPyramid(x, y)
+        self.plot_item.setData(*self.get_decimated_data(self.plot_item_pyramid))
         if name is not None:
             self.legend.legendItems[0][1].setText(name)
             self.plot_name = name
@@ -85,14 +93,15 @@ class SpectrumView(QtCore.QObject):
         self.legend.updateSize()
 
     def update_x_limits(self):
-        x_range = list(self.plot_item.dataBounds(0))
-        for ind, overlay in enumerate(self.overlays):
-            if self.overlay_show[ind]:
-                x_range_overlay = overlay.dataBounds(0)
-                if x_range_overlay[0] < x_range[0]:
-                    x_range[0] = x_range_overlay[0]
-                if x_range_overlay[1] > x_range[1]:
-                    x_range[1] = x_range_overlay[1]
+        if self.plot_item_pyramid is not None:
+            x_ranges = [self.plot_item_pyramid.x_range]
+        else:
+            x_ranges = [self.plot_item.dataBounds(0)]
+        x_ranges.extend([pyramid.x_range for pyramid, show in zip(self.overlay_pyramids, self.overlay_show) if show])
+        if self.overlay_stack_x_range is not None:
+            x_ranges.append(self.overlay_stack_x_range)
+        x_ranges = np.array(x_ranges, dtype=np.float64)
+        x_range = [np.nanmin(x_ranges[:, 0]), np.nanmax(x_ranges[:, 1])]
 
         diff = x_range[1] - x_range[0]
         x_range = [x_range[0] - 0.02 * diff,
@@ -101,10 +110,27 @@ class SpectrumView(QtCore.QObject):
         self.view_box.setLimits(xMin=x_range[0], xMax=x_range[1],
                                 minXRange=x_range[0], maxXRange=x_range[1])
 
+    def get_decimated_data(self, pyramid):
+        """
+        Returns the curve of a MinMaxPyramid reduced to about two points per pixel of the visible x range.
+        """
+        num_pixels = int(self.view_box.width())
+        x_range = self.view_box.viewRange()[0]
+        return pyramid.get_data(x_range[0], x_range[1], num_pixels if num_pixels > 0 else None)
+
+    def update_decimation(self):
+        if self.plot_item_pyramid is not None:
+            self.plot_item.setData(*self.get_decimated_data(self.plot_item_pyramid))
+        for overlay, pyramid, show in zip(self.overlays, self.overlay_pyramids, self.overlay_show):
+            if show:
+                overlay.setData(*self.get_decimated_data(pyramid))
+
     def add_overlay(self, spectrum, show=True):
         x, y = spectrum.data
         color = calculate_color(len(self.overlays) + 1)
-        self.overlays.append(pg.PlotDataItem(x, y, pen=pg.mkPen(color=color, width=1.5)))
+        self.overlay_pyramids.append(MinMaxPyramid(x, y))
+        self.overlays.append(pg.PlotDataItem(*self.get_decimated_data(self.overlay_pyramids[-1]),
+                                             pen=pg.mkPen(color=color, width=1.5)))
         self.overlay_names.append(spectrum.name)
         self.overlay_show.append(True)
         if show:
@@ -116,11 +142,61 @@ class SpectrumView(QtCore.QObject):
     def del_overlay(self, ind):
         self.spectrum_plot.removeItem(self.overlays[ind])
         self.legend.removeItem(self.overlays[ind])
-        self.overlays.remove(self.overlays[ind])
+        del self.overlays[ind]
+        del self.overlay_pyramids[ind]
         self.overlay_names.remove(self.overlay_names[ind])
         self.overlay_show.remove(self.overlay_show[ind])
         self.update_x_limits()
 
+    def clear_overlays(self):
+        for overlay, show in zip(self.overlays, self.overlay_show):
+            if show:
+                self.spectrum_plot.removeItem(overlay)
+        # the first legend item belongs to the spectrum
+        self.legend.removeItems(1)
+        self.overlays = []
+        self.overlay_pyramids = []
+        self.overlay_names = []
+        self.overlay_show = []
+        self.update_x_limits()
+
+    def set_overlay_stack(self, x, y, mode='waterfall'):
+        """
+        Plots a whole overlay series as one item.
+        :param x: x values (npt) or (N, npt), nan values are not drawn
+        :param y: intensities (N, npt)
+        :param mode: 'waterfall' draws all spectra as one curve which is interrupted after every spectrum,
+                     'heat map' shows y as image with the spectrum index as vertical axis, x has to be (npt) and
+                     evenly spaced
+        """
+        self.clear_overlay_stack()
+        if len(y) == 0:
+            return
+        if mode == 'waterfall':
+            if x.ndim == 1:
+                x = np.tile(x, (len(y), 1))
+            connect = np.isfinite(x) & np.isfinite(y)
+            connect[:, :-1] &= connect[:, 1:]
+            connect[:, -1] = False
+            self.overlay_stack_item = pg.PlotCurveItem(np.nan_to_num(x).ravel(), np.nan_to_num(y).ravel(),
+                                                       connect=connect.ravel(),
+                                                       pen=pg.mkPen(color=(150, 150, 255), width=1))
+        else:
+            self.overlay_stack_item = pg.ImageItem(np.nan_to_num(y).T)
+            x_step = (x[-1] - x[0]) / float(max(len(x) - 1, 1))
+            self.overlay_stack_item.setRect(QtCore.QRectF(x[0] - 0.5 * x_step, 0, x_step * len(x), len(y)))
+        self.spectrum_plot.addItem(self.overlay_stack_item)
+        self.overlay_stack_item.setZValue(-1)
+        self.overlay_stack_x_range = (np.nanmin(x), np.nanmax(x))
+        self.update_x_limits()
+
+    def clear_overlay_stack(self):
+        if self.overlay_stack_item is not None:
+            self.spectrum_plot.removeItem(self.overlay_stack_item)
+            self.overlay_stack_item = None
+            self.overlay_stack_x_range = None
+            self.update_x_limits()
+
     def hide_overlay(self, ind):
         self.spectrum_plot.removeItem(self.overlays[ind])
         self.legend.hideItem(ind+1)
@@ -128,6 +204,7 @@ class SpectrumView(QtCore.QObject):
         self.update_x_limits()
 
     def show_overlay(self, ind):
+        self.overlays[ind].setData(*self.get_decimated_data(self.overlay_pyramids[ind]))
         self.spectrum_plot.addItem(self.overlays[ind])
         self.legend.showItem(ind+1)
         self.overlay_show[ind] = True
@@ -135,7 +212,8 @@ class SpectrumView(QtCore.QObject):
 
     def update_overlay(self, spectrum, ind):
         x, y = spectrum.data
-        self.overlays[ind].setData(x, y)
+        self.overlay_pyramids[ind] = MinMaxPyramid(x, y)
+        self.overlays[ind].setData(*self.get_decimated_data(self.overlay_pyramids[ind]))
         if self._auto_range:
             self.view_box.autoRange()
             self.view_box.enableAutoRange()
@@ -232,13 +310,23 @@ class SpectrumView(QtCore.QObject):
         self.view_box.wheelEvent = self.myWheelEvent
 
 
+    def get_data_span(self):
+        """
+        Returns the x and y span of the full spectrum, the plotted curve only contains the decimated visible part.
+        """
+        if self.plot_item_pyramid is not None:
+            x_range = self.plot_item_pyramid.x_range
+            y_range = self.plot_item_pyramid.y_range
+            return x_range[1] - x_range[0], y_range[1] - y_range[0]
+        curve_data = self.plot_item.getData()
+        return np.max(curve_data[0]) - np.min(curve_data[0]), np.max(curve_data[1]) - np.min(curve_data[1])
+
     def myMouseClickEvent(self, ev):
         if ev.button() == QtCore.Qt.RightButton or \
                 (ev.button() == QtCore.Qt.LeftButton and \
                              ev.modifiers() & QtCore.Qt.ControlModifier):
             view_range = np.array(self.view_box.viewRange()) * 2
-            curve_data = self.plot_item.getData()
-            x_range = np.max(curve_data[0]) - np.min(curve_data[0])
+            x_range, y_range = self.get_data_span()
             if (view_range[0][1] - view_range[0][0]) > x_range:
                 self._auto_range = True
                 self.view_box.autoRange()
@@ -298,9 +386,7 @@ class SpectrumView(QtCore.QObject):
             # self.range_changed.emit(axis_range)
         else:
             view_range = np.array(self.view_box.viewRange())
-            curve_data = self.plot_item.getData()
-            x_range = np.max(curve_data[0]) - np.min(curve_data[0])
-            y_range = np.max(curve_data[1]) - np.min(curve_data[1])
+            x_range, y_range = self.get_data_span()
             if (view_range[0][1] - view_range[0][0]) > x_range and \
                             (view_range[1][1] - view_range[1][0]) > y_range:
                 self.view_box.autoRange()
@@ -339,31 +425,28 @@ class PhaseLinesPlot(object):
 
 
 class PhasePlot(object):
+    """
+    Draws all reflection lines of a phase as one item. The lines are segment pairs from the baseline to the intensity,
+    lines outside of the spectrum range are left out by a mask over the positions.
+    """
     num_phases = 0
 
     def __init__(self, plot_item, legend_item, positions, intensities, name=None, baseline=0):
         self.plot_item = plot_item
         self.legend_item = legend_item
-        self.line_items = []
-        self.line_visible = []
         self.index = PhasePlot.num_phases
         self.color = calculate_color(self.index + 9)
         self.pen = pg.mkPen(color=self.color, width=1.3, style=QtCore.Qt.DashLine)
         self.ref_legend_line = pg.PlotDataItem(pen=self.pen)
+        self.line_item = pg.PlotDataItem(pen=self.pen, connect='pairs')
+        self.plot_item.addItem(self.line_item)
+        self.spectrum_range = None
         self.name = ''
         PhasePlot.num_phases += 1
         self.create_items(positions, intensities, name, baseline)
 
     def create_items(self, positions, intensities, name=None, baseline=0):
-        #create new ones on each Position:
-        self.line_items = []
-
-        for ind, position in enumerate(positions):
-            self.line_items.append(pg.PlotDataItem(x=[position, position],
-                                                   y=[baseline, intensities[ind]],
-                                                   pen=self.pen))
-            self.line_visible.append(True)
-            self.plot_item.addItem(self.line_items[ind])
+        self.update_intensities(positions, intensities, baseline)
 
         if name is not None:
             try:
@@ -373,40 +456,38 @@ class PhasePlot(object):
                 pass
 
     def update_intensities(self, positions, intensities, baseline=0):
-        for ind, intensity in enumerate(intensities):
-            self.line_items[ind].setData(y=[baseline, intensity],
-                                         x=[positions[ind], positions[ind]])
+        self.positions = np.asarray(positions, dtype=np.float64)
+        self.intensities = np.asarray(intensities, dtype=np.float64)
+        self.baseline = baseline
+        self.update_line_data()
 
     def update_visibilities(self, spectrum_range):
-        for ind, line_item in enumerate(self.line_items):
-            data = line_item.getData()
-            position = data[0][0]
-            if position >= spectrum_range[0] and position <= spectrum_range[1]:
-                if not self.line_visible[ind]:
-                    self.plot_item.addItem(line_item)
-                    self.line_visible[ind] = True
-            else:
-                if self.line_visible[ind]:
-                    self.plot_item.removeItem(line_item)
-                    self.line_visible[ind] = False
+        self.spectrum_range = spectrum_range
+        self.update_line_data()
+
+    def update_line_data(self):
+        if self.spectrum_range is None:
+            visible = np.ones(len(self.positions), dtype=bool)
+        else:
+            visible = (self.positions >= self.spectrum_range[0]) & (self.positions <= self.spectrum_range[1])
+        x = np.repeat(self.positions[visible], 2)
+        y = np.empty(len(x))
+        y[0::2] = self.baseline
+        y[1::2] = self.intensities[visible]
+        self.line_item.setData(x=x, y=y)
 
     def set_color(self, color):
-        for line_item in self.line_items:
-            line_item.setPen(pg.mkPen(color=color, width=1.3, style=QtCore.Qt.DashLine))
+        self.line_item.setPen(pg.mkPen(color=color, width=1.3, style=QtCore.Qt.DashLine))
 
     def hide(self):
-        for line_item in self.line_items:
-            line_item.hide()
+        self.line_item.hide()
 
     def show(self):
-        for line_item in self.line_items:
-            line_item.show()
-
+        self.line_item.show()
 
     def remove(self):
         try:
             self.legend_item.removeItem(self.ref_legend_line)
         except IndexError:
             print 'this phase had now lines in the appropriate region'
-        for item in self.line_items:
-            self.plot_item.removeItem(item)
\ No newline at end of file
+        self.plot_item.removeItem(self.line_item)
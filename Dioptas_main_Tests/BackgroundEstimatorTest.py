@@ -0,0 +1,55 @@
+__author__ = 'Clemens Prescher'
+
+from Data.BackgroundEstimator import BackgroundEstimator, snip, chebyshev_background, get_chebyshev_basis
+from Data.SpectrumData import Spectrum
+import unittest
+import numpy as np
+
+
+class BackgroundEstimatorTest(unittest.TestCase):
+    def setUp(self):
+        self.x = np.linspace(5, 30, 2000)
+        self.background = 100 + 20 * np.sin(self.x / 10.) + self.x
+        peaks = np.sum([500 * np.exp(-(self.x - center) ** 2 / 0.01) for center in [8, 12, 17, 21, 25]], axis=0)
+        self.y = self.background + peaks
+
+    def test_snip(self):
+        background = snip(self.y, 50)
+        self.assertLess(np.max(np.abs(background - self.background)[100:-100]), 5)
+
+    def test_chebyshev(self):
+        background = chebyshev_background(self.x, self.y, 6, 50)
+        self.assertLess(np.max(np.abs(background - self.background)[100:-100]), 5)
+
+    def test_chebyshev_basis_cache(self):
+        basis, projection = get_chebyshev_basis(self.x, 6)
+        self.assertIs(get_chebyshev_basis(np.copy(self.x), 6)[0], basis)
+        # same length and end points, different spacing
+        uneven_x = 5 + 25 * np.linspace(0, 1, 2000) ** 2
+        uneven_basis, uneven_projection = get_chebyshev_basis(uneven_x, 6)
+        self.assertFalse(np.allclose(uneven_basis, basis))
+        self.assertRaises(ValueError, get_chebyshev_basis, np.ones(100), 6)
+
+    def test_stack_equals_single_spectra(self):
+        stack = np.array([self.y, 2 * self.y, self.y + 50])
+        for method in ['snip', 'chebyshev']:
+            estimator = BackgroundEstimator(method)
+            stack_background = estimator.estimate(self.x, stack)
+            for ind in range(len(stack)):
+                self.assertTrue(np.allclose(stack_background[ind], estimator.estimate(self.x, stack[ind])))
+
+    def test_spectrum_auto_background(self):
+        spectrum = Spectrum(self.x, self.y)
+        estimator = BackgroundEstimator('snip', width=50)
+        spectrum.set_auto_background(estimator)
+        x, y = spectrum.data
+        self.assertTrue(np.allclose(y, self.y - snip(self.y, 50)))
+        self.assertIs(spectrum.get_auto_background(), spectrum.get_auto_background())
+
+        estimator.width = 20
+        x, y = spectrum.data
+        self.assertTrue(np.allclose(y, self.y - snip(self.y, 20)))
+
+        spectrum.reset_auto_background()
+        x, y = spectrum.data
+        self.assertTrue(np.array_equal(y, self.y))
@@ -2,7 +2,7 @@ __author__ = 'Clemens Prescher'
 
 from Data.SpectrumData import Spectrum, SpectrumData
 from Data.ImgData import ImgData
-from Data.CalibrationData import CalibrationData
+from Data.CalibrationData import CalibrationData, refine_peak_positions
 from Data.MaskData import MaskData
 import unittest
 import numpy as np
@@ -34,4 +34,17 @@ class CombinedDataTest(unittest.TestCase):
         plt.figure(3)
         plt.imshow(self.img_data.img_data)
         plt.plot(self.calibration_data.geometry.data[:, 0], self.calibration_data.geometry.data[:, 1], 'g.')
-        plt.savefig('Results/recalib_blob2.jpg')
\ No newline at end of file
+        plt.savefig('Results/recalib_blob2.jpg')
+
+    def test_subpixel_peak_refinement(self):
+        x, y = np.meshgrid(np.arange(100.), np.arange(100.), indexing='ij')
+        peak_positions = np.array([[20.3, 30.7], [50.6, 60.2], [80.1, 10.45]])
+        img = np.ones((100, 100)) * 10
+        for position in peak_positions:
+            img += 1000 * np.exp(-((x - position[0]) ** 2 + (y - position[1]) ** 2) / (2 * 1.2 ** 2))
+
+        centroid_positions = refine_peak_positions(img, np.round(peak_positions), 5, 'centroid')
+        self.assertLess(np.max(np.abs(centroid_positions - peak_positions)), 0.1)
+
+        gaussian_positions = refine_peak_positions(img, np.round(peak_positions), 5, 'gaussian')
+        self.assertLess(np.max(np.abs(gaussian_positions - peak_positions)), 0.01)
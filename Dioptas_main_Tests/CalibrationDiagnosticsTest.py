@@ -0,0 +1,42 @@
+__author__ = 'Clemens Prescher'
+
+from Data.CalibrationDiagnostics import CalibrationDiagnostics, split_by_ring, calculate_statistics, \
+    ring_positions_from_cake
+import unittest
+import numpy as np
+
+
+class CalibrationDiagnosticsTest(unittest.TestCase):
+    def test_residual_statistics(self):
+        ring_ind = np.array([1, 0, 1, 0, 1])
+        chi = np.array([10., 20., -30., 40., 50.])
+        residual = np.array([0.1, -0.2, 0.1, 0.2, 0.1])
+
+        residuals = split_by_ring(ring_ind, chi, residual)
+        self.assertEqual(sorted(residuals.keys()), [0, 1])
+        self.assertTrue(np.array_equal(residuals[1][0], np.array([-30., 10., 50.])))
+
+        statistics = calculate_statistics(residuals)
+        self.assertEqual(statistics['num_points'], 5)
+        self.assertAlmostEqual(statistics['rings'][0]['mean'], 0)
+        self.assertAlmostEqual(statistics['rings'][1]['std'], 0)
+        self.assertAlmostEqual(statistics['max'], 0.2)
+
+    def test_ring_positions_from_cake(self):
+        cake_tth = np.linspace(5, 15, 1001)
+        cake_azi = np.linspace(-180, 180, 36)
+        ring_shift = 0.01 * np.sin(np.deg2rad(cake_azi))
+        cake_img = np.exp(-(cake_tth[None, :] - 10 - ring_shift[:, None]) ** 2 / (2 * 0.01 ** 2))
+
+        cake_residuals = ring_positions_from_cake(cake_img, cake_tth, cake_azi, [10.0])
+        self.assertTrue(np.array_equal(cake_residuals[0][0], cake_azi))
+        self.assertLess(np.max(np.abs(cake_residuals[0][1] - ring_shift)), 1e-3)
+
+    def test_convergence(self):
+        diagnostics = CalibrationDiagnostics()
+        diagnostics.rms_history = [0.1, 0.05]
+        self.assertFalse(diagnostics.has_converged())
+        diagnostics.rms_history.append(0.0499)
+        self.assertFalse(diagnostics.has_converged())
+        diagnostics.rms_history.append(0.04989)
+        self.assertTrue(diagnostics.has_converged())
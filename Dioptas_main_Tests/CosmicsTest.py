@@ -0,0 +1,46 @@
+__author__ = 'Clemens Prescher'
+
+from Data.cosmics import cosmicsimage, lacosmic_tiled, laplacian_plus, subsample, rebin2x2, laplkernel
+from Data.ProcessPool import get_process_pool
+import scipy.signal as signal
+import unittest
+import numpy as np
+
+
+class CosmicsTest(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        x, y = np.meshgrid(np.arange(180), np.arange(200))
+        self.img = np.random.poisson(100, (200, 180)).astype(float)
+        self.img += 2000 * np.exp(-((x - 90) ** 2 + (y - 100) ** 2) / 2000.)
+        cosmic_ind = np.random.randint(0, 180, (50, 2))
+        self.img[cosmic_ind[:, 0], cosmic_ind[:, 1]] += 3000
+        self.img[30:34, 50] += 5000
+
+    def get_serial_mask(self, iterations=2, **kwargs):
+        cosmic = cosmicsimage(self.img, sigclip=3.0, objlim=3.0, verbose=False, **kwargs)
+        for _ in xrange(iterations):
+            cosmic.lacosmiciteration()
+            cosmic.clean()
+        return cosmic.mask
+
+    def test_tiled_lacosmic(self):
+        serial_mask = self.get_serial_mask()
+        tiled_mask = lacosmic_tiled(self.img, iterations=2, tile_size=64, halo=16, processes=2,
+                                    sigclip=3.0, objlim=3.0)
+        self.assertTrue(np.array_equal(serial_mask, tiled_mask))
+
+        # the shared process pool is created once and reused
+        tiled_mask = lacosmic_tiled(self.img, iterations=2, tile_size=64, halo=16, sigclip=3.0, objlim=3.0)
+        self.assertTrue(np.array_equal(serial_mask, tiled_mask))
+        pool = get_process_pool()
+        lacosmic_tiled(self.img, iterations=2, tile_size=64, halo=16, sigclip=3.0, objlim=3.0)
+        self.assertIs(get_process_pool(), pool)
+
+    def test_fast_laplacian(self):
+        data = np.random.random((100, 80)) * 1000
+        legacy_lplus = rebin2x2(signal.convolve2d(subsample(data), laplkernel, mode="same", boundary="symm").clip(0))
+        self.assertTrue(np.allclose(laplacian_plus(data), legacy_lplus, rtol=0, atol=1e-9))
+
+    def test_fast_lacosmic(self):
+        self.assertTrue(np.array_equal(self.get_serial_mask(), self.get_serial_mask(fast=True)))
@@ -0,0 +1,44 @@
+__author__ = 'Clemens Prescher'
+
+from Tools.decimation import MinMaxPyramid
+import unittest
+import numpy as np
+
+
+class DecimationTest(unittest.TestCase):
+    def setUp(self):
+        self.x = np.linspace(0, 50, 100001)
+        self.y = np.sin(self.x) + np.random.normal(0, 0.1, len(self.x))
+        self.y[50000] = 100
+        self.pyramid = MinMaxPyramid(self.x, self.y)
+
+    def test_full_range(self):
+        x, y = self.pyramid.get_data(0, 50, 1000)
+        self.assertLessEqual(len(x), 2 * 1000 + 4)
+        self.assertEqual(np.max(y), 100)
+        self.assertEqual(np.min(y), np.min(self.y))
+        self.assertEqual((x[0], x[-1]), (0, 50))
+        self.assertTrue(np.all(np.diff(x) >= 0))
+        self.assertEqual(self.pyramid.y_range, (np.min(self.y), 100))
+
+    def test_zoomed_range(self):
+        x, y = self.pyramid.get_data(20, 21, 1000)
+        visible = (x >= 20) & (x <= 21)
+        self.assertLessEqual(np.sum(visible), 2 * 1000 + 4)
+        self.assertEqual((x[0], x[-1]), (0, 50))
+        original_visible = (self.x >= 20) & (self.x <= 21)
+        self.assertGreaterEqual(np.max(y[visible]), np.max(self.y[original_visible]))
+
+        # fully zoomed in the original points are returned
+        x, y = self.pyramid.get_data(20, 20.01, 1000)
+        original_visible = (self.x >= 20) & (self.x <= 20.01)
+        self.assertTrue(np.array_equal(y[(x >= 20) & (x <= 20.01)], self.y[original_visible]))
+
+    def test_small_and_descending_curves(self):
+        x, y = MinMaxPyramid([1, 2, 3], [3, 4, 5]).get_data(0, 10, 1000)
+        self.assertTrue(np.array_equal(y, [3, 4, 5]))
+
+        pyramid = MinMaxPyramid(self.x[::-1], self.y[::-1])
+        x, y = pyramid.get_data(0, 50, 1000)
+        self.assertEqual(np.max(y), 100)
+        self.assertEqual(pyramid.x_range, (0, 50))
@@ -0,0 +1,83 @@
+__author__ = 'Clemens Prescher'
+
+from Data.DetectorStatistics import PixelStatistics, calculate_image_series_statistics, calculate_detector_masks, \
+    get_image_file_list
+import unittest
+import numpy as np
+import tempfile
+import shutil
+import os
+
+
+class DetectorStatisticsTest(unittest.TestCase):
+    def setUp(self):
+        self.frames = np.random.poisson(100, (7, 60, 50)).astype(np.float64)
+
+    def test_welford_update(self):
+        statistics = PixelStatistics()
+        for frame in self.frames:
+            statistics.add_frame(frame)
+        self.assertEqual(statistics.count, 7)
+        self.assertTrue(np.allclose(statistics.mean, np.mean(self.frames, axis=0)))
+        self.assertTrue(np.allclose(statistics.variance, np.var(self.frames, axis=0, ddof=1)))
+        self.assertTrue(np.array_equal(statistics.min, np.min(self.frames, axis=0)))
+        self.assertTrue(np.array_equal(statistics.max, np.max(self.frames, axis=0)))
+
+    def test_merge(self):
+        statistics = PixelStatistics()
+        for frame in self.frames[:3]:
+            statistics.add_frame(frame)
+        other_statistics = PixelStatistics()
+        for frame in self.frames[3:]:
+            other_statistics.add_frame(frame)
+        statistics.merge(other_statistics)
+        self.assertEqual(statistics.count, 7)
+        self.assertTrue(np.allclose(statistics.mean, np.mean(self.frames, axis=0)))
+        self.assertTrue(np.allclose(statistics.variance, np.var(self.frames, axis=0, ddof=1)))
+
+    def test_image_series_masks(self):
+        self.frames[:, 10, 20] = 0
+        self.frames[:, 30, 5] += 5000
+        self.frames[:, :, 25] = -1
+
+        directory = tempfile.mkdtemp()
+        try:
+            for ind, frame in enumerate(self.frames):
+                np.save(os.path.join(directory, 'frame_%03d.npy' % ind), frame)
+            filenames = get_image_file_list(directory, extensions=('.npy',))
+            self.assertEqual(len(filenames), 7)
+            statistics = calculate_image_series_statistics(filenames, processes=2, read_function=np.load)
+        finally:
+            shutil.rmtree(directory)
+
+        self.assertTrue(np.allclose(statistics.mean, np.mean(self.frames, axis=0)))
+        masks = calculate_detector_masks(statistics)
+        self.assertTrue(masks['dead'][10, 20])
+        self.assertEqual(np.sum(masks['dead']), 1)
+        self.assertTrue(masks['hot'][30, 5])
+        self.assertTrue(np.all(masks['gaps'][:, 25]))
+        self.assertEqual(np.sum(masks['gaps']), 60)
+
+    def test_identical_frames(self):
+        statistics = PixelStatistics()
+        for _ in range(5):
+            statistics.add_frame(self.frames[0])
+        masks = calculate_detector_masks(statistics)
+        self.assertEqual(np.sum(masks['gaps']), 0)
+        self.assertEqual(np.sum(masks['dead']), 0)
+
+    def test_progress_callback(self):
+        progress = []
+        filenames = ['frame_%03d' % ind for ind in range(7)]
+        statistics = calculate_image_series_statistics(filenames, processes=1, read_function=self.read_test_frame,
+                                                       callback=lambda done, total: progress.append((done, total)),
+                                                       chunk_size=3)
+        self.assertEqual(statistics.count, 7)
+        self.assertEqual(progress, [(3, 7), (6, 7), (7, 7)])
+
+        statistics = calculate_image_series_statistics(filenames, processes=1, read_function=self.read_test_frame,
+                                                       callback=lambda done, total: False, chunk_size=3)
+        self.assertIsNone(statistics)
+
+    def read_test_frame(self, filename):
+        return self.frames[int(filename.split('_')[1])]
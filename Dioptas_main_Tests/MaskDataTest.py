@@ -0,0 +1,212 @@
+__author__ = 'Clemens Prescher'
+
+from Data.MaskData import MaskData, read_mask_file, convert_mask_orientation
+import unittest
+import numpy as np
+import os
+
+
+class MaskDataTest(unittest.TestCase):
+    def setUp(self):
+        self.mask_data = MaskData((500, 400))
+
+    def test_undo_redo(self):
+        img_data = np.random.random((500, 400))
+        states = [np.copy(self.mask_data.get_mask())]
+
+        self.mask_data.mask_rect(10, 20, 100, 50)
+        states.append(np.copy(self.mask_data.get_mask()))
+        self.mask_data.mask_above_threshold(img_data, 0.9)
+        states.append(np.copy(self.mask_data.get_mask()))
+        self.mask_data.mask_polygon(np.array([0, 100, 150, 100, 0]), np.array([0, 0, 50, 100, 100]))
+        states.append(np.copy(self.mask_data.get_mask()))
+        self.mask_data.set_mode(False)
+        self.mask_data.mask_ellipse(200, 250, 40, 20)
+        states.append(np.copy(self.mask_data.get_mask()))
+        self.mask_data.invert_mask()
+        states.append(np.copy(self.mask_data.get_mask()))
+
+        for ind in range(len(states) - 1, 0, -1):
+            self.mask_data.undo()
+            self.assertTrue(np.array_equal(self.mask_data.get_mask(), states[ind - 1]))
+        for ind in range(1, len(states)):
+            self.mask_data.redo()
+            self.assertTrue(np.array_equal(self.mask_data.get_mask(), states[ind]))
+
+    def test_undo_of_set_mask_with_different_shape(self):
+        self.mask_data.mask_rect(10, 20, 100, 50)
+        old_mask = np.copy(self.mask_data.get_mask())
+        self.mask_data.set_mask(np.ones((100, 100), dtype=bool))
+        self.mask_data.undo()
+        self.assertTrue(np.array_equal(self.mask_data.get_mask(), old_mask))
+        self.mask_data.redo()
+        self.assertEqual(self.mask_data.get_mask().shape, (100, 100))
+
+    def test_save_and_load_mask_file(self):
+        self.mask_data.mask_rect(10, 20, 100, 50)
+        self.mask_data.mask_ellipse(200, 250, 40, 20)
+        for compress in [True, False]:
+            self.mask_data.save_mask('Data/test_binary.mask', ['fliplr'], compress)
+            mask, transformations = read_mask_file('Data/test_binary.mask')
+            self.assertTrue(np.array_equal(mask, self.mask_data.get_mask()))
+            self.assertEqual(transformations, ['fliplr'])
+            del mask
+        os.remove('Data/test_binary.mask')
+
+    def test_load_legacy_mask_file(self):
+        self.mask_data.mask_rect(10, 20, 100, 50)
+        np.savetxt('Data/test_legacy.mask', self.mask_data.get_mask(), fmt='%d')
+        mask, transformations = read_mask_file('Data/test_legacy.mask')
+        self.assertTrue(np.array_equal(mask, self.mask_data.get_mask()))
+        self.assertEqual(transformations, [])
+        os.remove('Data/test_legacy.mask')
+
+    def test_convert_mask_orientation(self):
+        mask = np.random.random((30, 20)) > 0.5
+        rotated_mask = np.rot90(np.fliplr(mask))
+        self.assertTrue(np.array_equal(
+            convert_mask_orientation(rotated_mask, ['fliplr', 'rotate_matrix_p90'], []), mask))
+        self.assertTrue(np.array_equal(
+            convert_mask_orientation(mask, [], [np.fliplr]), np.fliplr(mask)))
+
+    def test_geometric_masks(self):
+        y, x = np.mgrid[:500, :400]
+        tth_array = np.arctan(np.hypot(x - 200, y - 250) * 1e-4 / 0.1)
+        chi_array = np.arctan2(y - 250, x - 200)
+        tth_deg = np.rad2deg(tth_array)
+        chi_deg = np.rad2deg(chi_array)
+
+        self.mask_data.set_geometry(tth_array, chi_array, 0.4e-10)
+        self.mask_data.mask_tth_range(3, 3.5)
+        self.mask_data.mask_tth_range(1, 1.5, 170, -170)
+        expected_mask = ((tth_deg >= 3) & (tth_deg <= 3.5)) | \
+                        ((tth_deg >= 1) & (tth_deg <= 1.5) & ((chi_deg >= 170) | (chi_deg <= -170)))
+        self.assertTrue(np.array_equal(self.mask_data.get_mask(), expected_mask))
+
+        # recalibration re-rasterizes the stored ranges
+        self.mask_data.set_geometry(tth_array * 1.1, chi_array, 0.4e-10)
+        tth_deg = np.rad2deg(tth_array * 1.1)
+        expected_mask = ((tth_deg >= 3) & (tth_deg <= 3.5)) | \
+                        ((tth_deg >= 1) & (tth_deg <= 1.5) & ((chi_deg >= 170) | (chi_deg <= -170)))
+        self.assertTrue(np.array_equal(self.mask_data.get_mask(), expected_mask))
+
+        self.mask_data.clear_geometric_masks()
+        self.assertEqual(np.sum(self.mask_data.get_mask()), 0)
+
+    def test_toggle_ranges_layer_with_named_layer(self):
+        y, x = np.mgrid[:500, :400]
+        tth_array = np.arctan(np.hypot(x - 200, y - 250) * 1e-4 / 0.1)
+        self.mask_data.set_geometry(tth_array, np.arctan2(y - 250, x - 200), 0.4e-10)
+        self.mask_data.mask_tth_range(3, 3.5)
+        ranges_mask = np.copy(self.mask_data.get_layer('2theta/Q ranges'))
+        gap_mask = np.zeros((500, 400), dtype=bool)
+        gap_mask[:, 195:205] = True
+        self.mask_data.set_layer('gaps', gap_mask)
+        self.assertTrue(np.array_equal(self.mask_data.get_mask(), ranges_mask | gap_mask))
+
+        self.mask_data.set_layer_visibility('2theta/Q ranges', False)
+        self.assertTrue(np.array_equal(self.mask_data.get_mask(), gap_mask))
+        self.mask_data.set_layer_visibility('2theta/Q ranges', True)
+        self.assertTrue(np.array_equal(self.mask_data.get_mask(), ranges_mask | gap_mask))
+
+    def test_mask_layers(self):
+        img_data = np.random.random((500, 400))
+        self.mask_data.mask_rect(10, 20, 100, 50)
+        self.mask_data.mask_above_threshold(img_data, 0.9)
+        drawing = np.copy(self.mask_data.get_mask())
+        self.assertIs(self.mask_data.get_mask(), self.mask_data.get_layer('drawing'))
+
+        gap_mask = np.zeros((500, 400), dtype=bool)
+        gap_mask[:, 195:205] = True
+        self.mask_data.set_layer('gaps', gap_mask)
+        self.assertEqual(self.mask_data.get_layer_names(), ['drawing', 'gaps'])
+        composite = self.mask_data.get_mask()
+        self.assertTrue(np.array_equal(composite, drawing | gap_mask))
+        self.assertIs(self.mask_data.get_mask(), composite)
+
+        self.mask_data.set_layer_visibility('drawing', False)
+        self.assertTrue(np.array_equal(self.mask_data.get_mask(), gap_mask))
+        self.mask_data.set_layer_visibility('drawing', True)
+
+        self.mask_data.clear_mask()
+        self.assertTrue(np.array_equal(self.mask_data.get_mask(), gap_mask))
+        self.mask_data.undo()
+        self.assertTrue(np.array_equal(self.mask_data.get_mask(), drawing | gap_mask))
+
+        self.mask_data.undo()
+        self.assertEqual(self.mask_data.get_layer_names(), ['drawing'])
+
+    def test_threshold_and_cosmics_can_be_edited(self):
+        img_data = np.zeros((500, 400))
+        img_data[100:120, 100:120] = 10
+        self.mask_data.mask_above_threshold(img_data, 5)
+        self.assertEqual(np.sum(self.mask_data.get_mask()), 400)
+
+        self.mask_data.invert_mask()
+        self.assertEqual(np.sum(self.mask_data.get_mask()), 500 * 400 - 400)
+        self.mask_data.undo()
+
+        self.mask_data.set_mode(False)
+        self.mask_data.mask_rect(0, 0, 400, 500)
+        self.assertEqual(np.sum(self.mask_data.get_mask()), 0)
+        self.mask_data.undo()
+
+        self.mask_data.set_mask(np.zeros((500, 400), dtype=bool))
+        self.assertEqual(np.sum(self.mask_data.get_mask()), 0)
+        self.mask_data.undo()
+
+        MaskData((500, 400)).save_mask('Data/test_empty.mask')
+        self.mask_data.load_mask('Data/test_empty.mask')
+        os.remove('Data/test_empty.mask')
+        self.assertEqual(np.sum(self.mask_data.get_mask()), 0)
+
+    def test_integration_roi(self):
+        self.mask_data.mask_rect(0, 0, 10, 10)
+        self.assertIs(self.mask_data.get_integration_mask(), self.mask_data.get_mask())
+        self.assertIsNone(self.mask_data.get_integration_mask(use_mask=False))
+
+        self.mask_data.set_roi((100, 300, 50, 250))
+        roi_mask = np.ones((500, 400), dtype=bool)
+        roi_mask[100:300, 50:250] = False
+        self.assertTrue(np.array_equal(self.mask_data.get_integration_mask(use_mask=False), roi_mask))
+        integration_mask = self.mask_data.get_integration_mask()
+        self.assertTrue(np.array_equal(integration_mask, roi_mask | self.mask_data.get_mask()))
+        self.assertIs(self.mask_data.get_integration_mask(), integration_mask)
+        # the roi is not part of the mask itself
+        self.assertEqual(np.sum(self.mask_data.get_mask()), 100)
+
+        self.mask_data.mask_rect(150, 150, 10, 10)
+        self.assertTrue(self.mask_data.get_integration_mask()[155, 155])
+        self.mask_data.set_roi(None)
+        self.assertIs(self.mask_data.get_integration_mask(), self.mask_data.get_mask())
+
+    def test_detector_masks(self):
+        detector_masks = {'dead': np.zeros((500, 400), dtype=bool),
+                          'hot': np.zeros((500, 400), dtype=bool),
+                          'gaps': np.zeros((500, 400), dtype=bool)}
+        detector_masks['dead'][10, 10] = True
+        detector_masks['hot'][20, 30] = True
+        detector_masks['gaps'][:, 200:210] = True
+        self.mask_data.set_detector_masks(detector_masks)
+        self.assertEqual(self.mask_data.get_layer_names(), ['drawing', 'dead pixels', 'hot pixels', 'detector gaps'])
+        self.assertEqual(np.sum(self.mask_data.get_mask()), 2 + 500 * 10)
+
+        self.mask_data.undo()
+        self.assertEqual(self.mask_data.get_layer_names(), ['drawing'])
+        self.assertFalse(np.any(self.mask_data.get_mask()))
+
+    def test_mask_follows_image_transformations(self):
+        self.mask_data.mask_rect(10, 20, 100, 50)
+        self.mask_data.set_layer('gaps', np.eye(500, 400, dtype=bool))
+        mask = np.copy(self.mask_data.get_mask())
+
+        self.mask_data.set_dimension((400, 500), ['rotate_matrix_p90'])
+        self.assertTrue(np.array_equal(self.mask_data.get_mask(), np.rot90(mask)))
+        self.mask_data.set_transformations(['rotate_matrix_p90', 'fliplr'])
+        self.assertTrue(np.array_equal(self.mask_data.get_mask(), np.fliplr(np.rot90(mask))))
+
+        self.mask_data.mask_rect(0, 0, 10, 10)
+        self.mask_data.set_transformations([])
+        mask[-10:, -10:] = True
+        self.assertTrue(np.array_equal(self.mask_data.get_mask(), mask))
+        self.assertTrue(np.array_equal(self.mask_data.get_layer('gaps'), np.eye(500, 400, dtype=bool)))
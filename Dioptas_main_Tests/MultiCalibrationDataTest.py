@@ -0,0 +1,55 @@
+__author__ = 'Clemens Prescher'
+
+from Data.MultiCalibrationData import calculate_tth, refine_joint_geometry
+import unittest
+import numpy as np
+
+
+class MultiCalibrationDataTest(unittest.TestCase):
+    def setUp(self):
+        self.d_spacings = np.array([4.157, 2.939, 2.400, 2.078, 1.859, 1.697, 1.469, 1.385])
+        self.wavelength = 0.31e-10
+        self.pixel_size = 79e-6
+        self.distances = [0.2, 0.3, 0.4]
+
+    def create_ring_points(self, dist, tolerance=5e-5):
+        d1, d2 = np.meshgrid(np.arange(0, 2048, 3.), np.arange(0, 2048, 3.))
+        tth = calculate_tth(d1, d2, dist, 0.08, 0.081, 0.01, -0.02, 0.0, self.pixel_size, self.pixel_size)
+        points = []
+        for ring_ind, d in enumerate(self.d_spacings):
+            ring_tth = 2 * np.arcsin(self.wavelength * 1e10 / (2 * d))
+            ring_mask = np.abs(tth - ring_tth) < tolerance
+            points.append(np.column_stack((d1[ring_mask], d2[ring_mask], np.ones(np.sum(ring_mask)) * ring_ind)))
+        return np.vstack(points)
+
+    def test_joint_refinement(self):
+        points_list = [self.create_ring_points(dist) for dist in self.distances]
+        start_parameter = {'wavelength': 0.305e-10,
+                           'rot1': 0, 'rot2': 0, 'rot3': 0,
+                           'dist': [0.21, 0.29, 0.41],
+                           'poni1': [0.079] * 3,
+                           'poni2': [0.082] * 3}
+
+        result, residuals = refine_joint_geometry(points_list, self.d_spacings, start_parameter,
+                                                  self.pixel_size, self.pixel_size)
+
+        self.assertAlmostEqual(result['wavelength'] / self.wavelength, 1, places=2)
+        self.assertAlmostEqual(result['rot1'], 0.01, places=3)
+        self.assertAlmostEqual(result['rot2'], -0.02, places=3)
+        for refined_dist, dist in zip(result['dist'], self.distances):
+            self.assertAlmostEqual(refined_dist / dist, 1, places=2)
+        self.assertLess(np.max(np.abs(residuals)), 1e-4)
+
+    def test_fixed_wavelength(self):
+        points_list = [self.create_ring_points(dist) for dist in self.distances]
+        start_parameter = {'wavelength': self.wavelength,
+                           'rot1': 0, 'rot2': 0, 'rot3': 0,
+                           'dist': [0.21, 0.29, 0.41],
+                           'poni1': [0.079] * 3,
+                           'poni2': [0.082] * 3}
+
+        result, _ = refine_joint_geometry(points_list, self.d_spacings, start_parameter,
+                                          self.pixel_size, self.pixel_size, fit_wavelength=False)
+        self.assertEqual(result['wavelength'], self.wavelength)
+        for refined_dist, dist in zip(result['dist'], self.distances):
+            self.assertAlmostEqual(refined_dist / dist, 1, places=3)
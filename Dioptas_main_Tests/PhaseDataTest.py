@@ -0,0 +1,98 @@
+__author__ = 'Clemens Prescher'
+
+from Data.PhaseData import PhaseData, convert_d_spacings, convert_positions_to_d
+from Data.SpectrumData import Spectrum
+from Data.jcpds import jcpds, create_reflections
+import unittest
+import numpy as np
+
+
+class PhaseDataTest(unittest.TestCase):
+    def setUp(self):
+        self.phase_data = PhaseData()
+        for a in np.linspace(3.5, 5.5, 25):
+            self.add_cubic_phase(a)
+        x = np.linspace(2, 30, 3000)
+        self.spectrum = Spectrum(x, 100 * np.exp(-(x - 12) ** 2) + 10)
+
+    def add_cubic_phase(self, a):
+        phase = jcpds()
+        phase.symmetry = 'CUBIC'
+        phase.a0 = a
+        phase.compute_v0()
+        phase.alpha, phase.beta, phase.gamma = phase.alpha0, phase.beta0, phase.gamma0
+        phase.reflections = create_reflections([(1, 1, 1, 0., 0., 100.), (2, 0, 0, 0., 0., 40.),
+                                                (2, 2, 0, 0., 0., 25.), (3, 1, 1, 0., 0., 30.)])
+        phase.compute_d()
+        self.phase_data.phases.append(phase)
+        self.phase_data.reflections.append([])
+        self.phase_data.get_lines_d(len(self.phase_data.phases) - 1)
+
+    def test_rescale_reflections_all(self):
+        for unit, x_range in (('tth', (8, 14)), ('q', (2.5, 4)), ('d', (1.5, 2.5))):
+            positions, intensities, baseline = self.phase_data.rescale_reflections_all(
+                self.spectrum, x_range, (0, 120), 0.31, unit)
+            self.assertEqual(len(positions), 25)
+            for ind in range(25):
+                phase_positions, phase_intensities, phase_baseline = self.phase_data.rescale_reflections(
+                    ind, self.spectrum, x_range, (0, 120), 0.31, unit)
+                self.assertTrue(np.allclose(positions[ind], phase_positions))
+                self.assertTrue(np.allclose(intensities[ind], phase_intensities))
+                self.assertEqual(baseline, phase_baseline)
+
+    def test_rescale_reflections_all_without_phases(self):
+        positions, intensities, baseline = PhaseData().rescale_reflections_all(self.spectrum, (8, 14), (0, 120), 0.31)
+        self.assertEqual((positions, intensities), ([], []))
+
+    def create_pattern(self, phase, pressure, temperature=298., wavelength=0.31):
+        np.random.seed(int(pressure * 100))
+        x = np.linspace(5, 25, 4000)
+        y = np.ones(len(x)) * 20 + np.random.normal(0, 0.5, len(x))
+        positions = convert_d_spacings(phase.get_d_spacings(pressure, temperature), wavelength)
+        for position, intensity in zip(positions, phase.get_reflections().intensity):
+            y += intensity * np.exp(-0.5 * (x - position) ** 2 / 0.02 ** 2)
+        return x, y
+
+    def test_fit_pressure(self):
+        phase = self.phase_data.phases[10]
+        phase.k0 = 166.65
+        phase.k0p0 = 5.48
+        x, y = self.create_pattern(phase, 12.3)
+        value, error, num_peaks = self.phase_data.fit_pressure(10, x, y, 0.31)
+        self.assertAlmostEqual(value, 12.3, delta=0.1)
+        self.assertEqual(num_peaks, 4)
+        self.assertAlmostEqual(phase.pressure, value)
+        self.assertAlmostEqual(self.phase_data.reflections[10][0, 0], phase.get_d_spacings(12.3)[0], places=3)
+
+        # patterns in d-spacing are descending
+        d = convert_positions_to_d(x, 0.31)
+        value, error, num_peaks = self.phase_data.fit_pressure(10, d, y, 0.31, 'd')
+        self.assertAlmostEqual(value, 12.3, delta=0.1)
+
+    def test_fit_temperature(self):
+        phase = self.phase_data.phases[10]
+        phase.k0 = 166.65
+        phase.k0p0 = 5.48
+        phase.alpha_t0 = 4e-5
+        phase.compute_d(pressure=10)
+        x, y = self.create_pattern(phase, 10, 1500)
+        value, error, num_peaks = self.phase_data.fit_pressure(10, x, y, 0.31, fit_temperature=True)
+        self.assertAlmostEqual(value, 1500, delta=50)
+        self.assertAlmostEqual(phase.pressure, 10)
+
+    def test_fit_pressure_series(self):
+        phase = self.phase_data.phases[10]
+        phase.k0 = 166.65
+        phase.k0p0 = 5.48
+        pressures = np.linspace(0, 40, 41)
+        intensities = np.array([self.create_pattern(phase, pressure)[1] for pressure in pressures])
+        x = self.create_pattern(phase, 0)[0]
+        fitted_pressures, errors = self.phase_data.fit_pressure_series(10, x, intensities, 0.31)
+        self.assertTrue(np.allclose(fitted_pressures, pressures, atol=0.2))
+        self.assertEqual(phase.pressure, 0)
+
+        # frames without any finite value (outside of the x range of a series) are not fitted
+        intensities[1] = np.nan
+        fitted_pressures, errors = self.phase_data.fit_pressure_series(10, x, intensities[:3], 0.31)
+        self.assertTrue(np.isnan(fitted_pressures[1]))
+        self.assertAlmostEqual(fitted_pressures[2], 2, delta=0.2)
@@ -0,0 +1,75 @@
+__author__ = 'Clemens Prescher'
+
+from Data.PhaseLibrary import PhaseLibrary
+from Data.jcpds import jcpds
+import unittest
+import numpy as np
+import tempfile
+import shutil
+import os
+
+REFLECTIONS = ((1, 1, 1, 100.), (2, 0, 0, 50.), (2, 2, 0, 30.), (3, 1, 1, 30.), (2, 2, 2, 10.))
+
+
+class PhaseLibraryTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.directory, 'sub'))
+        self.lattice_parameters = np.linspace(3.5, 5.5, 201)
+        for ind, a in enumerate(self.lattice_parameters):
+            self.write_cubic_phase(os.path.join(self.directory, 'sub' if ind % 2 else '', 'phase_%03d.jcpds' % ind), a)
+        self.library = PhaseLibrary()
+        self.library.add_directory(self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_cubic_phase(self, filename, a, k0=160.):
+        fp = open(filename, 'w')
+        fp.write('VERSION: 4\nK0: %f\nK0P: 5.0\nSYMMETRY: CUBIC\nA: %f\n' % (k0, a))
+        for h, k, l, intensity in REFLECTIONS:
+            fp.write('DIHKL: %f %f %d %d %d\n' % (a / np.sqrt(h * h + k * k + l * l), intensity, h, k, l))
+        fp.close()
+
+    def get_d_spacings(self, a, pressure=0):
+        phase = jcpds()
+        phase.read_file(os.path.join(self.directory, 'phase_000.jcpds'))
+        phase.a0 = a
+        phase.compute_v0()
+        return phase.compute_d(pressure=pressure).d
+
+    def test_scan(self):
+        self.assertEqual(len(self.library), 201)
+        self.assertEqual(len(self.library.d_spacings), 201 * 5)
+        self.assertTrue(np.all(np.diff(self.library.d_spacings[self.library._sort_order]) >= 0))
+
+        # unchanged files are not parsed again
+        phases = list(self.library.phases)
+        self.library.rescan()
+        self.assertTrue(all(a is b for a, b in zip(phases, self.library.phases)))
+
+        filename = os.path.join(self.directory, 'phase_000.jcpds')
+        self.write_cubic_phase(filename, 6.)
+        os.utime(filename, (0, 0))
+        os.remove(os.path.join(self.directory, 'sub', 'phase_001.jcpds'))
+        self.library.rescan()
+        self.assertEqual(len(self.library), 200)
+        self.assertAlmostEqual(self.library.phases[self.library.filenames.index(filename)].a0, 6.)
+
+    def test_search(self):
+        d_spacings = self.get_d_spacings(self.lattice_parameters[50])[:4]
+        results = self.library.search(d_spacings, tolerance=0.002)
+        self.assertEqual(os.path.basename(results[0][0]), 'phase_050.jcpds')
+        self.assertAlmostEqual(results[0][1], 1)
+        self.assertLess(results[1][1], 1)
+
+    def test_search_with_pressure(self):
+        d_spacings = self.get_d_spacings(self.lattice_parameters[120], 20)
+        # without compression a phase with a smaller lattice parameter fits best
+        self.assertLess(os.path.basename(self.library.search(d_spacings, tolerance=0.002)[0][0]), 'phase_120.jcpds')
+
+        results = self.library.search(d_spacings, tolerance=0.002, pressures=np.arange(0, 40, 0.5))
+        best_results = [result for result in results if result[1] == results[0][1]]
+        self.assertIn('phase_120.jcpds', [os.path.basename(result[0]) for result in best_results])
+        pressure = [result[2] for result in results if os.path.basename(result[0]) == 'phase_120.jcpds'][0]
+        self.assertAlmostEqual(pressure, 20, delta=1)
@@ -0,0 +1,67 @@
+__author__ = 'Clemens Prescher'
+
+from Tools import rasterizer
+import unittest
+import numpy as np
+
+
+class RasterizerTest(unittest.TestCase):
+    def setUp(self):
+        self.shape = (120, 100)
+        self.rows, self.cols = np.indices(self.shape)
+
+    def point_in_polygon(self, rows, cols):
+        inside = np.zeros(self.shape, dtype=bool)
+        j = len(rows) - 1
+        for i in range(len(rows)):
+            crossing = (rows[i] > self.rows) != (rows[j] > self.rows)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                x = (cols[j] - cols[i]) * (self.rows - rows[i]) / float(rows[j] - rows[i]) + cols[i]
+            inside ^= crossing & (self.cols < x)
+            j = i
+        return inside
+
+    def test_polygon(self):
+        rows = np.array([10.3, 80.7, 60.2, 110.5, 20.0])
+        cols = np.array([5.5, 10.2, 50.0, 90.1, 70.4])
+        mask = np.zeros(self.shape, dtype=bool)
+        rasterizer.fill_polygon(mask, rows, cols)
+        self.assertTrue(np.array_equal(mask, self.point_in_polygon(rows, cols)))
+
+    def test_polygon_outside_of_mask(self):
+        mask = np.zeros(self.shape, dtype=bool)
+        rasterizer.fill_polygon(mask, np.array([-20, 50, 200]), np.array([-30, 150, 20]))
+        self.assertTrue(np.array_equal(mask, self.point_in_polygon([-20, 50, 200], [-30, 150, 20])))
+
+    def test_ellipse(self):
+        mask = np.zeros(self.shape, dtype=bool)
+        rasterizer.fill_ellipse(mask, 50.5, 40, 20, 30.3)
+        expected = ((self.rows - 50.5) / 20.) ** 2 + ((self.cols - 40) / 30.3) ** 2 < 1
+        self.assertTrue(np.array_equal(mask, expected))
+
+    def test_annulus(self):
+        mask = np.ones(self.shape, dtype=bool)
+        rasterizer.fill_annulus(mask, 60, 50, 10, 30, False)
+        distance = np.sqrt((self.rows - 60.) ** 2 + (self.cols - 50.) ** 2)
+        self.assertTrue(np.array_equal(mask, (distance < 10) | (distance >= 30)))
+
+    def test_stroke(self):
+        mask = np.zeros(self.shape, dtype=bool)
+        rasterizer.fill_stroke(mask, [10, 100], [20, 80], 5)
+        # distance of each pixel to the line segment
+        direction = np.array([90., 60.]) / np.sqrt(90. ** 2 + 60. ** 2)
+        t = np.clip((self.rows - 10) * direction[0] + (self.cols - 20) * direction[1], 0, np.sqrt(90. ** 2 + 60. ** 2))
+        distance = np.sqrt((self.rows - 10 - t * direction[0]) ** 2 + (self.cols - 20 - t * direction[1]) ** 2)
+        self.assertTrue(np.all(mask[distance < 4.9]))
+        self.assertFalse(np.any(mask[distance >= 5]))
+
+    def test_regions_contain_shapes(self):
+        mask = np.zeros(self.shape, dtype=bool)
+        rasterizer.fill_ellipse(mask, 30, 40, 12.5, 7.2)
+        region = rasterizer.get_ellipse_region(30, 40, 12.5, 7.2, self.shape)
+        self.assertEqual(np.sum(mask), np.sum(mask[region]))
+
+        mask[:] = False
+        rasterizer.fill_stroke(mask, [5, 50, 90], [90, 10, 50], 8)
+        region = rasterizer.get_stroke_region([5, 50, 90], [90, 10, 50], 8, self.shape)
+        self.assertEqual(np.sum(mask), np.sum(mask[region]))
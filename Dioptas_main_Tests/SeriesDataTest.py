@@ -0,0 +1,76 @@
+__author__ = 'Clemens Prescher'
+
+from Data.SeriesData import SeriesData, downsample_image
+import unittest
+import numpy as np
+
+
+class SeriesDataTest(unittest.TestCase):
+    def setUp(self):
+        self.series_data = SeriesData()
+        self.x = np.linspace(1, 30, 500)
+
+    def test_add_frames(self):
+        for ind in range(300):
+            self.series_data.add_frame('image_%03d.tif' % ind, self.x, np.ones(500) * ind)
+        self.assertEqual(len(self.series_data), 300)
+        self.assertEqual(self.series_data.intensities.shape, (300, 500))
+        self.assertEqual(self.series_data.get_frame_index('image_123.tif'), 123)
+        self.assertTrue(np.array_equal(self.series_data.get_trace(10), np.arange(300)))
+
+        # known files replace their frame
+        self.series_data.add_frame('image_123.tif', self.x, np.ones(500) * -1)
+        self.assertEqual(len(self.series_data), 300)
+        self.assertEqual(self.series_data.intensities[123, 0], -1)
+
+    def test_different_x_and_unit(self):
+        self.series_data.add_frame('image_000.tif', self.x, np.ones(500))
+        self.series_data.add_frame('image_001.tif', np.linspace(10, 40, 300), np.ones(300) * 2)
+        self.assertEqual(len(self.series_data), 2)
+        self.assertTrue(np.all(np.isnan(self.series_data.intensities[1][self.x < 10])))
+        self.assertTrue(np.all(self.series_data.intensities[1][self.x >= 10] == 2))
+
+        # frames in another unit are converted into the unit of the series, without wavelength they are ignored
+        self.assertEqual(self.series_data.add_frame('image_002.tif', np.linspace(0, 5, 100), np.ones(100),
+                                                    'q_A^-1'), -1)
+        self.assertEqual(len(self.series_data), 2)
+        q = 4 * np.pi / 0.31 * np.sin(np.radians(self.x) / 2)
+        self.series_data.add_frame('image_000.tif', q, np.sin(self.x), 'q_A^-1', 0.31e-10)
+        self.assertEqual(len(self.series_data), 2)
+        self.assertEqual(self.series_data.unit, '2th_deg')
+        self.assertTrue(np.allclose(self.series_data.intensities[0][1:-1], np.sin(self.x[1:-1]), atol=1e-4))
+
+    def test_get_image(self):
+        for ind in range(5000):
+            self.series_data.add_frame('image_%04d.tif' % ind, self.x, np.ones(500) * ind)
+        image, frame_step, bin_step = self.series_data.get_image(1000, 200)
+        self.assertEqual((frame_step, bin_step), (5, 3))
+        self.assertEqual(image.shape, (1000, 167))
+        self.assertAlmostEqual(image[1, 0], 7)
+
+        image, frame_step, bin_step = self.series_data.get_image(1000, 1000, 100, 600)
+        self.assertEqual(image.shape, (500, 500))
+        self.assertEqual(image[0, 0], 100)
+
+    def test_image_of_d_spacing_series(self):
+        d = 0.31 / (2 * np.sin(np.radians(self.x) / 2))
+        for ind in range(3):
+            self.series_data.add_frame('image_%03d.tif' % ind, d, d * ind, 'd_A')
+        display_x = self.series_data.get_display_x()
+        self.assertTrue(np.allclose(np.diff(display_x), (display_x[-1] - display_x[0]) / 499.))
+        image, frame_step, bin_step = self.series_data.get_image()
+        self.assertTrue(np.allclose(image[2], 2 * display_x, rtol=1e-4))
+        self.assertAlmostEqual(self.series_data.get_trace(display_x[100])[2], 2 * display_x[100],
+                               delta=2 * np.max(np.abs(np.diff(d))))
+
+        self.series_data.clear()
+        self.series_data.add_frame('image_000.tif', self.x, np.ones(500))
+        self.assertIs(self.series_data.get_display_x(), self.series_data.x)
+
+    def test_downsample_image_with_nan(self):
+        image = np.arange(12, dtype=np.float32).reshape(3, 4)
+        image[0, 0] = np.nan
+        downsampled = downsample_image(image, 2, 3)
+        self.assertEqual(downsampled.shape, (2, 2))
+        self.assertAlmostEqual(downsampled[0, 0], np.mean([1, 2, 4, 5, 6]), places=5)
+        self.assertAlmostEqual(downsampled[1, 1], 11)
@@ -1,6 +1,6 @@
 __author__ = 'Clemens Prescher'
 
-from Data.SpectrumData import Spectrum, SpectrumData
+from Data.SpectrumData import Spectrum, SpectrumData, resample_spectrum
 import unittest
 import numpy as np
 
@@ -47,3 +47,22 @@ class SpectrumDataTest(unittest.TestCase):
         self.spectrum_data.add_overlay_file('Data/spec_test2.txt')
         self.assertTrue(self.spectrum_data.overlays[-1].name == 'spec_test2')
 
+
+    def test_background_on_different_grid(self):
+        self.spectrum.data = (np.linspace(0, 10, 101), np.linspace(0, 10, 101) * 2)
+        bkg_spectrum = Spectrum(np.linspace(-1, 11, 61), np.linspace(-1, 11, 61))
+        self.spectrum.set_background(bkg_spectrum)
+        self.assertTrue(np.allclose(self.spectrum.data[1], np.linspace(0, 10, 101)))
+
+        # the resampled background is cached until the background changes
+        bkg_on_grid = self.spectrum.get_background_on_grid()
+        self.assertIs(self.spectrum.get_background_on_grid(), bkg_on_grid)
+        bkg_spectrum.offset = 1
+        self.assertTrue(np.allclose(self.spectrum.data[1], np.linspace(0, 10, 101) - 1))
+
+    def test_resample_spectrum_rebins_on_coarser_grid(self):
+        x = np.linspace(0, 10, 1001)
+        y = (np.arange(1001) % 2).astype(float)
+        new_x = np.linspace(1, 9, 9)
+        self.assertTrue(np.allclose(resample_spectrum(x, y, new_x), 0.5, atol=0.01))
+        self.assertTrue(np.allclose(resample_spectrum(x[::-1], x[::-1], [2.5, 7.25]), [2.5, 7.25]))
@@ -0,0 +1,65 @@
+__author__ = 'Clemens Prescher'
+
+from Data.SpectrumReader import read_spectrum_file, parse_spectrum, clear_spectrum_cache
+import unittest
+import numpy as np
+import tempfile
+import shutil
+import os
+
+
+class SpectrumReaderTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.x = np.linspace(1, 30, 200)
+        self.y = np.sin(self.x) + 2
+        clear_spectrum_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_file(self, name, content):
+        filename = os.path.join(self.directory, name)
+        with open(filename, 'w') as spectrum_file:
+            spectrum_file.write(content)
+        return filename
+
+    def test_xy_file_with_header(self):
+        filename = os.path.join(self.directory, 'test.xy')
+        np.savetxt(filename, np.vstack((self.x, self.y)).T, header='some header\n2th_deg intensity')
+        x, y = read_spectrum_file(filename)
+        self.assertTrue(np.allclose(x, self.x))
+        self.assertTrue(np.allclose(y, self.y))
+
+    def test_chi_file(self):
+        content = 'test.tif\n2-Theta Angle (Degrees)\nIntensity\n       200\n' + \
+                  '\n'.join('%g %g' % (x, y) for x, y in zip(self.x, self.y))
+        x, y = parse_spectrum(content)
+        self.assertEqual(len(x), 200)
+        self.assertTrue(np.allclose(y, self.y, rtol=1e-5))
+
+    def test_comma_separated_file_with_three_columns(self):
+        content = 'x,y,e\n' + '\n'.join('%g,%g,1' % (x, y) for x, y in zip(self.x, self.y))
+        x, y = parse_spectrum(content)
+        self.assertTrue(np.allclose(x, self.x, rtol=1e-5))
+
+    def test_fallback_for_inline_comments(self):
+        content = '\n'.join('%g %g # comment' % (x, y) for x, y in zip(self.x, self.y))
+        x, y = parse_spectrum(content)
+        self.assertEqual(len(y), 200)
+
+    def test_invalid_files(self):
+        self.assertRaises(ValueError, parse_spectrum, 'only\ntext\n')
+        self.assertRaises(ValueError, parse_spectrum, '1\n2\n3\n4\n')
+        self.assertRaises(ValueError, parse_spectrum, 'II*\0\x10\x00binary')
+
+    def test_cache(self):
+        filename = self.write_file('test.xy', '1 2\n3 4\n5 6\n')
+        x, y = read_spectrum_file(filename)
+        self.assertIs(read_spectrum_file(filename)[0], x)
+        self.assertFalse(x.flags.writeable)
+
+        self.write_file('test.xy', '1 2\n3 4\n5 6\n7 8\n')
+        os.utime(filename, (0, 0))
+        x, y = read_spectrum_file(filename)
+        self.assertTrue(np.array_equal(y, [2, 4, 6, 8]))
@@ -0,0 +1,96 @@
+__author__ = 'Clemens Prescher'
+
+from Data.SpectrumStack import SpectrumStack
+from Data.SpectrumData import SpectrumData
+from Data.SpectrumStore import SpectrumStore
+import unittest
+import numpy as np
+import tempfile
+import shutil
+import os
+
+
+class SpectrumStackTest(unittest.TestCase):
+    def setUp(self):
+        self.stack = SpectrumStack()
+        self.x = np.linspace(1, 30, 100)
+
+    def test_append_and_extend(self):
+        for ind in range(10):
+            self.stack.append(self.x, np.ones(100) * ind, 'spectrum_%d' % ind)
+        self.stack.extend(self.x, np.ones((5, 100)) * 20, ['a', 'b', 'c', 'd', 'e'])
+        self.assertEqual(len(self.stack), 15)
+        self.assertFalse(self.stack.is_ragged)
+        self.assertEqual(self.stack.y.shape, (15, 100))
+        self.assertEqual(self.stack.names[3], 'spectrum_3')
+
+        self.stack.scaling[3] = 2
+        self.stack.offset[3] = 1
+        x, y = self.stack.get_data(3)
+        self.assertTrue(np.array_equal(x, self.x))
+        self.assertTrue(np.array_equal(y, np.ones(100) * 7))
+
+    def test_delete(self):
+        self.stack.extend(self.x, np.arange(10)[:, None] * np.ones((10, 100)), [str(ind) for ind in range(10)])
+        self.stack.offset[5] = 3
+        self.stack.delete([0, 2, 4])
+        self.assertEqual(len(self.stack), 7)
+        self.assertEqual(self.stack.names, ['1', '3', '5', '6', '7', '8', '9'])
+        self.assertTrue(np.array_equal(self.stack.get_data(2)[1], np.ones(100) * 8))
+
+        self.stack.delete(np.ones(7, dtype=bool))
+        self.assertEqual(len(self.stack), 0)
+
+    def test_ragged_stack(self):
+        self.stack.append(self.x, np.ones(100))
+        self.stack.append(self.x[:50] + 40, np.ones(50) * 2)
+        self.stack.append(np.linspace(0, 50, 200), np.ones(200) * 3)
+        self.assertTrue(self.stack.is_ragged)
+        x, y = self.stack.get_data(1)
+        self.assertTrue(np.array_equal(x, self.x[:50] + 40))
+        self.assertTrue(np.array_equal(y, np.ones(50) * 2))
+        self.assertEqual(self.stack.get_x_range(), (0, self.x[49] + 40))
+
+        x, image = self.stack.get_image()
+        self.assertEqual(image.shape, (3, 200))
+        self.assertTrue(np.all(image[2][x <= 50] == 3))
+        self.assertTrue(np.all(np.isnan(image[2][x > 50])))
+
+    def test_image_of_unevenly_spaced_stack(self):
+        d = 0.31 / (2 * np.sin(np.radians(np.linspace(5, 25, 100)) / 2))
+        self.stack.extend(d, np.array([d, 2 * d]))
+        x, image = self.stack.get_image()
+        self.assertTrue(np.allclose(np.diff(x), (x[-1] - x[0]) / 99.))
+        self.assertAlmostEqual(x[0], np.min(d))
+        self.assertTrue(np.allclose(image[0], x))
+        self.assertTrue(np.allclose(image[1], 2 * x))
+
+        self.stack.append(d, np.nan * np.ones(100))
+        x, image = self.stack.get_image()
+        self.assertTrue(np.all(np.isnan(image[2])))
+        self.assertTrue(np.allclose(image[1], 2 * x))
+
+        self.stack.clear()
+        self.stack.extend(self.x, np.ones((2, 100)))
+        self.assertIs(self.stack.get_image()[0], self.stack.common_x)
+
+    def test_waterfall(self):
+        self.stack.extend(self.x, np.ones((4, 100)))
+        self.stack.show[1] = False
+        x, y = self.stack.get_waterfall(10)
+        self.assertEqual(x.shape, (3, 100))
+        self.assertTrue(np.array_equal(y[:, 0], [1, 11, 21]))
+
+    def test_load_store_into_spectrum_data(self):
+        directory = tempfile.mkdtemp()
+        try:
+            store = SpectrumStore.create(os.path.join(directory, 'series'), self.x)
+            for ind in range(3):
+                store.append(np.ones(100) * ind, 'image_%03d.tif' % ind, 0)
+            spectrum_data = SpectrumData()
+            spectrum_data.load_overlay_stack_from_store(os.path.join(directory, 'series'))
+            self.assertEqual(len(spectrum_data.overlay_stack), 3)
+            self.assertEqual(spectrum_data.overlay_stack.names[1], 'image_001')
+            self.assertTrue(np.array_equal(spectrum_data.overlay_stack.get_data(2)[1], np.ones(100) * 2))
+        finally:
+            shutil.rmtree(directory)
@@ -0,0 +1,56 @@
+__author__ = 'Clemens Prescher'
+
+from Data.SpectrumStore import SpectrumStore, is_spectrum_store
+from Data.SpectrumData import SpectrumData
+import unittest
+import numpy as np
+import tempfile
+import shutil
+import os
+
+
+class SpectrumStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = os.path.join(tempfile.mkdtemp(), 'test_spectra')
+        self.x = np.linspace(1, 30, 500)
+
+    def tearDown(self):
+        shutil.rmtree(os.path.dirname(self.directory))
+
+    def test_append_and_read(self):
+        store = SpectrumStore.create(self.directory, self.x, '2th_deg', 'Distance: 0.2 m')
+        self.assertTrue(is_spectrum_store(self.directory))
+        self.assertEqual(len(store.get_intensities()), 0)
+
+        spectra = np.random.random((5, 500))
+        for ind, y in enumerate(spectra):
+            store.append(y, 'image_%03d.tif' % ind, mtime=ind)
+        self.assertRaises(ValueError, store.append, np.ones(10))
+
+        store = SpectrumStore(self.directory)
+        self.assertEqual(len(store), 5)
+        self.assertEqual(store.calibration, 'Distance: 0.2 m')
+        intensities = store.get_intensities()
+        self.assertIsInstance(intensities, np.memmap)
+        self.assertEqual(intensities.shape, (5, 500))
+        self.assertTrue(np.allclose(intensities, spectra))
+        self.assertTrue(np.array_equal(store.x, self.x))
+
+        frames = store.get_frames()
+        self.assertEqual(frames['filename'][2], 'image_002.tif')
+        self.assertEqual(frames['mtime'][4], 4)
+        self.assertAlmostEqual(frames['sum'][1], np.sum(spectra[1]), places=3)
+
+        # continue appending to an existing store
+        store.append(np.ones(500), 'image_005.tif')
+        self.assertEqual(SpectrumStore(self.directory).get_intensities().shape, (6, 500))
+
+    def test_load_store_as_overlays(self):
+        store = SpectrumStore.create(self.directory, self.x)
+        for ind in range(3):
+            store.append(np.ones(500) * ind, 'image_%03d.tif' % ind)
+        spectrum_data = SpectrumData()
+        spectrum_data.add_overlays_from_store(self.directory)
+        self.assertEqual(len(spectrum_data.overlays), 3)
+        self.assertEqual(spectrum_data.overlays[2].name, 'image_002')
+        self.assertTrue(np.array_equal(spectrum_data.overlays[2].data[1], np.ones(500) * 2))
@@ -0,0 +1,110 @@
+__author__ = 'Clemens Prescher'
+
+from Data.jcpds import jcpds, create_reflections, bm3_pressure, bm3_inverse_volume
+import unittest
+import numpy as np
+
+
+class jcpdsTest(unittest.TestCase):
+    def setUp(self):
+        self.hkl = np.array([(h, k, l) for h in range(-2, 3) for k in range(-2, 3) for l in range(0, 4)
+                             if (h, k, l) != (0, 0, 0)], dtype=np.float64)
+
+    def create_phase(self, symmetry, a, b=0., c=0., alpha=0., beta=0., gamma=0.):
+        phase = jcpds()
+        phase.symmetry = symmetry
+        phase.a0, phase.b0, phase.c0 = a, b, c
+        phase.alpha0, phase.beta0, phase.gamma0 = alpha, beta, gamma
+        phase.compute_v0()
+        phase.alpha, phase.beta, phase.gamma = phase.alpha0, phase.beta0, phase.gamma0
+        phase.reflections = create_reflections([(h, k, l, 0., 0., 100.) for h, k, l in self.hkl])
+        return phase
+
+    def check_d_spacings(self, phase, d2inv):
+        reflections = phase.compute_d()
+        self.assertTrue(np.allclose(reflections.d, 1. / np.sqrt(d2inv)))
+        self.assertTrue(np.allclose(phase.get_reflections().d, 1. / np.sqrt(d2inv)))
+
+    def test_cubic_tetragonal_orthorhombic(self):
+        h, k, l = self.hkl.T
+        self.check_d_spacings(self.create_phase('CUBIC', 4.08),
+                              (h ** 2 + k ** 2 + l ** 2) / 4.08 ** 2)
+        self.check_d_spacings(self.create_phase('TETRAGONAL', 4.08, c=5.3),
+                              (h ** 2 + k ** 2) / 4.08 ** 2 + l ** 2 / 5.3 ** 2)
+        self.check_d_spacings(self.create_phase('ORTHORHOMBIC', 4.08, 4.5, 5.3),
+                              h ** 2 / 4.08 ** 2 + k ** 2 / 4.5 ** 2 + l ** 2 / 5.3 ** 2)
+
+    def test_hexagonal_and_rhombohedral(self):
+        h, k, l = self.hkl.T
+        self.check_d_spacings(self.create_phase('HEXAGONAL', 4.758, c=12.99),
+                              (h ** 2 + h * k + k ** 2) * 4. / 3. / 4.758 ** 2 + l ** 2 / 12.99 ** 2)
+        alpha = np.radians(55.3)
+        self.check_d_spacings(self.create_phase('RHOMBOHEDRAL', 5.13, alpha=55.3),
+                              (((1. + np.cos(alpha)) * ((h ** 2 + k ** 2 + l ** 2) -
+                                                        (1 - np.tan(0.5 * alpha) ** 2) * (h * k + k * l + l * h))) /
+                               (5.13 ** 2 * (1 + np.cos(alpha) - 2 * np.cos(alpha) ** 2))))
+
+    def test_monoclinic_and_triclinic(self):
+        h, k, l = self.hkl.T
+        a, b, c = 5.1, 6.2, 7.3
+        beta = np.radians(103.)
+        self.check_d_spacings(self.create_phase('MONOCLINIC', a, b, c, beta=103.),
+                              (h ** 2 / np.sin(beta) ** 2 / a ** 2 + k ** 2 / b ** 2 +
+                               l ** 2 / np.sin(beta) ** 2 / c ** 2 -
+                               2 * h * l * np.cos(beta) / (a * c * np.sin(beta) ** 2)))
+
+        alpha, beta, gamma = np.radians(82.), np.radians(95.), np.radians(101.)
+        V2 = (a ** 2 * b ** 2 * c ** 2 *
+              (1. - np.cos(alpha) ** 2 - np.cos(beta) ** 2 - np.cos(gamma) ** 2 +
+               2 * np.cos(alpha) * np.cos(beta) * np.cos(gamma)))
+        s11 = b ** 2 * c ** 2 * np.sin(alpha) ** 2
+        s22 = a ** 2 * c ** 2 * np.sin(beta) ** 2
+        s33 = a ** 2 * b ** 2 * np.sin(gamma) ** 2
+        s12 = a * b * c ** 2 * (np.cos(alpha) * np.cos(beta) - np.cos(gamma))
+        s23 = a ** 2 * b * c * (np.cos(beta) * np.cos(gamma) - np.cos(alpha))
+        s31 = a * b ** 2 * c * (np.cos(gamma) * np.cos(alpha) - np.cos(beta))
+        self.check_d_spacings(self.create_phase('TRICLINIC', a, b, c, 82., 95., 101.),
+                              (s11 * h ** 2 + s22 * k ** 2 + s33 * l ** 2 +
+                               2. * s12 * h * k + 2. * s23 * k * l + 2. * s31 * l * h) / V2)
+
+    def test_compression(self):
+        phase = self.create_phase('HEXAGONAL', 4.758, c=12.99)
+        phase.k0 = 254.
+        phase.k0p0 = 4.
+        d_ambient = np.copy(phase.compute_d(pressure=0).d)
+        d_compressed = phase.compute_d(pressure=30).d
+        ratio = d_compressed / d_ambient
+        self.assertTrue(np.all(ratio < 1))
+        self.assertTrue(np.allclose(ratio, ratio[0]))
+        self.assertAlmostEqual(ratio[0] ** 3, phase.v / phase.v0)
+
+    def test_bm3_inverse_volume(self):
+        pressures = np.linspace(-5, 400, 1000)
+        v0_v = bm3_inverse_volume(pressures, 166.65, 5.4823)
+        self.assertTrue(np.allclose(bm3_pressure(v0_v, 166.65, 5.4823), pressures))
+        self.assertTrue(np.all(np.diff(v0_v) > 0))
+        self.assertAlmostEqual(float(bm3_inverse_volume(0, 166.65, 5.4823)), 1)
+
+        # for K0' < 4 the equation of state has a pressure maximum, above it the volume of the maximum is returned
+        v0_v = bm3_inverse_volume([50, 200], 240., 2.)
+        self.assertAlmostEqual(bm3_pressure(v0_v[0], 240., 2.), 50)
+        self.assertLess(v0_v[0], 1.5)
+        self.assertAlmostEqual(bm3_pressure(v0_v[1], 240., 2.), np.max(bm3_pressure(np.linspace(1, 3, 1000), 240., 2.)),
+                               places=3)
+
+    def test_volume_table(self):
+        phase = self.create_phase('CUBIC', 4.08)
+        phase.k0 = 166.65
+        phase.k0p0 = 5.4823
+        phase.alpha_t0 = 4.26e-5
+        phase.compute_volume(pressure=37.3, temperature=1500)
+        volume = phase.v
+
+        phase.create_volume_table(np.linspace(0, 100, 1001), np.linspace(298, 3000, 28))
+        phase.compute_volume(pressure=37.3, temperature=1500)
+        self.assertAlmostEqual(phase.v / volume, 1, places=5)
+        self.assertTrue(np.allclose(phase.volume_table[2][:, 0], phase.compute_volumes(np.linspace(0, 100, 1001))))
+
+        # outside of the table the equation of state is solved
+        phase.compute_volume(pressure=150, temperature=1500)
+        self.assertAlmostEqual(phase.v, float(phase.compute_volumes(150, 1500)))